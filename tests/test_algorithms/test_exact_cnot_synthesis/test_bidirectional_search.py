@@ -0,0 +1,38 @@
+import numpy as np
+import xyz
+from xyz.algorithms.initialization.exact_cnot_synthesis import ForwardExplorer
+
+
+def _apply(gates, num_qubits: int):
+    state = xyz.QState.ground_state(num_qubits)
+    for gate in gates:
+        state = gate.apply(state)
+    return state
+
+
+def test_bidirectional_search():
+    np.random.seed(0)
+    for num_qubits, sparsity in [(3, 3), (3, 4), (3, 5), (4, 5)]:
+        state = xyz.quantize_state(xyz.rand_state(num_qubits, sparsity))
+        gates = xyz.exact_cnot_synthesis(xyz.QCircuit(num_qubits), state)
+        bidirectional_gates = xyz.exact_cnot_synthesis(
+            xyz.QCircuit(num_qubits), state, bidirectional=True
+        )
+        assert sum(gate.get_cnot_cost() for gate in bidirectional_gates) == sum(
+            gate.get_cnot_cost() for gate in gates
+        )
+        assert np.allclose(
+            _apply(bidirectional_gates, num_qubits).to_vector(), state.to_vector()
+        )
+
+
+def test_forward_stitch():
+    forward_explorer = ForwardExplorer(xyz.QSPDatabase())
+    assert forward_explorer.get_cost(xyz.QState.ground_state(3)) == 0
+
+    # a GHZ state needs two CNOTs
+    state = xyz.QState({0b000: np.sqrt(0.5), 0b111: np.sqrt(0.5)}, 3)
+    assert forward_explorer.get_cost(state) == 2
+    gates = forward_explorer.stitch(xyz.QCircuit(3), state, 2)
+    assert sum(gate.get_cnot_cost() for gate in gates) == 2
+    assert np.allclose(_apply(gates, 3).to_vector(), state.to_vector())
@@ -0,0 +1,41 @@
+import sys
+import numpy as np
+import pytest
+import xyz
+
+
+def _apply(gates, state: xyz.QState):
+    for gate in gates:
+        state = gate.apply(state)
+    return state
+
+
+def test_node_budget():
+    np.random.seed(3)
+    state = xyz.quantize_state(xyz.rand_state(4, 5))
+    with pytest.raises(xyz.SynthesisBudgetExceeded) as e:
+        xyz.exact_cnot_synthesis(xyz.QCircuit(4), state, node_budget=20)
+
+    # the partial reduction makes progress and prepares the target state
+    partial_state = e.value.state
+    assert len(partial_state.get_supports()) < len(state.get_supports())
+    assert e.value.cnot_cost == sum(gate.get_cnot_cost() for gate in e.value.gates)
+    assert np.allclose(
+        _apply(e.value.gates, partial_state).to_vector(), state.to_vector()
+    )
+
+    # the callers catching ValueError are not affected
+    with pytest.raises(ValueError):
+        xyz.exact_cnot_synthesis(xyz.QCircuit(4), state, time_budget=0)
+
+
+def test_prepare_state_budget():
+    np.random.seed(3)
+    state = xyz.quantize_state(xyz.rand_state(4, 5))
+    module = sys.modules["xyz.algorithms.initialization.prepare_state"]
+    param = module.__Params(EXACT_SYNTHESIS_NODE_BUDGET=3)
+    circuit = xyz.prepare_state(state, map_gates=False, param=param)
+    gates = circuit.get_gates()
+    assert np.allclose(
+        _apply(gates, xyz.QState.ground_state(4)).to_vector(), state.to_vector()
+    )
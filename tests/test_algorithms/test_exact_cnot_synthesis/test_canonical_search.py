@@ -0,0 +1,26 @@
+import numpy as np
+import xyz
+
+
+def _apply(gates, num_qubits: int):
+    state = xyz.QState.ground_state(num_qubits)
+    for gate in gates:
+        state = gate.apply(state)
+    return state
+
+
+def test_canonical_search():
+    np.random.seed(0)
+    for num_qubits, sparsity in [(3, 3), (3, 4), (4, 5)]:
+        state = xyz.quantize_state(xyz.rand_state(num_qubits, sparsity))
+        gates = xyz.exact_cnot_synthesis(xyz.QCircuit(num_qubits), state)
+        assert np.allclose(_apply(gates, num_qubits).to_vector(), state.to_vector())
+
+
+def test_canonical_search_x_gates():
+    # the last qubit is always 1, removing it with an X gate does not change the
+    # canonical form of the state
+    state = xyz.QState({0b100: np.sqrt(0.3), 0b111: np.sqrt(0.7)}, 3)
+    gates = xyz.exact_cnot_synthesis(xyz.QCircuit(3), state)
+    assert sum(gate.get_cnot_cost() for gate in gates) == 1
+    assert np.allclose(_apply(gates, 3).to_vector(), state.to_vector())
@@ -0,0 +1,36 @@
+import pytest
+import xyz
+
+
+def test_open_list_order():
+    open_list = xyz.OpenList()
+    open_list.push("a", xyz.AStarCost(2, 1), "state_a")
+    open_list.push("b", xyz.AStarCost(1, 1), "state_b")
+    open_list.push("c", xyz.AStarCost(0, 2), "state_c")
+    open_list.push("d", xyz.AStarCost(2, 0), "state_d")
+
+    assert len(open_list) == 4
+    # same f-cost: the shallower state comes first, then the latest one
+    popped = [open_list.pop()[1] for _ in range(4)]
+    assert popped == ["state_c", "state_b", "state_d", "state_a"]
+    assert open_list.empty()
+    assert open_list.num_stale == 0
+
+
+def test_open_list_decrease_key():
+    open_list = xyz.OpenList()
+    open_list.push("a", xyz.AStarCost(5, 0), "old_a")
+    open_list.push("b", xyz.AStarCost(3, 0), "state_b")
+    open_list.push("a", xyz.AStarCost(1, 0), "new_a")
+
+    assert len(open_list) == 2
+    cost, state = open_list.pop()
+    assert state == "new_a" and cost.cnot_cost == 1
+    cost, state = open_list.pop()
+    assert state == "state_b"
+    assert open_list.empty()
+
+    with pytest.raises(IndexError):
+        open_list.pop()
+    # the replaced entry of "a" has been skipped
+    assert open_list.num_stale == 1
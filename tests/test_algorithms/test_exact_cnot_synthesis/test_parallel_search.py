@@ -0,0 +1,33 @@
+import numpy as np
+import xyz
+
+
+def _apply(gates, num_qubits: int):
+    state = xyz.QState.ground_state(num_qubits)
+    for gate in gates:
+        state = gate.apply(state)
+    return state
+
+
+def test_parallel_search():
+    np.random.seed(0)
+    for num_qubits, sparsity in [(3, 4), (4, 5)]:
+        state = xyz.quantize_state(xyz.rand_state(num_qubits, sparsity))
+        gates = xyz.exact_cnot_synthesis(xyz.QCircuit(num_qubits), state)
+        parallel_gates = xyz.exact_cnot_synthesis(
+            xyz.QCircuit(num_qubits), state, workers=2, batch_size=8
+        )
+        assert sum(gate.get_cnot_cost() for gate in parallel_gates) == sum(
+            gate.get_cnot_cost() for gate in gates
+        )
+        assert np.allclose(
+            _apply(parallel_gates, num_qubits).to_vector(), state.to_vector()
+        )
+
+        # the merge does not depend on the number of workers
+        serial_gates = xyz.exact_cnot_synthesis(
+            xyz.QCircuit(num_qubits), state, batch_size=8
+        )
+        assert [str(gate) for gate in serial_gates] == [
+            str(gate) for gate in parallel_gates
+        ]
@@ -0,0 +1,80 @@
+import os
+import sys
+import numpy as np
+import xyz
+
+
+def test_qsp_table(tmp_path, monkeypatch):
+    monkeypatch.setenv("XYZ_CACHE_DIR", str(tmp_path))
+
+    db = xyz.QSPDatabase()
+    db.load_database(2)
+    filename = db.get_db_filename(2)
+    assert os.path.dirname(filename) == str(tmp_path)
+    assert os.path.exists(filename)
+
+    table = db.databases[2]
+    assert np.all(table.keys[1:] > table.keys[:-1])
+    assert table.costs.dtype == np.uint8
+
+    # the ground state is free, a bell state needs one CNOT
+    assert db.lookup(xyz.QState({0b00: 1.0}, 2)) == 0
+    assert db.lookup(xyz.QState({0b00: 0.5, 0b01: 0.5}, 2)) == 0
+    assert db.lookup(xyz.QState({0b00: 0.5, 0b11: 0.5}, 2)) == 1
+
+    # the table on disk is memory mapped and shared within the process
+    reloaded = xyz.QSPTable.load(filename, 2)
+    assert isinstance(reloaded.keys, np.memmap)
+    assert np.array_equal(reloaded.keys, table.keys)
+    assert np.array_equal(reloaded.costs, table.costs)
+    assert xyz.QSPDatabase().lookup(xyz.QState({0b00: 0.5, 0b11: 0.5}, 2)) == 1
+
+
+def test_qsp_table_stale(tmp_path, monkeypatch):
+    monkeypatch.setenv("XYZ_CACHE_DIR", str(tmp_path))
+    filename = xyz.QSPDatabase.get_db_filename(1)
+
+    # a table written by another version is ignored and rebuilt
+    table = xyz.QSPTable.from_dict({xyz.QState({0: 1.0}, 1).canonical_fingerprint64(): 7})
+    table.save(filename, 1)
+    with open(filename, "r+b") as f:
+        f.seek(8)
+        f.write((xyz.QSP_DB_VERSION + 1).to_bytes(4, "little"))
+    assert xyz.QSPTable.load(filename, 1) is None
+
+    db = xyz.QSPDatabase()
+    db.load_database(1)
+    assert db.lookup(xyz.QState({0: 1.0}, 1)) == 0
+    assert xyz.QSPTable.load(filename, 1) is not None
+
+
+def test_qsp_table_old_versions_removed(tmp_path, monkeypatch):
+    monkeypatch.setenv("XYZ_CACHE_DIR", str(tmp_path))
+    old_filenames = [tmp_path / "qsp_db_1.v1.bin", tmp_path / "qsp_db_1.v2.bin"]
+    other_filename = tmp_path / "qsp_db_2.v1.bin"
+    for filename in old_filenames + [other_filename]:
+        filename.write_bytes(b"")
+
+    # writing the table of 1 qubit removes its older versions only
+    xyz.QSPDatabase().load_database(1)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(xyz.QSPDatabase.get_db_filename(1)), "qsp_db_2.v1.bin"]
+    )
+
+
+def test_qsp_table_partial(tmp_path, monkeypatch):
+    monkeypatch.setenv("XYZ_CACHE_DIR", str(tmp_path))
+    state = xyz.QState({0b00000: 0.5, 0b11111: 0.5}, 5)
+
+    # no table of 5 qubits yet, the miss is not remembered by the process
+    assert xyz.QSPDatabase().lookup(state) == 0
+    loaded_tables = sys.modules["xyz.algorithms.initialization.qsp_database"]._LOADED_TABLES
+    assert xyz.QSPDatabase.get_db_filename(5) not in loaded_tables
+
+    # a partial table without the state gives the trivial lower bound
+    ground_state = xyz.QState({0: 1.0}, 5)
+    table = xyz.QSPTable.from_dict({ground_state.canonical_fingerprint64(): 0})
+    table.save(xyz.QSPDatabase.get_db_filename(5), 5)
+    db = xyz.QSPDatabase()
+    assert db.lookup(state) == 0
+    assert db.databases[5] is not None
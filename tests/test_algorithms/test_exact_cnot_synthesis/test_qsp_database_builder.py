@@ -0,0 +1,46 @@
+import random
+import xyz
+
+
+def test_next_masks():
+    random.seed(0)
+    n_qubits = 3
+    position_masks = xyz.get_qubit_position_masks(n_qubits)
+    for _ in range(100):
+        index_set = set(random.sample(range(2**n_qubits), random.randint(1, 8)))
+        mask = sum(1 << index for index in index_set)
+        assert (
+            xyz.get_mask_canonical_key(mask, n_qubits)[0]
+            == xyz.from_set(index_set, n_qubits).canonical_fingerprint64()
+        )
+
+        expected = xyz.QSPDatabase.get_next_set(index_set, n_qubits)
+        actual = xyz.get_next_masks(mask, n_qubits, position_masks)
+        assert len(expected) == len(actual)
+        for (next_set, cost), (next_mask, next_cost) in zip(expected, actual):
+            assert sum(1 << index for index in next_set) == next_mask
+            assert cost == next_cost
+
+
+def test_build_parallel():
+    database = xyz.build_qsp_database(3)
+    assert database == xyz.build_qsp_database(3, workers=2)
+    assert database[xyz.QState.ground_state(3).canonical_fingerprint64()] == 0
+    ghz_state = xyz.QState({0b000: 0.5, 0b111: 0.5}, 3)
+    assert database[ghz_state.canonical_fingerprint64()] == 2
+
+    # the first layers do not depend on the depth of the search
+    partial_database = xyz.build_qsp_database(3, max_cost=1)
+    assert partial_database == {
+        key: cost for key, cost in database.items() if cost <= 1
+    }
+
+
+def test_cli(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("XYZ_CACHE_DIR", str(tmp_path))
+    assert xyz.qsp_database_cli(["build", "2", "3", "-j", "1"]) == 0
+    assert xyz.qsp_database_cli(["verify", "2", "3", "-j", "1"]) == 0
+    assert "ok" in capsys.readouterr().out
+
+    # a missing table fails the verification
+    assert xyz.qsp_database_cli(["verify", "1", "-j", "1"]) == 1
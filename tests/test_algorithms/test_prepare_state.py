@@ -1,7 +1,11 @@
+import random
+import sys
 import numpy as np
 import xyz
 import pytest
 
+prepare_state_module = sys.modules["xyz.algorithms.initialization.prepare_state"]
+
 # skip 
 @pytest.mark.skip(reason="Takes too long")
 def test_qsp_1():
@@ -24,3 +28,118 @@ def test_qsp_2():
     state_vector_act = xyz.simulate_circuit(circuit)
 
     assert np.linalg.norm(abs(state_vector_act) - abs(state_vector)) < 1e-6
+
+
+def test_qsp_deep():
+    np.random.seed(3)
+    target_state = xyz.quantize_state(xyz.rand_state(10, 250))
+    state_vector = target_state.to_vector()
+
+    # each cardinality reduction is a sub-problem, more than the recursion limit
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        circuit = xyz.prepare_state(
+            target_state,
+            map_gates=False,
+            param=prepare_state_module.__Params(EXACT_SYNTHESIS_NODE_BUDGET=5),
+        )
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    state_vector_act = xyz.simulate_circuit(circuit)
+
+    assert np.linalg.norm(abs(state_vector_act) - abs(state_vector)) < 1e-6
+
+
+def test_qsp_concurrent_flows():
+    np.random.seed(4)
+    target_state = xyz.quantize_state(xyz.rand_state(4, 6))
+    state_vector = target_state.to_vector()
+    params = {"enable_n_flow": True, "EXACT_SYNTHESIS_NODE_BUDGET": 10}
+
+    # the flows are solved one after the other
+    gates, _ = prepare_state_module._prepare_state_iter(
+        xyz.QCircuit(4), target_state, stats=prepare_state_module.__Stats(), **params
+    )
+    expected_circuit = xyz.QCircuit(4, map_gates=True)
+    expected_circuit.add_gates(gates)
+
+    circuit = xyz.prepare_state(
+        target_state,
+        param=prepare_state_module.__Params(enable_concurrent_flows=True, **params),
+    )
+    state_vector_act = xyz.simulate_circuit(circuit)
+
+    assert [str(gate) for gate in circuit.get_gates()] == [
+        str(gate) for gate in expected_circuit.get_gates()
+    ]
+    assert np.linalg.norm(abs(state_vector_act) - abs(state_vector)) < 1e-6
+
+
+def test_qsp_cache_relabel():
+    state = xyz.quantize_state("0.5*|0011> + 0.5*|0110> + 0.5*|1000> + 0.5*|1101>")
+    # the same state with the qubits 0 -> 2 -> 3 -> 1 -> 0
+    permuted_state = xyz.quantize_state(
+        "0.5*|1001> + 0.5*|1100> + 0.5*|0010> + 0.5*|0111>"
+    )
+
+    cache = prepare_state_module._StateCache(1)
+    key, permutation = cache.get_key(state)
+    permuted_key, permuted_permutation = cache.get_key(permuted_state)
+    assert permuted_key == key
+
+    gates, num_cnots = prepare_state_module._prepare_state_iter(
+        xyz.QCircuit(4), state, stats=prepare_state_module.__Stats()
+    )
+    cache.store(key, permutation, ((None, gates), num_cnots))
+    chain, cached_num_cnots = cache.lookup(permuted_key, permuted_permutation)
+    assert cached_num_cnots == num_cnots
+
+    circuit = xyz.QCircuit(4, map_gates=True)
+    circuit.add_gates(prepare_state_module._flatten_gates(chain))
+    state_vector_act = xyz.simulate_circuit(circuit)
+    assert np.linalg.norm(abs(state_vector_act) - abs(permuted_state.to_vector())) < 1e-6
+
+
+def test_qsp_cache():
+    np.random.seed(5)
+    random.seed(5)
+    target_state = xyz.quantize_state(xyz.rand_state(10, 200))
+    state_vector = target_state.to_vector()
+
+    stats = prepare_state_module.__Stats()
+    param = prepare_state_module.__Params(cache_size=100, EXACT_SYNTHESIS_NODE_BUDGET=5)
+    circuit = xyz.prepare_state(target_state, param=param, stats=stats)
+    state_vector_act = xyz.simulate_circuit(circuit)
+
+    assert stats.num_cache_hits > 0
+    assert np.linalg.norm(abs(state_vector_act) - abs(state_vector)) < 1e-6
+
+
+def test_prepare_states():
+    np.random.seed(6)
+    random.seed(6)
+    target_states = [xyz.quantize_state(xyz.rand_state(6, 8)) for _ in range(4)]
+    param = prepare_state_module.__Params(EXACT_SYNTHESIS_NODE_BUDGET=10)
+    expected_gates = [
+        [str(gate) for gate in xyz.prepare_state(state, param=param).get_gates()]
+        for state in target_states
+    ]
+
+    for workers, ordered in [(1, True), (2, False)]:
+        stats = prepare_state_module.__Stats()
+        results = xyz.prepare_states(
+            iter(target_states),
+            workers=workers,
+            ordered=ordered,
+            param=param,
+            stats=stats,
+        )
+        indices = []
+        num_runs = 0
+        for index, circuit, state_stats in results:
+            indices.append(index)
+            num_runs += state_stats.num_runs_support_reduction
+            assert [str(gate) for gate in circuit.get_gates()] == expected_gates[index]
+        assert sorted(indices) == list(range(len(target_states)))
+        assert stats.num_runs_support_reduction == num_runs
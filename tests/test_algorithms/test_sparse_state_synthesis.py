@@ -0,0 +1,73 @@
+import sys
+import numpy as np
+import xyz
+
+sparse_state_synthesis = sys.modules["xyz.algorithms.initialization.sparse_state_synthesis"]
+
+
+def test_maximize_difference_once():
+    state = xyz.QState({0b000: 0.5, 0b011: 0.5, 0b101: 0.5, 0b111: 0.5}, 3)
+    indices = sparse_state_synthesis._to_index_array(state.index_set, 3)
+
+    # qubit 0 is 1 in three indices, qubit 1 and qubit 2 in two, the first
+    # most uneven qubit is selected and the minority is kept
+    index_set, qubit, value = sparse_state_synthesis._maximize_difference_once(
+        state, indices, []
+    )
+    assert qubit == 0 and value == 0
+    assert index_set.tolist() == [0b000]
+
+
+def test_cardinality_reduction_large():
+    np.random.seed(0)
+    num_qubits, sparsity = 30, 200
+    indices = np.unique(np.random.randint(0, 1 << num_qubits, sparsity)).tolist()
+    sparsity = len(indices)
+    weights = np.random.rand(sparsity)
+    weights /= np.linalg.norm(weights)
+    state = xyz.QState(dict(zip(indices, weights)), num_qubits)
+
+    circuit = xyz.sparse_state_synthesis(state)
+    prepared_state = xyz.QState.ground_state(num_qubits)
+    for gate in circuit.get_gates():
+        prepared_state = gate.apply(prepared_state)
+    assert set(prepared_state.index_set) == set(state.index_set)
+    for index, weight in state.index_to_weight.items():
+        assert np.isclose(prepared_state.index_to_weight[index], weight)
+
+
+def test_sparse_qsp_engine():
+    np.random.seed(1)
+    for depth_opt in [False, True]:
+        state = xyz.quantize_state(xyz.rand_state(8, 40))
+        circuit = xyz.QCircuit(8)
+        engine = xyz.SparseQSPEngine(circuit, state, depth_opt=depth_opt)
+
+        # the engine emits the gates of the cardinality reductions
+        reduction = (
+            xyz.depth_optimized_cardinality_reduction
+            if depth_opt
+            else xyz.cardinality_reduction
+        )
+        curr_state = state
+        while curr_state.get_sparsity() > 1:
+            curr_state, gates = reduction(circuit, curr_state)
+            engine_gates = engine.reduce_once()[::-1]
+            assert [str(gate) for gate in engine_gates] == [str(gate) for gate in gates]
+            assert engine.get_sparsity() == curr_state.get_sparsity()
+        assert engine.to_qstate() == curr_state
+
+
+def test_sparse_qsp_engine_run():
+    np.random.seed(2)
+    state = xyz.quantize_state(xyz.rand_state(10, 150))
+    circuit = xyz.QCircuit(10)
+    engine = xyz.SparseQSPEngine(circuit, state)
+
+    # the gates prepare the original state from the reduced one
+    gates = engine.run(4)
+    prepared_state = engine.to_qstate()
+    assert prepared_state.get_sparsity() <= 4
+    for gate in gates:
+        prepared_state = gate.apply(prepared_state)
+    assert np.allclose(prepared_state.to_vector(), state.to_vector())
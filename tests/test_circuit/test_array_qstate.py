@@ -0,0 +1,93 @@
+import numpy as np
+import xyz
+
+
+def _random_pair(num_qubits: int = 5, sparsity: int = 9, seed: int = 0):
+    np.random.seed(seed)
+    state_vector = np.zeros(2**num_qubits)
+    indices = np.random.choice(2**num_qubits, sparsity, replace=False)
+    state_vector[indices] = np.random.random(sparsity) + 0.1
+    state = xyz.quantize_state(state_vector)
+    return state, xyz.ArrayQState.from_qstate(state)
+
+
+def test_array_qstate_api():
+    state, array_state = _random_pair()
+
+    assert array_state.get_sparsity() == state.get_sparsity()
+    assert array_state.get_supports() == state.get_supports()
+    assert array_state == state
+    assert hash(array_state) == hash(state)
+    assert array_state.repr() == state.repr()
+    assert set(array_state.index_set) == set(state.index_set)
+    assert xyz.is_equal(array_state, state)
+    assert np.allclose(array_state.to_vector(), state.to_vector())
+
+    # the signatures follow the sorted order of the indices
+    sorted_state = xyz.QState(
+        {index: state.index_to_weight[index] for index in sorted(state.index_set)},
+        state.num_qubits,
+    )
+    assert array_state.get_qubit_signatures() == sorted_state.get_qubit_signatures()
+
+    for qubit in range(state.num_qubits):
+        neg, pos, weight0, weight1 = state.cofactors(qubit)
+        array_neg, array_pos, array_weight0, array_weight1 = array_state.cofactors(
+            qubit
+        )
+        assert xyz.is_equal(array_neg, neg) and xyz.is_equal(array_pos, pos)
+        assert np.isclose(array_weight0, weight0)
+        assert np.isclose(array_weight1, weight1)
+
+
+def test_array_qstate_merge():
+    state = xyz.ArrayQState([3, 1, 3, 2], [0.5, 0.5, 0.5, 0.0], 2)
+    assert state.indices.tolist() == [1, 3]
+    assert np.allclose(state.weights, [0.5, 1.0])
+
+
+def test_array_qstate_prepare_state():
+    _, array_state = _random_pair(num_qubits=4, sparsity=5, seed=1)
+
+    circuit = xyz.QCircuit(array_state.num_qubits)
+    new_state, gates = xyz.cardinality_reduction(circuit, array_state)
+    assert new_state.get_sparsity() == array_state.get_sparsity() - 1
+    assert len(gates) > 0
+
+    circuit = xyz.prepare_state(array_state, map_gates=True)
+    state_vector_act = xyz.simulate_circuit(circuit)
+    assert np.linalg.norm(state_vector_act - array_state.to_vector()) < 1e-6
+
+
+def test_array_qstate_index_set():
+    state, array_state = _random_pair()
+
+    # the index set and the angles are read from the arrays
+    index_set = array_state.index_set
+    for index in range(2**state.num_qubits):
+        assert (index in index_set) == (index in state.index_set)
+    assert -1 not in index_set and 2**64 not in index_set
+    assert len(index_set) == state.get_sparsity()
+    assert list(index_set) == sorted(state.index_set)
+    assert array_state._index_to_weight is None
+
+    # a state made of pairs, all with the same angle along qubit 1 when qubit 0 is 1
+    pair_state = xyz.QState(
+        {0b001: 0.3, 0b011: 0.4, 0b101: 0.3, 0b111: 0.4, 0b100: 0.5}, 3
+    )
+    array_pair_state = xyz.ArrayQState.from_qstate(pair_state)
+    for pair, array_pair in [(state, array_state), (pair_state, array_pair_state)]:
+        for target in range(pair.num_qubits):
+            assert xyz.get_ap_ry_angles(array_pair, target) == xyz.get_ap_ry_angles(
+                pair, target
+            )
+            for control in range(pair.num_qubits):
+                if control == target:
+                    continue
+                for phase in [True, False]:
+                    expected = xyz.get_ap_cry_angles(pair, control, target, phase)
+                    actual = xyz.get_ap_cry_angles(array_pair, control, target, phase)
+                    assert (expected is None) == (actual is None)
+                    assert actual is None or np.isclose(actual, expected)
+    assert xyz.get_ap_cry_angles(array_pair_state, 0, 1) is not None
+    assert array_pair_state._index_to_weight is None
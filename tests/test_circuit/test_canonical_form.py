@@ -0,0 +1,86 @@
+import random
+from itertools import combinations, permutations
+import xyz
+
+
+def _relabel(indices, permutation, flips):
+    new_indices = []
+    for index in indices:
+        index ^= flips
+        new_indices.append(
+            sum(((index >> qubit) & 1) << i for i, qubit in enumerate(permutation))
+        )
+    return tuple(sorted(new_indices))
+
+
+def test_canonical_form():
+    random.seed(0)
+    for num_qubits in [2, 3, 4, 5]:
+        for _ in range(50):
+            indices = random.sample(
+                range(2**num_qubits), random.randint(1, min(10, 2**num_qubits))
+            )
+            canonical_indices, permutation, flips = xyz.get_canonical_form(
+                indices, num_qubits
+            )
+            # the canonical form is the image of the returned labeling
+            assert _relabel(indices, permutation, flips) == canonical_indices
+
+            # and it is the same for the whole orbit
+            permutation = list(range(num_qubits))
+            random.shuffle(permutation)
+            flips = random.randrange(2**num_qubits)
+            other = _relabel(indices, permutation, flips)
+            assert xyz.get_canonical_form(other, num_qubits)[0] == canonical_indices
+
+
+def test_canonical_form_orbits():
+    # the canonical forms count the orbits exactly
+    num_qubits = 3
+    orbits = set()
+    canonical_forms = set()
+    for sparsity in range(1, 2**num_qubits + 1):
+        for indices in combinations(range(2**num_qubits), sparsity):
+            orbits.add(
+                min(
+                    _relabel(indices, permutation, flips)
+                    for permutation in permutations(range(num_qubits))
+                    for flips in range(2**num_qubits)
+                )
+            )
+            canonical_forms.add(xyz.get_canonical_form(indices, num_qubits)[0])
+    assert len(canonical_forms) == len(orbits)
+
+
+def test_canonical_form_without_flips():
+    # the canonical forms count the orbits under the qubit permutations
+    num_qubits = 3
+    orbits = set()
+    canonical_forms = set()
+    for sparsity in range(1, 2**num_qubits + 1):
+        for indices in combinations(range(2**num_qubits), sparsity):
+            orbits.add(
+                min(
+                    _relabel(indices, permutation, 0)
+                    for permutation in permutations(range(num_qubits))
+                )
+            )
+            canonical_indices, permutation, flips = xyz.get_canonical_form(
+                indices, num_qubits, with_flips=False
+            )
+            assert flips == 0
+            assert _relabel(indices, permutation, 0) == canonical_indices
+            canonical_forms.add(canonical_indices)
+    assert len(canonical_forms) == len(orbits)
+
+
+def test_canonical_fingerprint():
+    state = xyz.QState({0b001: 0.5, 0b010: 0.5, 0b100: 0.5}, 3)
+    flipped = xyz.QState({0b110: 0.5, 0b101: 0.5, 0b011: 0.5}, 3)
+    assert state.canonical_fingerprint64() == flipped.canonical_fingerprint64()
+    assert (
+        state.canonical_fingerprint64()
+        == xyz.ArrayQState.from_qstate(flipped).canonical_fingerprint64()
+    )
+    ghz_state = xyz.QState({0b000: 0.5, 0b111: 0.5}, 3)
+    assert ghz_state.canonical_fingerprint64() != state.canonical_fingerprint64()
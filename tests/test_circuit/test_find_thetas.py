@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import xyz
+
+
+def _find_thetas_dense(alphas):
+    size = len(alphas)
+    matrix = np.zeros((size, size))
+    for i in range(size):
+        for j in range(size):
+            matrix[i, j] = (-1) ** bin(i & (j ^ (j >> 1))).count("1")
+    return np.linalg.solve(matrix, alphas)
+
+
+def test_find_thetas():
+    np.random.seed(0)
+    for num_controls in range(1, 7):
+        alphas = np.random.random(1 << num_controls) * 2 * np.pi
+        thetas = xyz.find_thetas(list(alphas))
+        assert np.allclose(thetas, _find_thetas_dense(alphas))
+
+
+def test_find_thetas_batched():
+    np.random.seed(1)
+    tables = np.random.random((7, 1 << 5))
+    thetas = xyz.find_thetas(tables)
+    assert thetas.shape == tables.shape
+    for table, theta in zip(tables, thetas):
+        assert np.allclose(theta, _find_thetas_dense(table))
+    # the input is left untouched
+    assert np.allclose(tables, np.random.RandomState(1).random((7, 1 << 5)))
+
+
+def test_find_thetas_batched_transposed():
+    # a batch that is not C-ordered, one table per row of the transpose
+    np.random.seed(2)
+    tables = np.random.random((1 << 3, 4)).T
+    thetas = xyz.find_thetas(tables)
+    for table, theta in zip(tables, thetas):
+        assert np.allclose(theta, _find_thetas_dense(table))
+
+
+def test_find_thetas_large():
+    alphas = np.zeros(1 << 14)
+    alphas[5] = np.pi
+    thetas = xyz.find_thetas(alphas)
+    assert np.allclose(np.abs(thetas), np.pi / (1 << 14))
+
+
+def test_walsh_hadamard_transform_in_place():
+    array = np.random.random((3, 8))
+    hadamard = np.array([[1.0]])
+    for _ in range(3):
+        hadamard = np.kron(hadamard, [[1, 1], [1, -1]])
+    expected = array @ hadamard
+    assert xyz.walsh_hadamard_transform(array) is array
+    assert np.allclose(array, expected)
+
+    # a strided view cannot be transformed in place
+    with pytest.raises(ValueError):
+        xyz.walsh_hadamard_transform(np.random.random((8, 3)).T)
+    with pytest.raises(ValueError):
+        xyz.walsh_hadamard_transform(np.random.random(6))
@@ -0,0 +1,25 @@
+import xyz
+
+
+def test_fingerprint():
+    state = xyz.QState({0b110: 0.5, 0b001: 0.5, 0b011: 0.5, 0b100: 0.5}, 3)
+    sorted_state = xyz.QState({index: 0.5 for index in [0b001, 0b011, 0b100, 0b110]}, 3)
+
+    # the fingerprint is cached and does not depend on the insertion order
+    assert state.fingerprint() is state.fingerprint()
+    assert state.fingerprint() == sorted_state.fingerprint()
+    assert state.repr() == sorted_state.repr()
+    assert state.fingerprint64() == sorted_state.fingerprint64()
+    assert 0 <= state.fingerprint64() < 2**64
+
+    # repr no longer reorders the index set
+    state.repr()
+    assert list(state.index_set) == [0b110, 0b001, 0b011, 0b100]
+
+    # the array backend agrees with the dictionary backend
+    array_state = xyz.ArrayQState.from_qstate(state)
+    assert array_state.fingerprint() == state.fingerprint()
+    assert array_state.fingerprint64() == state.fingerprint64()
+
+    other = xyz.QState({0b000: 0.5, 0b011: 0.5, 0b101: 0.5, 0b110: 0.5}, 3)
+    assert other.fingerprint64() != state.fingerprint64()
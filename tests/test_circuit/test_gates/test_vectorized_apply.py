@@ -0,0 +1,67 @@
+import numpy as np
+import xyz
+from xyz import QBit, X, RY, CX, CRY, MCRY
+
+
+def _random_state(num_qubits: int, sparsity: int, seed: int):
+    np.random.seed(seed)
+    state_vector = np.zeros(2**num_qubits)
+    indices = np.random.choice(2**num_qubits, sparsity, replace=False)
+    state_vector[indices] = np.random.random(sparsity) - 0.5
+    return xyz.quantize_state(state_vector)
+
+
+def test_vectorized_apply():
+    gates = [
+        X(QBit(2)),
+        RY(0.3, QBit(0)),
+        RY(-np.pi, QBit(4)),
+        CX(QBit(1), True, QBit(3)),
+        CX(QBit(3), False, QBit(0)),
+        CRY(1.2, QBit(0), True, QBit(2)),
+        CRY(-0.7, QBit(4), False, QBit(1)),
+        MCRY(0.9, [QBit(0), QBit(3)], [1, 0], QBit(2)),
+        MCRY(np.pi / 2, [QBit(1), QBit(2), QBit(4)], [0, 0, 1], QBit(0)),
+    ]
+    for seed in range(5):
+        state = _random_state(num_qubits=5, sparsity=10, seed=seed)
+        array_state = xyz.ArrayQState.from_qstate(state)
+        for gate in gates:
+            # the small dictionary state takes the dictionary path
+            expected = gate.apply(state)
+            actual = gate.apply(array_state)
+            assert isinstance(actual, xyz.ArrayQState)
+            assert not isinstance(expected, xyz.ArrayQState)
+            assert xyz.is_equal(expected, actual) and xyz.is_equal(actual, expected)
+            assert np.allclose(expected.to_vector(), actual.to_vector())
+
+
+def test_vectorized_apply_large_state():
+    state = _random_state(num_qubits=8, sparsity=100, seed=0)
+    gate = MCRY(0.4, [QBit(1), QBit(5)], [1, 1], QBit(7))
+    new_state = gate.apply(state)
+    assert isinstance(new_state, xyz.ArrayQState)
+    new_state = gate.conjugate().apply(new_state)
+    assert xyz.is_equal(new_state, state) and xyz.is_equal(state, new_state)
+
+
+def test_apply_more_than_64_qubits():
+    np.random.seed(0)
+    num_qubits = 70
+    indices = {int(np.random.randint(2**62)) << 8 | i for i in range(40)}
+    weights = np.random.random(len(indices)) + 0.1
+    state = xyz.QState(dict(zip(indices, weights / np.linalg.norm(weights))), num_qubits)
+    gates = [
+        CX(QBit(69), False, QBit(66)),
+        RY(0.3, QBit(68)),
+        MCRY(0.9, [QBit(0), QBit(67)], [1, 0], QBit(65)),
+    ]
+    for gate in gates:
+        # the dictionary path handles the indices beyond 64 bits
+        new_state = gate.apply(state)
+        assert not isinstance(new_state, xyz.ArrayQState)
+        assert xyz.is_equal(gate.conjugate().apply(new_state), state)
+
+    circuit = xyz.prepare_state(state)
+    assert circuit.get_num_qubits() == num_qubits
+    assert circuit.get_cnot_cost() > 0
@@ -0,0 +1,130 @@
+import numpy as np
+import xyz
+
+
+def _rand_unitary():
+    matrix = np.random.randn(2, 2) + 1j * np.random.randn(2, 2)
+    unitary, _ = np.linalg.qr(matrix)
+    return unitary
+
+
+def _rand_circuit(num_qubits: int, num_gates: int, real: bool, gate_types=None):
+    circuit = xyz.QCircuit(num_qubits)
+    if gate_types is None:
+        gate_types = ["X", "Z", "RY", "CX", "CRY", "MCRY"]
+        if not real:
+            gate_types += ["RX", "RZ", "CRX", "CU"]
+    for _ in range(num_gates):
+        qubits = [circuit.qubit_at(i) for i in np.random.permutation(num_qubits)]
+        target, control = qubits[0], qubits[1]
+        theta = np.random.uniform(-np.pi, np.pi)
+        phase = np.random.randint(2)
+        gate_type = np.random.choice(gate_types)
+        if gate_type == "X":
+            gate = xyz.X(target)
+        elif gate_type == "Z":
+            gate = xyz.Z(target)
+        elif gate_type == "RY":
+            gate = xyz.RY(theta, target)
+        elif gate_type == "RX":
+            gate = xyz.RX(theta, target)
+        elif gate_type == "RZ":
+            gate = xyz.RZ(theta, target)
+        elif gate_type == "U":
+            gate = xyz.U(_rand_unitary(), target)
+        elif gate_type == "CX":
+            gate = xyz.CX(control, phase, target)
+        elif gate_type == "CRY":
+            gate = xyz.CRY(theta, control, phase, target)
+        elif gate_type == "CRX":
+            gate = xyz.CRX(theta, control, phase, target)
+        elif gate_type == "CU":
+            gate = xyz.CU(_rand_unitary(), control, phase, target)
+        else:
+            num_controls = np.random.randint(1, num_qubits)
+            phases = list(np.random.randint(2, size=num_controls))
+            gate = xyz.MCRY(theta, qubits[1 : num_controls + 1], phases, target)
+        circuit.append_gate(gate)
+    return circuit
+
+
+def test_simulate_statevector():
+    np.random.seed(0)
+    for real in [True, False]:
+        for num_qubits in [2, 3, 5]:
+            circuit = _rand_circuit(num_qubits, 30, real)
+            state_vector = xyz.simulate_statevector(circuit)
+            assert np.isrealobj(state_vector) == real
+            expected = xyz.simulate_circuit(circuit, backend="qiskit")
+            assert np.allclose(state_vector, expected)
+
+
+def test_simulate_unitary():
+    np.random.seed(2)
+    num_qubits = 3
+    circuit = _rand_circuit(num_qubits, 20, False, gate_types=["U", "RY", "CX"])
+
+    # apply the gates one basis state at a time
+    expected = np.zeros(1 << num_qubits, dtype=complex)
+    expected[0] = 1
+    for gate in circuit.get_gates():
+        matrix = xyz.get_gate_matrix(gate)
+        target = gate.target_qubit.index
+        new_state = np.zeros_like(expected)
+        for index, amplitude in enumerate(expected):
+            if gate.get_qgate_type() == xyz.QGateType.CX and not gate.is_enabled(index):
+                new_state[index] += amplitude
+                continue
+            bit = (index >> target) & 1
+            for new_bit in [0, 1]:
+                new_index = index ^ ((bit ^ new_bit) << target)
+                new_state[new_index] += matrix[new_bit, bit] * amplitude
+        expected = new_state
+
+    assert np.allclose(xyz.simulate_statevector(circuit), expected)
+
+
+def test_simulate_initial_state():
+    np.random.seed(1)
+    circuit = _rand_circuit(4, 20, real=True)
+    initial_state = xyz.rand_state(4, 5)
+    state_vector = xyz.simulate_statevector(circuit, initial_state)
+
+    # the circuit is linear, the basis states are mapped to its columns
+    columns = []
+    for i in range(16):
+        basis_state = np.zeros(16)
+        basis_state[i] = 1
+        columns.append(xyz.simulate_statevector(circuit, basis_state))
+    assert np.allclose(state_vector, np.array(columns).T @ initial_state)
+    assert np.allclose(columns[0], xyz.simulate_statevector(circuit))
+
+
+def test_simulate_sparse():
+    np.random.seed(3)
+    for num_qubits in [2, 3, 5]:
+        circuit = _rand_circuit(num_qubits, 30, real=True)
+        state = xyz.simulate_sparse(circuit)
+        assert np.allclose(state.to_vector(), xyz.simulate_statevector(circuit))
+
+    initial_state = xyz.QState({0b0011: 0.6, 0b1100: 0.8}, 4)
+    circuit = _rand_circuit(4, 20, real=True)
+    state = xyz.simulate_sparse(circuit, initial_state)
+    assert np.allclose(
+        state.to_vector(),
+        xyz.simulate_statevector(circuit, initial_state.to_vector()),
+    )
+
+
+def test_simulate_sparse_large():
+    # the dense simulation would need 2^32 amplitudes
+    np.random.seed(4)
+    num_qubits = 32
+    indices = np.random.randint(0, 1 << num_qubits, size=8, dtype=np.int64)
+    weights = np.random.uniform(0.5, 1.0, size=len(indices))
+    weights /= np.linalg.norm(weights)
+    target = xyz.QState(dict(zip(map(int, indices), weights)), num_qubits)
+    circuit = xyz.prepare_state(target, map_gates=True)
+    state = xyz.simulate_sparse(circuit)
+    assert state.get_sparsity() == target.get_sparsity()
+    assert xyz.is_equal(state, target)
@@ -0,0 +1,48 @@
+from math import comb
+import numpy as np
+import xyz
+
+
+def _uniform(num_qubits: int, indices) -> np.ndarray:
+    state = np.zeros(2**num_qubits)
+    indices = list(indices)
+    state[indices] = 1 / np.sqrt(len(indices))
+    return state
+
+
+def test_state_constructors():
+    for num_qubits in range(1, 7):
+        for num_bits in range(1, num_qubits + 1):
+            expected = _uniform(
+                num_qubits, [i for i in range(2**num_qubits) if bin(i).count("1") == num_bits]
+            )
+            assert np.allclose(xyz.D_state(num_qubits, num_bits), expected)
+        assert np.allclose(xyz.W_state(num_qubits), _uniform(num_qubits, [2**i for i in range(num_qubits)]))
+        assert np.allclose(xyz.GHZ_state(num_qubits), _uniform(num_qubits, [0, 2**num_qubits - 1]))
+        assert np.allclose(xyz.QBA_state(num_qubits, 3), _uniform(num_qubits, range(min(3, 2**num_qubits))))
+
+
+def test_sparse_state_constructors():
+    for num_qubits in range(2, 7):
+        for dense, sparse in [
+            (xyz.D_state(num_qubits, 2), xyz.D_state(num_qubits, 2, sparse=True)),
+            (xyz.W_state(num_qubits), xyz.W_state(num_qubits, sparse=True)),
+            (xyz.GHZ_state(num_qubits), xyz.GHZ_state(num_qubits, sparse=True)),
+            (xyz.QBA_state(num_qubits, 3), xyz.QBA_state(num_qubits, 3, sparse=True)),
+        ]:
+            assert isinstance(sparse, xyz.ArrayQState)
+            assert sparse == xyz.quantize_state(dense)
+
+
+def test_sparse_dicke_state_large():
+    state = xyz.D_state(40, 3, sparse=True)
+    assert state.get_sparsity() == comb(40, 3)
+    assert np.all(np.diff(state.indices.astype(np.int64)) > 0)
+    assert all(bin(index).count("1") == 3 for index in state.indices.tolist())
+
+
+def test_quantize_state():
+    state_vector = np.array([0.5, 0, 1e-9, -0.5, 0.5, 0, 0, 0.5])
+    state = xyz.quantize_state(state_vector)
+    assert state.index_to_weight == {0: 0.5, 3: -0.5, 4: 0.5, 7: 0.5}
+    assert state.num_qubits == 3
@@ -0,0 +1,56 @@
+import random
+import sys
+import numpy as np
+import xyz
+
+prepare_state_module = sys.modules["xyz.algorithms.initialization.prepare_state"]
+
+
+def test_verify_state_preparation():
+    np.random.seed(0)
+    random.seed(0)
+    for num_qubits, sparsity in [(3, 4), (6, 20), (10, 40)]:
+        state = xyz.quantize_state(xyz.rand_state(num_qubits, sparsity))
+        circuit = xyz.prepare_state(
+            state,
+            map_gates=True,
+            param=prepare_state_module.__Params(EXACT_SYNTHESIS_NODE_BUDGET=5),
+        )
+        result = xyz.verify_state_preparation(circuit, state)
+        assert result.is_equal
+        assert np.isclose(result.fidelity, 1)
+        assert result.failed_gate_index is None
+
+        # the same circuit does not prepare another state
+        other_state = xyz.quantize_state(xyz.rand_state(num_qubits, sparsity))
+        assert not xyz.verify_state_preparation(circuit, other_state)
+
+
+def test_verify_state_preparation_large():
+    # the dense simulation would need 2^40 amplitudes
+    np.random.seed(1)
+    num_qubits = 40
+    indices = np.random.randint(0, 1 << num_qubits, size=8, dtype=np.int64)
+    weights = np.random.uniform(0.5, 1.0, size=len(indices))
+    weights /= np.linalg.norm(weights)
+    state = xyz.QState(dict(zip(map(int, indices), weights)), num_qubits)
+    circuit = xyz.prepare_state(state, map_gates=True)
+    assert xyz.verify_state_preparation(circuit, state)
+
+
+def test_verify_state_preparation_max_sparsity():
+    # H on every qubit, the state spreads over all the basis states
+    num_qubits = 4
+    circuit = xyz.QCircuit(num_qubits)
+    for i in range(num_qubits):
+        circuit.add_gate(xyz.RY(np.pi / 2, circuit.qubit_at(i)))
+    state = xyz.QState({i: 0.25 for i in range(1 << num_qubits)}, num_qubits)
+    assert xyz.verify_state_preparation(circuit, state)
+
+    # pushed backward, the uniform state collapses one qubit at a time
+    circuit.add_gate(xyz.X(circuit.qubit_at(0)))
+    ground_state = xyz.QState({0b0001: 1.0}, num_qubits)
+    result = xyz.verify_state_preparation(circuit, ground_state, max_sparsity=3)
+    assert not result.is_equal
+    assert result.failed_gate_index == 2
+    assert result.fidelity is None
@@ -0,0 +1,128 @@
+import struct
+import numpy as np
+import pytest
+import xyz
+
+
+def _rand_unitary():
+    matrix = np.random.randn(2, 2) + 1j * np.random.randn(2, 2)
+    unitary, _ = np.linalg.qr(matrix)
+    return unitary
+
+
+def _rand_circuit(num_qubits: int, num_gates: int) -> xyz.QCircuit:
+    circuit = xyz.QCircuit(num_qubits)
+    for _ in range(num_gates):
+        qubits = [circuit.qubit_at(i) for i in np.random.permutation(num_qubits)]
+        target, control = qubits[0], qubits[1]
+        theta = np.random.uniform(-np.pi, np.pi)
+        phase = np.random.randint(2)
+        gate_type = np.random.choice(
+            ["X", "Z", "RX", "RY", "RZ", "U", "CX", "CRX", "CRY", "CRZ", "CU", "MCRY"]
+        )
+        if gate_type == "X":
+            gate = xyz.X(target)
+        elif gate_type == "Z":
+            gate = xyz.Z(target)
+        elif gate_type == "RX":
+            gate = xyz.RX(theta, target)
+        elif gate_type == "RY":
+            gate = xyz.RY(theta, target)
+        elif gate_type == "RZ":
+            gate = xyz.RZ(theta, target)
+        elif gate_type == "U":
+            gate = xyz.U(_rand_unitary(), target)
+        elif gate_type == "CX":
+            gate = xyz.CX(control, phase, target)
+        elif gate_type == "CRX":
+            gate = xyz.CRX(theta, control, phase, target)
+        elif gate_type == "CRY":
+            gate = xyz.CRY(theta, control, phase, target)
+        elif gate_type == "CRZ":
+            gate = xyz.CRZ(theta, control, phase, target)
+        elif gate_type == "CU":
+            gate = xyz.CU(_rand_unitary(), control, phase, target)
+        else:
+            num_controls = np.random.randint(2, num_qubits)
+            phases = list(np.random.randint(2, size=num_controls))
+            gate = xyz.MCRY(theta, qubits[1 : num_controls + 1], phases, target)
+        circuit.append_gate(gate)
+    return circuit
+
+
+def test_binary_circuit(tmp_path):
+    np.random.seed(0)
+    for num_qubits in [3, 5]:
+        circuit = _rand_circuit(num_qubits, 40)
+        filename = str(tmp_path / f"circuit_{num_qubits}.bin")
+        xyz.write_binary_circuit(circuit, filename)
+        for mmap in [True, False]:
+            new_circuit = xyz.read_binary_circuit(filename, mmap=mmap)
+            assert new_circuit.get_num_qubits() == num_qubits
+
+            # the summaries are computed on the arrays
+            assert new_circuit.num_gates() == circuit.num_gates()
+            assert new_circuit.num_gates(xyz.QGateType.MCRY) == circuit.num_gates(
+                xyz.QGateType.MCRY
+            )
+            assert new_circuit.get_cnot_cost() == circuit.get_cnot_cost()
+            assert str(new_circuit.gate_at(3)) == str(circuit.gate_at(3))
+
+            assert np.allclose(
+                xyz.simulate_statevector(new_circuit), xyz.simulate_statevector(circuit)
+            )
+            assert len(new_circuit.get_gates()) == len(circuit.get_gates())
+
+
+def test_array_qcircuit():
+    circuit = xyz.QCircuit(3)
+    q = circuit.qubit_at
+    circuit.append_gate(xyz.MCRY(0.5, [q(2), q(0)], [1, 0], q(1)))
+    circuit.append_gate(xyz.CX(q(1), 0, q(2)))
+    array_circuit = xyz.ArrayQCircuit.from_qcircuit(circuit)
+    assert list(array_circuit.control_masks) == [0b101, 0b010]
+    assert list(array_circuit.phase_masks) == [0b100, 0b000]
+
+    # the controls of the MCRY are sorted by qubit index
+    gate = array_circuit.gate_at(0)
+    assert [qubit.index for qubit in gate.control_qubits] == [0, 2]
+    assert list(gate.phases) == [0, 1]
+
+    # the gates are created before the circuit is modified
+    array_circuit.add_gate(xyz.X(q(0)))
+    assert array_circuit.num_gates() == 3
+    assert array_circuit.to_qcircuit().get_cnot_cost() == circuit.get_cnot_cost()
+
+
+def test_binary_circuit_corrupted(tmp_path):
+    circuit = xyz.QCircuit(2)
+    circuit.append_gate(xyz.CX(circuit.qubit_at(0), 1, circuit.qubit_at(1)))
+    filename = str(tmp_path / "circuit.bin")
+    xyz.write_binary_circuit(circuit, filename)
+    with open(filename, "rb") as f:
+        data = f.read()
+    with open(filename, "wb") as f:
+        f.write(data[:-1])
+    with pytest.raises(ValueError):
+        xyz.read_binary_circuit(filename)
+
+
+def test_binary_circuit_map_gates(tmp_path):
+    for map_gates in [False, True]:
+        circuit = xyz.QCircuit(2, map_gates=map_gates)
+        circuit.append_gate(xyz.CX(circuit.qubit_at(0), 1, circuit.qubit_at(1)))
+        filename = str(tmp_path / f"circuit_{map_gates}.bin")
+        xyz.write_binary_circuit(circuit, filename)
+        new_circuit = xyz.read_binary_circuit(filename)
+        assert new_circuit.map_gates == map_gates
+        assert new_circuit.to_qcircuit().map_gates == map_gates
+
+    # the files of version 1 have no flags and are still read
+    with open(filename, "rb") as f:
+        data = f.read()
+    header = struct.pack("<8sIIQQ", data[:8], 1, 2, 1, 0)
+    with open(filename, "wb") as f:
+        f.write(header + data[40:])
+    new_circuit = xyz.read_binary_circuit(filename)
+    assert not new_circuit.map_gates
+    assert new_circuit.get_cnot_cost() == 1
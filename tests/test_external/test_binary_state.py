@@ -0,0 +1,51 @@
+import random
+import numpy as np
+import pytest
+import xyz
+
+
+def _rand_states(num_states: int):
+    states = []
+    for i in range(num_states):
+        num_qubits = 3 + i % 4
+        state_vector = xyz.rand_state(num_qubits, 1 + i % (1 << num_qubits))
+        states.append(xyz.quantize_state(state_vector))
+    return states
+
+
+def test_binary_state(tmp_path):
+    np.random.seed(0)
+    random.seed(0)
+    for state in _rand_states(5):
+        filename = str(tmp_path / "state.npz")
+        xyz.write_binary_state(state, filename)
+        new_state = xyz.read_binary_state(filename)
+        assert isinstance(new_state, xyz.ArrayQState)
+        assert new_state.num_qubits == state.num_qubits
+        assert new_state.index_to_weight == state.index_to_weight
+
+
+def test_iter_binary_states(tmp_path):
+    np.random.seed(1)
+    random.seed(1)
+    states = _rand_states(10)
+
+    # an archive, and a directory of archives read by file name
+    assert xyz.write_binary_states(states, str(tmp_path / "states.npz"), compress=True) == 10
+    directory = tmp_path / "states"
+    directory.mkdir()
+    xyz.write_binary_states(states[4:], str(directory / "b.npz"))
+    xyz.write_binary_states(states[:4], str(directory / "a.npz"))
+    (directory / "README").write_text("not a state")
+
+    for path in [tmp_path / "states.npz", directory]:
+        new_states = xyz.iter_binary_states(str(path))
+        assert not isinstance(new_states, list)
+        new_states = list(new_states)
+        assert len(new_states) == len(states)
+        for state, new_state in zip(states, new_states):
+            assert new_state.num_qubits == state.num_qubits
+            assert new_state.index_to_weight == state.index_to_weight
+
+    with pytest.raises(ValueError):
+        xyz.read_binary_state(str(tmp_path / "states.npz"))
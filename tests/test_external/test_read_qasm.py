@@ -0,0 +1,94 @@
+import sys
+import numpy as np
+import xyz
+
+write_qasm_module = sys.modules["xyz.external.write_qasm"]
+
+
+def _rand_circuit(num_qubits: int, num_gates: int) -> xyz.QCircuit:
+    circuit = xyz.QCircuit(num_qubits)
+    for _ in range(num_gates):
+        qubits = [circuit.qubit_at(i) for i in np.random.permutation(num_qubits)]
+        theta = np.random.uniform(-np.pi, np.pi)
+        phase = np.random.randint(2)
+        gate_type = np.random.choice(["X", "RY", "CX", "CRY", "MCRY"])
+        if gate_type == "X":
+            gate = xyz.X(qubits[0])
+        elif gate_type == "RY":
+            gate = xyz.RY(theta, qubits[0])
+        elif gate_type == "CX":
+            gate = xyz.CX(qubits[1], phase, qubits[0])
+        elif gate_type == "CRY":
+            gate = xyz.CRY(theta, qubits[1], phase, qubits[0])
+        else:
+            num_controls = np.random.randint(2, num_qubits)
+            phases = list(np.random.randint(2, size=num_controls))
+            gate = xyz.MCRY(theta, qubits[1 : num_controls + 1], phases, qubits[0])
+        circuit.add_gate(gate)
+    return circuit
+
+
+def test_read_qasm(tmp_path):
+    np.random.seed(0)
+    for num_qubits in [3, 4, 5]:
+        circuit = _rand_circuit(num_qubits, 30)
+        filename = str(tmp_path / f"circuit_{num_qubits}.qasm")
+        write_qasm_module.write_qasm(circuit, filename)
+
+        new_circuit = xyz.read_qasm(filename)
+        assert new_circuit.get_num_qubits() == num_qubits
+        assert new_circuit.get_cnot_cost() == circuit.get_cnot_cost()
+        assert np.allclose(
+            xyz.simulate_statevector(new_circuit), xyz.simulate_statevector(circuit)
+        )
+
+
+def test_parse_qasm():
+    program = """OPENQASM 2.0;
+include "qelib1.inc";
+// a custom gate, inlined from its definition
+gate swap_ry(theta) a, b {
+    cx a, b; cx b, a;
+    cx a, b;
+    ry(theta / 2) b;
+}
+qreg a[1];
+qreg b[2];
+creg c[3];
+x a[0]; ry(-pi/2)
+    b[1];
+cx_o0 b[1],
+    b[0];  // an open control
+swap_ry(2*pi) a[0], b[0];
+u(pi, 0, pi) b[1];
+barrier a[0], b[0];
+measure a[0] -> c[0];
+"""
+    circuit = xyz.parse_qasm(program.splitlines(keepends=True))
+    assert circuit.get_num_qubits() == 3
+    gate_types = [gate.get_qgate_type() for gate in circuit.get_gates()]
+    assert gate_types == [xyz.QGateType.X, xyz.QGateType.RY] + [xyz.QGateType.CX] * 4 + [
+        xyz.QGateType.RY,
+        xyz.QGateType.U,
+    ]
+    swap_gates = circuit.get_gates()[3:6]
+    assert [gate.target_qubit.index for gate in swap_gates] == [1, 0, 1]
+    assert np.isclose(circuit.get_gates()[6].theta, np.pi)
+
+    expected = np.zeros(8)
+    expected[0b000] = expected[0b101] = np.sqrt(0.5)
+    assert np.allclose(np.abs(xyz.simulate_statevector(circuit)), expected)
+
+
+def test_read_qasm_files(tmp_path):
+    filenames = []
+    for i in range(3):
+        filename = str(tmp_path / f"circuit_{i}.qasm")
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(f'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[{i + 1}];\nx q[{i}];\n')
+        filenames.append(filename)
+    for i, (filename, circuit, parse_time) in enumerate(xyz.read_qasm_files(filenames)):
+        assert filename == filenames[i]
+        assert circuit.get_num_qubits() == i + 1
+        assert circuit.get_gates()[0].target_qubit.index == i
+        assert parse_time >= 0
@@ -0,0 +1,144 @@
+import sys
+import numpy as np
+import xyz
+
+write_qasm_module = sys.modules["xyz.external.write_qasm"]
+
+
+def _rand_unitary():
+    matrix = np.random.randn(2, 2) + 1j * np.random.randn(2, 2)
+    unitary, _ = np.linalg.qr(matrix)
+    return unitary
+
+
+def _rand_circuit(num_qubits: int, num_gates: int) -> xyz.QCircuit:
+    circuit = xyz.QCircuit(num_qubits)
+    for _ in range(num_gates):
+        qubits = [circuit.qubit_at(i) for i in np.random.permutation(num_qubits)]
+        target, control = qubits[0], qubits[1]
+        theta = np.random.uniform(-np.pi, np.pi)
+        phase = np.random.randint(2)
+        gate_type = np.random.choice(
+            ["X", "Z", "RX", "RY", "RZ", "U", "CX", "CRX", "CRY", "CRZ", "CU", "MCRY"]
+        )
+        if gate_type == "X":
+            gate = xyz.X(target)
+        elif gate_type == "Z":
+            gate = xyz.Z(target)
+        elif gate_type == "RX":
+            gate = xyz.RX(theta, target)
+        elif gate_type == "RY":
+            gate = xyz.RY(theta, target)
+        elif gate_type == "RZ":
+            gate = xyz.RZ(theta, target)
+        elif gate_type == "U":
+            gate = xyz.U(_rand_unitary(), target)
+        elif gate_type == "CX":
+            gate = xyz.CX(control, phase, target)
+        elif gate_type == "CRX":
+            gate = xyz.CRX(theta, control, phase, target)
+        elif gate_type == "CRY":
+            gate = xyz.CRY(theta, control, phase, target)
+        elif gate_type == "CRZ":
+            gate = xyz.CRZ(theta, control, phase, target)
+        elif gate_type == "CU":
+            gate = xyz.CU(_rand_unitary(), control, phase, target)
+        else:
+            num_controls = np.random.randint(2, num_qubits)
+            phases = list(np.random.randint(2, size=num_controls))
+            gate = xyz.MCRY(theta, qubits[1 : num_controls + 1], phases, target)
+        circuit.append_gate(gate)
+    return circuit
+
+
+def _is_equal_up_to_phase(state_vector, other_state_vector) -> bool:
+    return np.isclose(np.abs(np.vdot(state_vector, other_state_vector)), 1)
+
+
+def test_write_qasm(tmp_path):
+    np.random.seed(0)
+    for num_qubits in [3, 4, 5]:
+        circuit = _rand_circuit(num_qubits, 40)
+        filename = str(tmp_path / f"circuit_{num_qubits}.qasm")
+        xyz.write_qasm(circuit, filename)
+
+        new_circuit = xyz.read_qasm(filename)
+        assert _is_equal_up_to_phase(
+            xyz.simulate_statevector(new_circuit), xyz.simulate_statevector(circuit)
+        )
+
+
+def test_write_qasm_qiskit():
+    # the definitions in the header are valid for qiskit
+    from qiskit import qasm2
+    from qiskit.quantum_info import Statevector
+
+    np.random.seed(1)
+    circuit = _rand_circuit(5, 40)
+    qc = qasm2.loads(xyz.to_qasm(circuit))
+    assert _is_equal_up_to_phase(
+        Statevector(qc).data, xyz.simulate_statevector(circuit)
+    )
+
+
+def test_write_qasm_gzip(tmp_path, monkeypatch):
+    # the statements are written over several chunks
+    monkeypatch.setattr(write_qasm_module, "CHUNK_SIZE", 7)
+    np.random.seed(2)
+    circuit = _rand_circuit(4, 50)
+    filename = str(tmp_path / "circuit.qasm.gz")
+    xyz.write_qasm(circuit, filename)
+    with open(filename, "rb") as f:
+        assert f.read(2) == b"\x1f\x8b"
+    assert _is_equal_up_to_phase(
+        xyz.simulate_statevector(xyz.read_qasm(filename)),
+        xyz.simulate_statevector(circuit),
+    )
+
+
+def test_dump_qasm_streaming(monkeypatch):
+    # a chunk is written before the statements of the next gates are formatted
+    monkeypatch.setattr(write_qasm_module, "CHUNK_SIZE", 10)
+    num_formatted = []
+    qasm2_statement = write_qasm_module._qasm2_statement
+
+    def _qasm2_statement(gate, precision):
+        num_formatted.append(gate)
+        return qasm2_statement(gate, precision)
+
+    class _Writer:
+        def __init__(self):
+            self.num_formatted_at_write = []
+
+        def write(self, text):
+            self.num_formatted_at_write.append(len(num_formatted))
+
+    monkeypatch.setattr(write_qasm_module, "_qasm2_statement", _qasm2_statement)
+    np.random.seed(4)
+    circuit = _rand_circuit(4, 100)
+    writer = _Writer()
+    xyz.dump_qasm(circuit, writer)
+    assert len(num_formatted) == 100
+    assert writer.num_formatted_at_write[0] < 10
+    assert len(writer.num_formatted_at_write) > 10
+
+
+def test_to_qasm3():
+    circuit = xyz.QCircuit(3)
+    q = circuit.qubit_at
+    circuit.append_gate(xyz.X(q(0)))
+    circuit.append_gate(xyz.CX(q(0), 0, q(1)))
+    circuit.append_gate(xyz.CRY(0.5, q(1), 1, q(2)))
+    circuit.append_gate(xyz.MCRY(-0.25, [q(0), q(1)], [1, 0], q(2)))
+    assert xyz.to_qasm(circuit, version=3) == "\n".join(
+        [
+            "OPENQASM 3.0;",
+            'include "stdgates.inc";',
+            "qubit[3] q;",
+            "x q[0];",
+            "negctrl @ x q[0], q[1];",
+            "cry(0.5) q[1], q[2];",
+            "ctrl @ negctrl @ ry(-0.25) q[0], q[1], q[2];",
+            "",
+        ]
+    )
@@ -0,0 +1,5 @@
+import sys
+from xyz.algorithms.initialization.qsp_database import qsp_database_cli
+
+if __name__ == "__main__":
+    sys.exit(qsp_database_cli())
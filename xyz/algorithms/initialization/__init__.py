@@ -1,5 +1,7 @@
 from .prepare_state import *
 from .n_flow import *
 from .sparse_state_synthesis import *
+from .qsp_database_builder import *
+from .qsp_database import *
 from .exact_cnot_synthesis import *
 from .deterministic_dicke_state import *
@@ -1,156 +1,26 @@
-from queue import PriorityQueue
-import pickle
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from xyz.circuit import QState, from_set, QCircuit, CX, CRY, get_ap_cry_angles
-from .support_reduction import support_reduction
+from xyz.circuit import QState, QCircuit, QBit, QGateType, CX, CRY, get_ap_cry_angles
+from .support_reduction import support_reduction, x_reduction
+from .qsp_database import QSPDatabase
+from .qsp_database_builder import build_qsp_database
 
 
-class QSPDatabase:
-    N_QUBIT_MAX: int = 4
+class SynthesisBudgetExceeded(ValueError):
+    """Raised when the exact synthesis runs out of time or nodes.
 
-    def __init__(self, verbose_level: int = 0) -> None:
-        self.verbose_level = verbose_level
-        self.databases = {}
-
-    @staticmethod
-    def get_db_filename(n_qubits: int):
-        return f"qsp_db_{n_qubits}.pkl"
-
-    def load_database(self, n_qubits: int):
-        try:
-            with open(self.get_db_filename(n_qubits), "rb") as f:
-                self.databases[n_qubits] = pickle.load(f)
-        except FileNotFoundError:
-            self.init_database(n_qubits)
-            self.save_database(n_qubits)
-
-    def lookup(self, state: QState):
-        num_qubits = state.num_qubits
-        if num_qubits > self.N_QUBIT_MAX:
-            return 0
-        if num_qubits not in self.databases:
-            # load the database
-            self.load_database(state.num_qubits)
-        assert num_qubits in self.databases
-        assert state.repr() in self.databases[num_qubits], f"{state.repr()}"
-        return self.databases[num_qubits][state.repr()]
-
-    def save_database(self, n_qubits: int):
-        with open(self.get_db_filename(n_qubits), "wb") as f:
-            pickle.dump(self.databases[n_qubits], f)
-
-    @staticmethod
-    def get_repr(index_set: set, n_qubits: int):
-        qstate = from_set(index_set, n_qubits)
-        return qstate.repr()
-
-    @staticmethod
-    def get_next_set(index_set: set, n_qubits: int):
-        ret = []
-
-        # try X gate
-        for qubit in range(n_qubits):
-            new_set = set()
-            for index in index_set:
-                new_set.add(index ^ (1 << qubit))
-            ret.append([new_set, 0])
-
-        # try Ry gate
-        for qubit in range(n_qubits):
-            new_set = set()
-            is_valid: bool = True
-            for index in index_set:
-                ridx = index ^ (1 << qubit)
-                if ridx in index_set:
-                    # this is not an AP transition
-                    is_valid = False
-                    break
-                new_set.add(index)
-                new_set.add(index ^ (1 << qubit))
-            if is_valid:
-                ret.append([new_set, 0])
-
-        # try CX gate
-        for control_qubit in range(n_qubits):
-            for target_qubit in range(n_qubits):
-                if control_qubit == target_qubit:
-                    continue
-                for phase in [True, False]:
-                    new_set = set()
-                    for index in index_set:
-                        if (index >> control_qubit) & 1 == phase:
-                            new_set.add(index ^ (1 << target_qubit))
-                        else:
-                            new_set.add(index)
-                    ret.append([new_set, 1])
-
-        # try CRY gate
-        for control_qubit in range(n_qubits):
-            for target_qubit in range(n_qubits):
-                if control_qubit == target_qubit:
-                    continue
-                for phase in [True, False]:
-                    new_set = set()
-                    is_valid = True
-                    for index in index_set:
-                        if (index >> control_qubit) & 1 == phase:
-                            ridx = index ^ (1 << target_qubit)
-                            if ridx in index_set:
-                                # this is not an AP transition
-                                is_valid = False
-                                break
-                            new_set.add(index)
-                            new_set.add(index ^ (1 << target_qubit))
-                        else:
-                            new_set.add(index)
-                    if is_valid:
-                        ret.append([new_set, 2])
-        return ret
-
-    def init_database(self, n_qubits: int):
-        database = {}
-
-        if self.verbose_level >= 1:
-            print("Initializing database...")
-
-        enqueued_set = {}
-        visited_repr = set()
-        queue = PriorityQueue()
-        queue.put([0, set([0])])
-
-        while not queue.empty():
-            if self.verbose_level >= 1:
-                if len(database) % 100 == 0:
-                    print(
-                        f"Database size: {len(database)}, Queue size: {queue.qsize()}, Enqueued size: {len(enqueued_set)}"
-                    )
-
-            curr_cost, curr_set = queue.get()
-            curr_repr = self.get_repr(curr_set, n_qubits)
+    The exception carries the best partial reduction found so far: the gates
+    prepare the target state from the intermediate state, so the caller only
+    needs to prepare the intermediate state to complete the circuit.
+    """
 
-            visited_repr.add(curr_repr)
-
-            if curr_repr in database:
-                continue
-
-            if curr_repr not in database:
-                database[curr_repr] = curr_cost
-
-            for next_set, cnot_cost in self.get_next_set(curr_set, n_qubits):
-                next_repr = self.get_repr(next_set, n_qubits)
-                if next_repr in visited_repr:
-                    continue
-                if next_repr in enqueued_set:
-                    if enqueued_set[next_repr] <= curr_cost:
-                        continue
-                enqueued_set[next_repr] = curr_cost + cnot_cost
-                queue.put([curr_cost + cnot_cost, next_set])
-
-        if self.verbose_level >= 1:
-            print("Database initialized.")
-            print(f"Database size: {len(database)}")
-
-        self.databases[n_qubits] = database
+    def __init__(self, message: str, state: QState, gates: list) -> None:
+        super().__init__(message)
+        self.state = state
+        self.gates = gates
+        self.cnot_cost = sum([gate.get_cnot_cost() for gate in gates])
 
 
 class AStarCost:
@@ -168,54 +38,114 @@ class AStarCost:
         return f"{self.cnot_cost}(+{self.lower_bound})"
 
 
+class OpenList:
+    """The open list of the A* search.
+
+    A binary heap (heapq) keyed on plain integer tuples instead of a locked
+    PriorityQueue comparing AStarCost objects. Entries are ordered by f-cost,
+    then by g-cost, then by a tie-breaker that favors the most recently pushed
+    entry, which makes the search order deterministic.
+
+    Decrease-key is implemented by lazy deletion: pushing a key again leaves
+    the previous entry in the heap, and it is skipped (and counted as stale)
+    when it reaches the top.
+    """
+
+    def __init__(self) -> None:
+        self._heap = []
+        self._live_entries = {}
+        self._num_pushed: int = 0
+        self.num_stale: int = 0
+
+    def __len__(self) -> int:
+        return len(self._live_entries)
+
+    def empty(self) -> bool:
+        """Returns True if there is no live entry left."""
+        return len(self._live_entries) == 0
+
+    def push(self, key, cost: AStarCost, state: QState):
+        """Push a state, replacing the previous entry of the same key."""
+        self._num_pushed += 1
+        tie_breaker = -self._num_pushed
+        self._live_entries[key] = tie_breaker
+        f_cost = cost.cnot_cost + cost.lower_bound
+        heapq.heappush(
+            self._heap, (f_cost, cost.cnot_cost, tie_breaker, key, cost, state)
+        )
+
+    def pop(self):
+        """Pop the live entry with the lowest cost."""
+        while self._heap:
+            _, _, tie_breaker, key, cost, state = heapq.heappop(self._heap)
+            if self._live_entries.get(key) != tie_breaker:
+                # this entry has been replaced by a cheaper one
+                self.num_stale += 1
+                continue
+            del self._live_entries[key]
+            return cost, state
+        raise IndexError("pop from an empty open list")
+
+
+def compress_supports(state: QState) -> QState:
+    """Remove the qubits that are constant in all the basis states."""
+    sub_index_to_weight = {}
+    supports = state.get_supports()
+    num_supports = len(supports)
+    if num_supports == state.num_qubits:
+        return state
+    for index, weight in state.index_to_weight.items():
+        new_index: int = 0
+        for i, support in enumerate(supports):
+            if index & (1 << support) != 0:
+                new_index |= 1 << i
+        sub_index_to_weight[new_index] = weight
+    return QState(sub_index_to_weight, num_supports)
+
+
 class Explorer:
     def __init__(self, verbose_level: int = 0):
         # now we start the search
         self.visited_states = set()
-        self.state_queue = PriorityQueue()
+        self.state_queue = OpenList()
         self.enqueued = {}
         self.record = {}
         self.verbose_level = verbose_level
         self.enqueued_states_of_cost = {}
         self.qsp_database = QSPDatabase(verbose_level)
+        self.lower_bounds = {}
 
     def get_lower_bound(self, state: QState):
-        sub_index_to_weight = {}
-        old_to_new_qubit_mapping = {}
-        supports = state.get_supports()
-        num_supports = len(supports)
-        if num_supports != state.num_qubits:
-            for new_index, old_index in enumerate(supports):
-                old_to_new_qubit_mapping[old_index] = new_index
-            for index, weight in state.index_to_weight.items():
-                new_index: int = 0
-                for i, support in enumerate(supports):
-                    if index & (1 << support) != 0:
-                        new_index |= 1 << i
-                sub_index_to_weight[new_index] = weight
-            new_state = QState(sub_index_to_weight, num_supports)
-            return self.qsp_database.lookup(new_state)
-        return self.qsp_database.lookup(state)
+        # the lower bound only depends on the index set, which is shared by
+        # many states (e.g. the two CRY angles of the same transition)
+        index_set = frozenset(state.index_set)
+        if index_set not in self.lower_bounds:
+            self.lower_bounds[index_set] = self._get_lower_bound(state)
+        return self.lower_bounds[index_set]
+
+    def _get_lower_bound(self, state: QState):
+        return self.qsp_database.lookup(compress_supports(state))
 
     def add_state(self, state: QState, cost: AStarCost = None):
         if cost is None:
             cost = AStarCost(0, self.get_lower_bound(state))
-        self.state_queue.put((cost, state))
-        self.enqueued[state.repr()] = cost
+        key = state.canonical_fingerprint64(with_weights=True)
+        self.state_queue.push(key, cost, state)
+        self.enqueued[key] = cost
 
     def reset(self):
-        self.state_queue = PriorityQueue()
+        self.state_queue = OpenList()
         self.enqueued = {}
         self.visited_states = set()
 
     def visit_state(self, state: QState):
-        self.visited_states.add(state.repr())
+        self.visited_states.add(state.canonical_fingerprint64(with_weights=True))
 
     def is_done(self):
         return self.state_queue.empty()
 
     def get_state(self):
-        return self.state_queue.get()
+        return self.state_queue.pop()
 
     def get_n_front(self, n_cnot: int):
         if n_cnot not in self.enqueued_states_of_cost:
@@ -223,7 +153,8 @@ class Explorer:
         return self.enqueued_states_of_cost[n_cnot]
 
     def report(self):
-        print(f"queue size: {self.state_queue.qsize()}")
+        print(f"queue size: {len(self.state_queue)}")
+        print(f"stale entries skipped: {self.state_queue.num_stale}")
         print(f"visited states: {len(self.visited_states)}")
         print(f"enqueued states: {len(self.enqueued)}")
 
@@ -240,23 +171,52 @@ class Explorer:
             for gate in gates[::-1]:
                 next_state = gate.conjugate().apply(curr_state)
 
-        cnot_cost = sum([gate.get_cnot_cost() for gate in gates])
-        next_cost = AStarCost(
-            curr_cost.cnot_cost + cnot_cost,
+        # the states equal up to qubit permutations and X gates need the same
+        # number of CNOTs, they are merged
+        repr_next = next_state.canonical_fingerprint64(with_weights=True)
+
+        # we skip the state if it is already visited
+        if repr_next in self.visited_states:
+            return None
+
+        return self.explore_transition(
+            curr_state,
+            gates,
+            curr_cost,
+            repr_next,
             self.get_lower_bound(next_state),
+            lambda: next_state,
         )
-        repr_next = next_state.repr()
+
+    def explore_transition(
+        self,
+        curr_state: QState,
+        gates: list,
+        curr_cost: AStarCost,
+        repr_next: int,
+        lower_bound: int,
+        make_next_state,
+    ) -> QState:
+        """Explore a transition whose key and lower bound are already known.
+
+        The next state is only built, by calling make_next_state, if it is
+        enqueued.
+        """
 
         # we skip the state if it is already visited
         if repr_next in self.visited_states:
             return None
 
+        cnot_cost = sum([gate.get_cnot_cost() for gate in gates])
+        next_cost = AStarCost(curr_cost.cnot_cost + cnot_cost, lower_bound)
+
         # we skip the state if it is already enquened and the cost is higher
         if repr_next in self.enqueued and next_cost >= self.enqueued[repr_next]:
             return None
 
         # now we add the state to the queue
-        self.state_queue.put((next_cost, next_state))
+        next_state = make_next_state()
+        self.state_queue.push(repr_next, next_cost, next_state)
         self.enqueued[repr_next] = next_cost
 
         if next_cost.cnot_cost not in self.enqueued_states_of_cost:
@@ -270,7 +230,10 @@ class Explorer:
         if self.verbose_level >= 3:
             gates_str = ", ".join([str(gate) for gate in gates_to_record])
             print(f"recording [{next_state}] <- {curr_state}, gate: {gates_str}")
-        self.record[hash(next_state)] = hash(curr_state), gates_to_record
+        self.record[repr_next] = (
+            curr_state.canonical_fingerprint64(with_weights=True),
+            gates_to_record,
+        )
         return next_state
 
 
@@ -278,9 +241,10 @@ def get_state_transitions(circuit: QCircuit, curr_state: QState, supports: list
     if supports is None:
         supports = curr_state.get_supports()
 
-    # try dependency analysis
+    # try dependency analysis, X gates alone do not change the canonical form
+    # and would lead back to a visited state
     new_state, gates = support_reduction(circuit, curr_state)
-    if len(gates) > 0:
+    if any(gate.get_qgate_type() != QGateType.X for gate in gates):
         return [[new_state, gates]]
 
     # apply CRY
@@ -346,11 +310,21 @@ def get_state_transitions(circuit: QCircuit, curr_state: QState, supports: list
 N_FRONT_MAX = 1e7
 N_ENQUEUED_MAX = 1e6
 
+# the number of states expanded at once by the parallel search
+PARALLEL_BATCH_SIZE: int = 64
+
+# the CNOT depth of the forward frontier when no table covers the state
+BIDIRECTIONAL_FORWARD_DEPTH: int = 4
+
+# the forward frontiers already computed by this process, keyed by the number
+# of qubits and the depth
+_FORWARD_FRONTIERS: dict = {}
+
 
 def backtrace(state: QState, record: dict):
     gates = []
     backtraced_states: set = set()
-    curr_hash = hash(state)
+    curr_hash = state.canonical_fingerprint64(with_weights=True)
     while curr_hash in record:
         if curr_hash in backtraced_states:
             raise ValueError("Loop found")
@@ -362,25 +336,264 @@ def backtrace(state: QState, record: dict):
     return gates
 
 
+class ForwardExplorer:
+    """The forward half of the bidirectional search.
+
+    The index sets reachable from the ground state are explored forward, layer
+    by layer, with the transitions of QSPDatabase.get_next_set. A state of the
+    backward search meets the forward frontier when its index set (with the
+    constant qubits removed) is in one of the layers. The forward gates are
+    then recovered by walking the layers back down to the ground state, with
+    the transitions of get_state_transitions applied to the actual amplitudes.
+
+    The forward frontier is read from the table of the QSPDatabase when
+    available, and is built otherwise, for at most N_QUBIT_PREBUILT_MAX qubits.
+    Either way it stops at forward_depth CNOTs, which bounds the cost of the
+    walk back down when the amplitudes turn out not to allow it.
+    """
+
+    def __init__(
+        self,
+        qsp_database: QSPDatabase,
+        forward_depth: int = BIDIRECTIONAL_FORWARD_DEPTH,
+    ) -> None:
+        self.qsp_database = qsp_database
+        self.forward_depth = forward_depth
+        self.dead_ends = set()
+        self.num_meets: int = 0
+
+    def get_frontier(self, n_qubits: int):
+        if n_qubits not in self.qsp_database.databases:
+            self.qsp_database.load_database(n_qubits)
+        table = self.qsp_database.databases[n_qubits]
+        if table is not None:
+            return table
+        frontier_key = (n_qubits, self.forward_depth)
+        if frontier_key not in _FORWARD_FRONTIERS:
+            _FORWARD_FRONTIERS[frontier_key] = build_qsp_database(
+                n_qubits, max_cost=self.forward_depth
+            )
+        return _FORWARD_FRONTIERS[frontier_key]
+
+    def get_cost(self, state: QState):
+        """Return the forward CNOT cost of the index set, None if not reached."""
+        sub_state = compress_supports(state)
+        if sub_state.num_qubits <= 1:
+            # a basis state or a single Ry gate
+            return 0
+        if sub_state.num_qubits > QSPDatabase.N_QUBIT_PREBUILT_MAX:
+            return None
+        frontier = self.get_frontier(sub_state.num_qubits)
+        key = sub_state.canonical_fingerprint64()
+        if key not in frontier or frontier[key] > self.forward_depth:
+            return None
+        return frontier[key]
+
+    def stitch(self, circuit: QCircuit, state: QState, budget: int):
+        """Return the gates preparing the state from the ground state within the
+        budget, None if the amplitudes do not allow it.
+        """
+        if state.get_sparsity() == 1:
+            _, x_gates = x_reduction(circuit, state, enable_cnot=False)
+            return x_gates
+
+        dead_end = (state.canonical_fingerprint64(with_weights=True), budget)
+        if dead_end in self.dead_ends:
+            return None
+
+        for next_state, gates in get_state_transitions(circuit, state):
+            cnot_cost = sum([gate.get_cnot_cost() for gate in gates])
+            if cnot_cost > budget:
+                continue
+            if next_state is None:
+                next_state = state
+                for gate in gates[::-1]:
+                    next_state = gate.conjugate().apply(next_state)
+
+            # only follow the transitions that stay in the forward frontier
+            next_cost = self.get_cost(next_state)
+            if next_cost is None or next_cost + cnot_cost > budget:
+                continue
+            prev_gates = self.stitch(circuit, next_state, budget - cnot_cost)
+            if prev_gates is not None:
+                return prev_gates + gates
+
+        self.dead_ends.add(dead_end)
+        return None
+
+
+def _to_buffers(state: QState):
+    """Pack a state into an index buffer and a weight buffer."""
+    indices = np.fromiter(state.index_to_weight.keys(), dtype=np.uint64)
+    weights = np.fromiter(state.index_to_weight.values(), dtype=np.float64)
+    return indices, weights
+
+
+def _from_buffers(indices: np.ndarray, weights: np.ndarray, num_qubits: int):
+    """Unpack a state packed by _to_buffers."""
+    return QState(dict(zip(indices.tolist(), weights.tolist())), num_qubits)
+
+
+# the explorer of a worker process, it keeps the tables and the lower bounds
+# across the batches
+_WORKER_EXPLORER: Explorer = None
+
+
+def _expand_batch(args):
+    """Expand a batch of states in a worker process.
+
+    The children are returned in the order of get_state_transitions, with
+    their canonical key and their lower bound, as buffers.
+    """
+    global _WORKER_EXPLORER
+    qubit_indices, num_qubits, states = args
+    if _WORKER_EXPLORER is None:
+        _WORKER_EXPLORER = Explorer()
+    circuit = QCircuit(
+        len(qubit_indices), qubits=[QBit(index) for index in qubit_indices]
+    )
+
+    results = []
+    for indices, weights in states:
+        curr_state = _from_buffers(indices, weights, num_qubits)
+        children = []
+        for next_state, gates in get_state_transitions(circuit, curr_state):
+            if next_state is None:
+                for gate in gates[::-1]:
+                    next_state = gate.conjugate().apply(curr_state)
+            key = next_state.canonical_fingerprint64(with_weights=True)
+            lower_bound = _WORKER_EXPLORER.get_lower_bound(next_state)
+            children.append((_to_buffers(next_state), gates, key, lower_bound))
+        results.append(children)
+    return results
+
+
+def expand_states(
+    explorer: Explorer,
+    circuit: QCircuit,
+    expansions: list,
+    executor: ProcessPoolExecutor = None,
+    num_chunks: int = 1,
+):
+    """Expand the popped states and merge their children into the open list.
+
+    The children are merged in the order the states were popped, and then in
+    the order of get_state_transitions, whatever the number of processes. As
+    the ties of the open list are broken by the order of insertion, the search
+    is reproducible.
+    """
+    if executor is None:
+        for curr_state, curr_cost, supports in expansions:
+            transitions = get_state_transitions(circuit, curr_state, supports)
+            for next_state, gates in transitions:
+                explorer.explore_state(curr_state, gates, curr_cost, next_state)
+        return
+
+    num_qubits = expansions[0][0].num_qubits
+    qubit_indices = tuple(circuit.qubit_at(i).index for i in range(num_qubits))
+    states = [_to_buffers(curr_state) for curr_state, _, _ in expansions]
+    chunk_size = (len(states) + num_chunks - 1) // num_chunks
+    chunks = [
+        (qubit_indices, num_qubits, states[i : i + chunk_size])
+        for i in range(0, len(states), chunk_size)
+    ]
+    results = [
+        children for result in executor.map(_expand_batch, chunks) for children in result
+    ]
+    for (curr_state, curr_cost, _), children in zip(expansions, results):
+        for (indices, weights), gates, key, lower_bound in children:
+            explorer.explore_transition(
+                curr_state,
+                gates,
+                curr_cost,
+                key,
+                lower_bound,
+                lambda: _from_buffers(indices, weights, num_qubits),
+            )
+
+
 def exact_cnot_synthesis(
     circuit: QCircuit,
     target_state: QState,
     verbose_level: int = 0,
     cnot_limit: int = None,
+    bidirectional: bool = False,
+    time_budget: float = None,
+    node_budget: int = None,
+    workers: int = 1,
+    batch_size: int = None,
 ):
-    """This function prepares the state by finding the shortest path ."""
+    """This function prepares the state by finding the shortest path .
+
+    If bidirectional is set, the search also expands forward from the ground
+    state (see ForwardExplorer) and stops as soon as no state left in the queue
+    can beat the best meeting of the two frontiers.
+
+    If the search exceeds the time budget (in seconds) or expands more than
+    node_budget states, it stops and raises SynthesisBudgetExceeded with the
+    best partial reduction found so far. In the bidirectional mode, the best
+    meeting of the frontiers is returned instead when there is one.
+
+    If workers is more than 1, the search pops the batch_size best states at
+    once and expands them in a process pool (see expand_states). The result
+    depends on the batch size (PARALLEL_BATCH_SIZE by default) but not on the
+    number of workers.
+    """
+
+    if batch_size is None:
+        batch_size = 1 if workers <= 1 else PARALLEL_BATCH_SIZE
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers)
+    try:
+        return _exact_cnot_synthesis(
+            circuit,
+            target_state,
+            verbose_level,
+            cnot_limit,
+            bidirectional,
+            time_budget,
+            node_budget,
+            executor,
+            batch_size,
+            max(workers, 1),
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
 
+def _exact_cnot_synthesis(
+    circuit: QCircuit,
+    target_state: QState,
+    verbose_level: int,
+    cnot_limit: int,
+    bidirectional: bool,
+    time_budget: float,
+    node_budget: int,
+    executor: ProcessPoolExecutor,
+    batch_size: int,
+    num_chunks: int,
+):
+    start_time = time.perf_counter()
+    budget_exceeded: bool = False
     explorer = Explorer(verbose_level)
     explorer.add_state(target_state)
 
-    # begin of the exact synthesis algorithm
-    initial_state = QState.ground_state(target_state.num_qubits)
+    forward_explorer = None
+    if bidirectional:
+        forward_explorer = ForwardExplorer(explorer.qsp_database)
+    meet_state, meet_gates, meet_cost = None, None, None
 
+    # begin of the exact synthesis algorithm
     n_init, m_init = len(target_state.get_supports()), target_state.get_sparsity()
     best_state = target_state
     best_score = 0
     best_cost = AStarCost(0, explorer.get_lower_bound(target_state))
 
+    # the states popped but not expanded yet
+    expansions = []
+
     # This function is called by the search loop.
     solution_reached: bool = False
     while not explorer.is_done():
@@ -404,22 +617,80 @@ def exact_cnot_synthesis(
                 best_score = 0
                 explorer.reset()
                 explorer.add_state(best_state, best_cost)
+                expansions = []
                 continue
 
+        is_final = (
+            (cnot_limit is not None and curr_cost.cnot_cost > cnot_limit)
+            or (
+                meet_cost is not None
+                and curr_cost.cnot_cost + curr_cost.lower_bound >= meet_cost
+            )
+            or curr_state.get_sparsity() == 1
+        )
+        if is_final and len(expansions) > 0:
+            # the states popped before may still lead to a cheaper solution,
+            # they are expanded before deciding
+            explorer.state_queue.push(
+                curr_state.canonical_fingerprint64(with_weights=True),
+                curr_cost,
+                curr_state,
+            )
+            expand_states(explorer, circuit, expansions, executor, num_chunks)
+            expansions = []
+            continue
+
         if cnot_limit is not None and curr_cost.cnot_cost > cnot_limit:
             # this will then raise an ValueError
             break
 
-        if curr_state == initial_state:
-            # then we have found the solution
+        if meet_cost is not None and curr_cost.cnot_cost + curr_cost.lower_bound >= (
+            meet_cost
+        ):
+            # no state left in the queue can beat the meeting of the frontiers
+            break
+
+        if curr_state.get_sparsity() == 1:
+            # then we have found the solution, a basis state is only X gates
+            # away from the ground state
             solution_reached = True
             break
 
-        if curr_state.repr() in explorer.visited_states:
+        if curr_state.canonical_fingerprint64(with_weights=True) in (
+            explorer.visited_states
+        ):
             continue
 
+        if (
+            time_budget is not None and time.perf_counter() - start_time > time_budget
+        ) or (node_budget is not None and len(explorer.visited_states) >= node_budget):
+            budget_exceeded = True
+            break
+
         explorer.visit_state(curr_state)
 
+        if forward_explorer is not None:
+            forward_cost = forward_explorer.get_cost(curr_state)
+            if forward_cost is not None and (
+                meet_cost is None or curr_cost.cnot_cost + forward_cost < meet_cost
+            ):
+                forward_gates = forward_explorer.stitch(
+                    circuit, curr_state, forward_cost
+                )
+                if forward_gates is not None and (
+                    cnot_limit is None
+                    or curr_cost.cnot_cost + forward_cost <= cnot_limit
+                ):
+                    forward_explorer.num_meets += 1
+                    meet_state, meet_gates = curr_state, forward_gates
+                    meet_cost = curr_cost.cnot_cost + forward_cost
+                    if (
+                        meet_cost <= curr_cost.cnot_cost + curr_cost.lower_bound
+                        and len(expansions) == 0
+                    ):
+                        # the lower bound is reached
+                        break
+
         supports = curr_state.get_supports()
         _curr_n, _curr_m = len(supports), curr_state.get_sparsity()
         curr_score = float(n_init * m_init - _curr_n * _curr_m) / (
@@ -430,10 +701,27 @@ def exact_cnot_synthesis(
             best_state = curr_state
             best_cost = curr_cost
 
-        transitions = get_state_transitions(circuit, curr_state, supports)
-        for next_state, gates in transitions:
-            explorer.explore_state(curr_state, gates, curr_cost, next_state)
+        expansions.append((curr_state, curr_cost, supports))
+        if len(expansions) >= batch_size or explorer.is_done():
+            expand_states(explorer, circuit, expansions, executor, num_chunks)
+            expansions = []
+
+    if verbose_level >= 1:
+        explorer.report()
+        if forward_explorer is not None:
+            print(f"frontier meets: {forward_explorer.num_meets}")
+
+    if meet_cost is not None and not solution_reached:
+        return meet_gates + backtrace(meet_state, explorer.record)
+
+    if budget_exceeded:
+        if verbose_level >= 1:
+            print(f"budget exceeded, best_state: {best_state}, cost: {best_cost}")
+        raise SynthesisBudgetExceeded(
+            "Budget exceeded", best_state, backtrace(best_state, explorer.record)
+        )
 
     if not solution_reached:
         raise ValueError("No solution found")
-    return backtrace(curr_state, explorer.record)
+    _, x_gates = x_reduction(circuit, curr_state, enable_cnot=False)
+    return x_gates + backtrace(curr_state, explorer.record)
@@ -8,30 +8,48 @@ Reference:
     }
 """
 
-from collections import namedtuple
-from typing import List
+import copy
+import multiprocessing
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Tuple
 import numpy as np
 
-from xyz.circuit import QCircuit, QGate, QState, quantize_state
+from xyz.circuit import QBit, QCircuit, QGate, QState, quantize_state
+from xyz.circuit import get_canonical_form
 from xyz.utils import stopwatch
 from xyz.utils import global_stopwatch_report
 
-from .exact_cnot_synthesis import exact_cnot_synthesis
-from .sparse_state_synthesis import cardinality_reduction
+from .exact_cnot_synthesis import exact_cnot_synthesis, SynthesisBudgetExceeded
+from .exact_cnot_synthesis import _to_buffers, _from_buffers
+from .sparse_state_synthesis import cardinality_reduction, SparseQSPEngine
 from .n_flow import qubit_reduction
+from .qsp_database import QSPDatabase
 from .support_reduction import support_reduction, x_reduction
 from ._reindex import reindex_circuit
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 
 
 @dataclass
 class __Params:
     EXACT_SYNTHESIS_DENSITY_THRESHOLD: int = 100
     EXACT_SYNTHESIS_CNOT_LIMIT: int = 100
+    # the budgets of each exact synthesis, in seconds and expanded states
+    EXACT_SYNTHESIS_TIME_BUDGET: float = None
+    EXACT_SYNTHESIS_NODE_BUDGET: int = None
+    # the number of processes of each exact synthesis
+    EXACT_SYNTHESIS_WORKERS: int = 1
     enable_exact_synthesis: bool = True
     enable_n_flow: bool = False
     enable_m_flow: bool = True
+    # the m-flow merges the large states with SparseQSPEngine, down to
+    # EXACT_SYNTHESIS_DENSITY_THRESHOLD, without support reduction in between
+    enable_sparse_qsp_engine: bool = False
+    # the m-flow and the n-flow of the root are solved in separate processes
+    enable_concurrent_flows: bool = False
+    # the number of solved sub-states kept to be reused up to qubit relabeling
+    cache_size: int = 0
     enable_decomposition: bool = False
     enable_compression: bool = True
     enable_reindex: bool = False
@@ -60,10 +78,26 @@ class __Stats:
     time_cardinality_reduction: float = 0
     time_qubit_decomposition: float = 0
 
+    # cache
+    num_cache_hits: int = 0
+    num_cache_misses: int = 0
+
     def __post_init__(self):
         if self.num_methods is None:
             self.num_methods = {}
 
+    def merge(self, other):
+        """Add the statistics of another run, e.g. of a flow solved in a worker."""
+        for field in fields(self):
+            if field.name == "time_total":
+                continue
+            if field.name == "num_methods":
+                for method, num in other.num_methods.items():
+                    self.num_methods[method] = self.num_methods.get(method, 0) + num
+            else:
+                value = getattr(self, field.name) + getattr(other, field.name)
+                setattr(self, field.name, value)
+
     def report(self):
         """Report the number of runs supported by the benchmark."""
         print("-" * 80)
@@ -79,19 +113,30 @@ class __Stats:
         print(f"num_reduced_supports: {self.num_reduced_supports}")
         print(f"num_reduced_density: {self.num_reduced_density}")
         print(f"num_saved_gates_decision: {self.num_saved_gates_decision}")
+        print(f"num_cache_hits: {self.num_cache_hits}")
+        print(f"num_cache_misses: {self.num_cache_misses}")
         print("-" * 80)
         for method, num in self.num_methods.items():
             print(f"{method}: {num}")
         print("-" * 80)
 
 
-def _prepare_state_rec(
+def _prepare_state_step(
     circuit: QCircuit,
     state: QState,
     verbose_level: int = 0,
     stats: __Stats = __Stats(),
     **kwargs,
 ):
+    """Reduce the state by one step and choose the best of the sub-problems.
+
+    This is a generator run by _prepare_state_iter. Each sub-problem is yielded
+    as a (state, kwargs, num_cnots) tuple, where num_cnots is the cost of the
+    gates added on top of its solution, and the driver sends back the
+    (gates, num_cnots) of the solution, or None if it was cut by the bound.
+    The gates are chains of segments (see _flatten_gates), the generator
+    returns the chain of the best candidate and its number of CNOTs.
+    """
     prev_supports = state.get_supports()
     prev_num_supports = len(prev_supports)
     prev_density = state.get_sparsity()
@@ -103,6 +148,14 @@ def _prepare_state_rec(
     param = __Params()
     param.update(**kwargs)
 
+    # these parameters are passed to the sub-problems
+    rec_params = {
+        "EXACT_SYNTHESIS_TIME_BUDGET": param.EXACT_SYNTHESIS_TIME_BUDGET,
+        "EXACT_SYNTHESIS_NODE_BUDGET": param.EXACT_SYNTHESIS_NODE_BUDGET,
+        "EXACT_SYNTHESIS_WORKERS": param.EXACT_SYNTHESIS_WORKERS,
+        "enable_sparse_qsp_engine": param.enable_sparse_qsp_engine,
+    }
+
     if param.enable_compression:
         # first, run support reduction
         with stopwatch("support_reduction") as timer:
@@ -133,11 +186,14 @@ def _prepare_state_rec(
     # check for the trivial case
     if cardinality == 1:
         _, x_reduction_gates = x_reduction(circuit, state, False)
-        gates = x_reduction_gates + support_reducing_gates
+        gates = (None, x_reduction_gates, support_reducing_gates)
         # ground state calibration has 0 CNOT
         return gates, num_cx_support_reduction
 
     # exact synthesis
+    pruned: bool = False
+    exact_partial_gates: tuple = None
+    num_exact_partial_cx: int = 0
     if (
         param.enable_exact_synthesis
         and num_supports <= param.n_qubits_max
@@ -150,43 +206,59 @@ def _prepare_state_rec(
                     state,
                     verbose_level=verbose_level,
                     cnot_limit=param.EXACT_SYNTHESIS_CNOT_LIMIT,
+                    time_budget=param.EXACT_SYNTHESIS_TIME_BUDGET,
+                    node_budget=param.EXACT_SYNTHESIS_NODE_BUDGET,
+                    workers=param.EXACT_SYNTHESIS_WORKERS,
                 )
             if stats is not None:
                 stats.time_exact_cnot_synthesis += timer.time()
-            gates = exact_gates + support_reducing_gates
+            gates = (None, exact_gates, support_reducing_gates)
             num_cx_exact = sum((gate.get_cnot_cost() for gate in exact_gates))
             return gates, num_cx_exact
+        except SynthesisBudgetExceeded as e:
+            # the search ran out of budget, we continue from its best partial
+            # reduction if it made any progress
+            if stats is not None:
+                stats.time_exact_cnot_synthesis += timer.time()
+            if len(e.gates) > 0:
+                num_cx = e.cnot_cost + num_cx_support_reduction
+                result = yield e.state, rec_params, num_cx
+                if result is not None:
+                    rec_gates, rec_cx = result
+                    exact_partial_gates = (rec_gates, e.gates, support_reducing_gates)
+                    num_exact_partial_cx = rec_cx + num_cx
+                pruned = result is None
         except ValueError:
             # if the exact synthesis fails
             pass
 
+    # the reductions of the flows, as (name, state, gates, num_cnots)
+    flows = []
+
     # cardinality reduction method (m-flow)
-    m_flow_gates: List[QGate] = None
-    num_sparse_qsp_cx: int = 0
     if param.enable_m_flow:
         with stopwatch("cardinality_reduction") as timer:
-            new_state, cardinality_reduction_gates = cardinality_reduction(
-                circuit, state, verbose_level=verbose_level
-            )
+            if (
+                param.enable_sparse_qsp_engine
+                and cardinality > param.EXACT_SYNTHESIS_DENSITY_THRESHOLD + 1
+            ):
+                engine = SparseQSPEngine(circuit, state, verbose_level=verbose_level)
+                cardinality_reduction_gates = engine.run(
+                    param.EXACT_SYNTHESIS_DENSITY_THRESHOLD
+                )
+                new_state = engine.to_qstate()
+            else:
+                new_state, cardinality_reduction_gates = cardinality_reduction(
+                    circuit, state, verbose_level=verbose_level
+                )
         num_cardinality_reduction_cx = sum(
             (gate.get_cnot_cost() for gate in cardinality_reduction_gates)
         )
         stats.time_cardinality_reduction += timer.time()
-        rec_gates, rec_cx = _prepare_state_rec(
-            circuit,
-            new_state,
-            stats=stats,
-            param=param,
-            verbose_level=verbose_level,
-        )
-        m_flow_gates = rec_gates + cardinality_reduction_gates + support_reducing_gates
-        num_sparse_qsp_cx = (
-            rec_cx + num_cardinality_reduction_cx + num_cx_support_reduction
-        )
+        num_cx = num_cardinality_reduction_cx + num_cx_support_reduction
+        flows.append(("sparse_qsp", new_state, cardinality_reduction_gates, num_cx))
 
     # qubit reduction method (n-flow)
-    n_flow_gates: List[QGate] = None
-    num_qubit_reduction_cx: int = 0
     if param.enable_n_flow:
         with stopwatch("qubit_reduction") as timer:
             qubit_decomposition_gates, new_state = qubit_reduction(
@@ -196,30 +268,42 @@ def _prepare_state_rec(
             (gate.get_cnot_cost() for gate in qubit_decomposition_gates)
         )
         stats.time_qubit_decomposition += timer.time()
-        rec_gates, rec_cx = _prepare_state_rec(
-            circuit,
-            new_state,
-            stats=stats,
-            param=param,
-            verbose_level=verbose_level,
+        num_cx = num_qubit_reduction_cx + num_cx_support_reduction
+        flows.append(("qubit_reduction", new_state, qubit_decomposition_gates, num_cx))
+
+    # solve the sub-problems of the flows
+    if param.enable_concurrent_flows and len(flows) > 1:
+        bound = num_exact_partial_cx if exact_partial_gates is not None else None
+        results = _prepare_flows_concurrently(
+            circuit, flows, bound, verbose_level, stats, rec_params
         )
-        n_flow_gates = rec_gates + qubit_decomposition_gates + support_reducing_gates
-        num_qubit_reduction_cx += rec_cx + num_cx_support_reduction
+    else:
+        results = []
+        for _, new_state, _, num_cx in flows:
+            results.append((yield new_state, rec_params, num_cx))
 
     # we choose the best one
     # based on the number of CNOT gates
     Method = namedtuple("method", ["name", "gates", "num_gates"])
     candidates = []
 
-    if m_flow_gates is not None:
-        candidates.append(Method("sparse_qsp", m_flow_gates, num_sparse_qsp_cx))
-    if n_flow_gates is not None:
+    if exact_partial_gates is not None:
         candidates.append(
-            Method("qubit_reduction", n_flow_gates, num_qubit_reduction_cx)
+            Method("exact_partial", exact_partial_gates, num_exact_partial_cx)
         )
+    for (name, _, gates, num_cx), result in zip(flows, results):
+        if result is None:
+            pruned = True
+            continue
+        rec_gates, rec_cx = result
+        chain = (rec_gates, gates, support_reducing_gates)
+        candidates.append(Method(name, chain, rec_cx + num_cx))
 
     # pylint: disable=unnecessary-lambda
-    assert len(candidates) > 0, "no candidates found"
+    assert len(candidates) > 0 or pruned, "no candidates found"
+    if len(candidates) == 0:
+        # all the sub-problems were cut by the bound
+        return None
     best_candidate = min(candidates, key=lambda x: x.num_gates)
     worst_candidate = max(candidates, key=lambda x: x.num_gates)
 
@@ -236,6 +320,260 @@ def _prepare_state_rec(
     return best_gates, best_num_gates
 
 
+# the gates of a chain on relabeled qubits, the qubit i of the chain is the
+# qubit mapping[i] of the parent
+RelabeledChain = namedtuple("RelabeledChain", ["chain", "mapping"])
+
+
+def _relabel_gate(gate: QGate, mapping: list) -> QGate:
+    """Return a copy of the gate with the qubit i replaced by mapping[i]."""
+    new_gate = copy.copy(gate)
+    if hasattr(gate, "target_qubit"):
+        new_gate.target_qubit = QBit(mapping[gate.target_qubit.index])
+    if hasattr(gate, "control_qubit"):
+        new_gate.control_qubit = QBit(mapping[gate.control_qubit.index])
+    if hasattr(gate, "control_qubits"):
+        new_gate.control_qubits = [
+            QBit(mapping[qubit.index]) for qubit in gate.control_qubits
+        ]
+    return new_gate
+
+
+def _flatten_gates(chain: tuple) -> List[QGate]:
+    """Concatenate the gates of a chain, from the deepest sub-problem to the root.
+
+    A chain node is a (child, *segments) tuple, its gates are the gates of the
+    child followed by the segments. The segments are appended in reverse to a
+    single buffer which is reversed once at the end. The gates below a
+    RelabeledChain are relabeled on the way.
+    """
+    buffer: List[QGate] = []
+    mapping: list = None
+    while chain is not None:
+        if isinstance(chain, RelabeledChain):
+            if mapping is None:
+                mapping = chain.mapping
+            else:
+                mapping = [mapping[qubit] for qubit in chain.mapping]
+            chain = chain.chain
+            continue
+        for segment in reversed(chain[1:]):
+            if mapping is None:
+                buffer.extend(reversed(segment))
+            else:
+                buffer.extend(_relabel_gate(gate, mapping) for gate in reversed(segment))
+        chain = chain[0]
+    buffer.reverse()
+    return buffer
+
+
+class _StateCache:
+    """A bounded LRU cache of the solved states, up to qubit relabeling.
+
+    The states are keyed by their weighted canonical form under qubit
+    permutations (see get_canonical_form, the weights are rounded to
+    CANONICAL_WEIGHT_DIGITS), so that the states with the same key only differ
+    by a permutation of the qubits. The solutions are stored as chains on the
+    canonical labeling of their state, and are relabeled to the qubits of the
+    new state on a hit.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get_key(self, state: QState):
+        """Return the key of the state and its qubit at each canonical position."""
+        canonical_items, permutation, _ = get_canonical_form(
+            state.index_to_weight.keys(),
+            state.num_qubits,
+            state.index_to_weight.values(),
+            with_flips=False,
+        )
+        return (state.num_qubits, canonical_items), permutation
+
+    def lookup(self, key: tuple, permutation: tuple):
+        """Return the cached (chain, num_cnots) of a state relabeled to its qubits."""
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        chain, num_cnots = self.entries[key]
+        return RelabeledChain(chain, list(permutation)), num_cnots
+
+    def store(self, key: tuple, permutation: tuple, result: tuple):
+        """Cache the (chain, num_cnots) of a state, on the canonical qubits."""
+        chain, num_cnots = result
+        mapping = [0 for _ in permutation]
+        for position, qubit in enumerate(permutation):
+            mapping[qubit] = position
+        self.entries[key] = (RelabeledChain(chain, mapping), num_cnots)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def _prepare_state_iter(
+    circuit: QCircuit,
+    state: QState,
+    verbose_level: int = 0,
+    stats: __Stats = __Stats(),
+    bound=None,
+    num_cnots: int = 0,
+    cache: _StateCache = None,
+    **kwargs,
+):
+    """Run _prepare_state_step over an explicit stack of sub-problems.
+
+    The sub-problems are solved in the same order as a depth-first recursion,
+    without the recursion limit, and the gates are concatenated only once.
+
+    If a bound is given (a shared value, see _prepare_flows_concurrently), the
+    sub-problems whose CNOTs so far, starting from num_cnots, exceed it are not
+    solved, as none of their solutions can beat the bound.
+
+    If a cache is given, the solved sub-problems are stored and the ones which
+    are a relabeling of a cached state are not solved again.
+
+    :return: the gates preparing the state and their number of CNOTs, or None
+        if all the solutions were cut by the bound
+    :rtype: Tuple[List[QGate], int]
+    """
+    stack = [
+        _prepare_state_step(
+            circuit, state, verbose_level=verbose_level, stats=stats, **kwargs
+        )
+    ]
+    # the CNOTs of the gates added on top of each sub-problem
+    costs = [num_cnots]
+    # the cache keys of the sub-problems
+    keys = [None]
+    result = None
+    while len(stack) > 0:
+        try:
+            # the first call starts the generator, then we send the result of
+            # its last sub-problem
+            sub_problem = stack[-1].send(result)
+        except StopIteration as e:
+            stack.pop()
+            costs.pop()
+            result = e.value
+            key = keys.pop()
+            if key is not None and result is not None:
+                cache.store(*key, result)
+            continue
+        new_state, rec_params, num_cx = sub_problem
+        result = None
+        if bound is not None and costs[-1] + num_cx > bound.value:
+            continue
+        key = None
+        if cache is not None:
+            key = cache.get_key(new_state)
+            result = cache.lookup(*key)
+            if result is not None:
+                stats.num_cache_hits += 1
+                continue
+            stats.num_cache_misses += 1
+        stack.append(
+            _prepare_state_step(
+                circuit,
+                new_state,
+                verbose_level=verbose_level,
+                stats=stats,
+                **rec_params,
+            )
+        )
+        costs.append(costs[-1] + num_cx)
+        keys.append(key)
+    if result is None:
+        return None
+    chain, num_cnots = result
+    return _flatten_gates(chain), num_cnots
+
+
+# the bound shared by the flows of a worker process
+_FLOW_BOUND = None
+
+
+def _init_flow_worker(bound):
+    global _FLOW_BOUND
+    _FLOW_BOUND = bound
+
+
+def _prepare_flow(args):
+    """Solve the sub-problem of a flow in a worker process.
+
+    The bound is lowered to the number of CNOTs of the solution.
+    """
+    circuit, (indices, weights), num_qubits, num_cnots, verbose_level, rec_params = args
+    state = _from_buffers(indices, weights, num_qubits)
+    stats = __Stats()
+    result = None
+    if num_cnots <= _FLOW_BOUND.value:
+        result = _prepare_state_iter(
+            circuit,
+            state,
+            verbose_level=verbose_level,
+            stats=stats,
+            bound=_FLOW_BOUND,
+            num_cnots=num_cnots,
+            **rec_params,
+        )
+    if result is not None:
+        with _FLOW_BOUND.get_lock():
+            _FLOW_BOUND.value = min(_FLOW_BOUND.value, num_cnots + result[1])
+    return result, stats
+
+
+def _prepare_flows_concurrently(
+    circuit: QCircuit,
+    flows: list,
+    bound: int,
+    verbose_level: int,
+    stats: __Stats,
+    rec_params: dict,
+):
+    """Solve the sub-problems of the flows, one process per flow.
+
+    The processes share an upper bound on the number of CNOTs, the best
+    candidate completed so far, and stop exploring the sub-problems that
+    exceed it. A flow which cannot beat the bound returns None.
+
+    :return: the results of the flows, as sent back by _prepare_state_iter
+    :rtype: list
+    """
+    shared_bound = multiprocessing.Value(
+        "q", np.iinfo(np.int64).max if bound is None else bound
+    )
+    with ProcessPoolExecutor(
+        len(flows), initializer=_init_flow_worker, initargs=(shared_bound,)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _prepare_flow,
+                (
+                    circuit,
+                    _to_buffers(new_state),
+                    new_state.num_qubits,
+                    num_cx,
+                    verbose_level,
+                    rec_params,
+                ),
+            )
+            for _, new_state, _, num_cx in flows
+        ]
+        results = []
+        for future in futures:
+            result, flow_stats = future.result()
+            stats.merge(flow_stats)
+            if result is None:
+                results.append(None)
+                continue
+            # the gates are already flattened, they are a single segment
+            gates, num_cnots = result
+            results.append(((None, gates), num_cnots))
+    return results
+
+
 def prepare_state(
     state: QState,
     map_gates: bool = True,
@@ -245,7 +583,11 @@ def prepare_state(
 ) -> QCircuit:
     """A hybrid method combining both qubit- and cardinality- reduction.
 
-    This is a wrapper for the _prepare_state_rec function.
+    This is a wrapper for the _prepare_state_iter function.
+
+    With param.enable_sparse_qsp_engine, the m-flow merges the large states
+    with SparseQSPEngine down to EXACT_SYNTHESIS_DENSITY_THRESHOLD, and the
+    support reduction is then skipped between these merges.
 
     :param state: the target state to be prepared
     :type state: QState
@@ -254,13 +596,28 @@ def prepare_state(
     :return: a quantum circuit
     :rtype: QCircuit
     """
+    return _prepare_state(_check_state(state), map_gates, verbose_level, param, stats)
+
 
-    # check the input state
+def _check_state(state) -> QState:
+    """Convert the input state to a QState."""
     if not isinstance(state, QState):
         if isinstance(state, np.ndarray):
             state = quantize_state(state)
         else:
             raise ValueError("state must be either a QState or a numpy array")
+    return state
+
+
+def _prepare_state(
+    state: QState,
+    map_gates: bool,
+    verbose_level: int,
+    param: __Params,
+    stats: __Stats,
+    cache: _StateCache = None,
+) -> QCircuit:
+    """Prepare the state, reusing the cache if given (see prepare_state)."""
 
     # check the initial state
     num_qubits = state.num_qubits
@@ -284,13 +641,32 @@ def prepare_state(
     # initialize a circuit and the quantum registers
     circuit = QCircuit(state.num_qubits, map_gates=map_gates)
 
+    # the flows of the root are only forwarded when they run concurrently,
+    # the other sub-problems keep the default flows
+    root_params = {}
+    if param.enable_concurrent_flows:
+        root_params = {
+            "enable_m_flow": param.enable_m_flow,
+            "enable_n_flow": param.enable_n_flow,
+            "enable_concurrent_flows": True,
+        }
+
+    if cache is None and param.cache_size > 0:
+        cache = _StateCache(param.cache_size)
+
     with stopwatch("prepare_state") as timer:
-        gates, _ = _prepare_state_rec(
+        gates, _ = _prepare_state_iter(
             circuit,
             state,
             verbose_level=verbose_level,
             param=param,
             stats=stats,
+            cache=cache,
+            EXACT_SYNTHESIS_TIME_BUDGET=param.EXACT_SYNTHESIS_TIME_BUDGET,
+            EXACT_SYNTHESIS_NODE_BUDGET=param.EXACT_SYNTHESIS_NODE_BUDGET,
+            EXACT_SYNTHESIS_WORKERS=param.EXACT_SYNTHESIS_WORKERS,
+            enable_sparse_qsp_engine=param.enable_sparse_qsp_engine,
+            **root_params,
         )
 
     if stats is not None:
@@ -301,3 +677,113 @@ def prepare_state(
     if verbose_level >= 1:
         global_stopwatch_report()
     return circuit
+
+
+# the cache of the solved sub-states shared by the states of a batch worker
+_BATCH_CACHE: _StateCache = None
+
+
+def _init_batch_worker(cache_size: int):
+    global _BATCH_CACHE
+    _BATCH_CACHE = _StateCache(cache_size) if cache_size > 0 else None
+
+
+def _prepare_batch_state(args):
+    """Prepare a state of a batch in a worker process."""
+    (indices, weights), num_qubits, map_gates, verbose_level, param = args
+    state = _from_buffers(indices, weights, num_qubits)
+    stats = __Stats()
+    circuit = _prepare_state(
+        state, map_gates, verbose_level, param, stats, cache=_BATCH_CACHE
+    )
+    return circuit, stats
+
+
+def prepare_states(
+    states: Iterable,
+    workers: int = 1,
+    ordered: bool = True,
+    map_gates: bool = True,
+    verbose_level: int = 0,
+    param: __Params = None,
+    stats: __Stats = None,
+) -> Iterator[Tuple[int, QCircuit, __Stats]]:
+    """Prepare a stream of states, see prepare_state.
+
+    The results are yielded as soon as they are available, in the order of the
+    input states if ordered is set, and as they complete otherwise. At most
+    2 * workers states are read ahead of the results, so the input can be a
+    lazy iterable.
+
+    The states of a process share the cache of the solved sub-states (see
+    param.cache_size) and the QSP database tables. With more than one worker,
+    the tables are loaded before the processes are started, so that they are
+    shared instead of being built by each worker.
+
+    :param states: the target states, as QStates or numpy arrays
+    :type states: Iterable
+    :param workers: the number of processes, defaults to 1
+    :type workers: int, optional
+    :param ordered: yield the results in the order of the states, defaults to True
+    :type ordered: bool, optional
+    :param stats: the statistics of all the states are added to it, defaults to None
+    :type stats: __Stats, optional
+    :return: the index of the state, its circuit and its statistics
+    :rtype: Iterator[Tuple[int, QCircuit, __Stats]]
+    """
+    cache_size = 0 if param is None else param.cache_size
+
+    def _collect(state_stats: __Stats):
+        if stats is not None:
+            stats.merge(state_stats)
+            stats.time_total += state_stats.time_total
+
+    if workers <= 1:
+        cache = _StateCache(cache_size) if cache_size > 0 else None
+        for index, state in enumerate(states):
+            state_stats = __Stats()
+            circuit = _prepare_state(
+                _check_state(state), map_gates, verbose_level, param, state_stats, cache
+            )
+            _collect(state_stats)
+            yield index, circuit, state_stats
+        return
+
+    database = QSPDatabase(verbose_level)
+    for n_qubits in range(1, QSPDatabase.N_QUBIT_PREBUILT_MAX + 1):
+        database.load_database(n_qubits)
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_batch_worker, initargs=(cache_size,)
+    ) as executor:
+        pending = deque()
+        states = enumerate(states)
+        while True:
+            # keep the workers busy without reading the whole input
+            for index, state in states:
+                state = _check_state(state)
+                args = (
+                    _to_buffers(state),
+                    state.num_qubits,
+                    map_gates,
+                    verbose_level,
+                    param,
+                )
+                pending.append((index, executor.submit(_prepare_batch_state, args)))
+                if len(pending) >= 2 * workers:
+                    break
+            if len(pending) == 0:
+                break
+
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                completed, _ = wait(
+                    [future for _, future in pending], return_when=FIRST_COMPLETED
+                )
+                done = [item for item in pending if item[1] in completed]
+                pending = deque(item for item in pending if item[1] not in completed)
+            for index, future in done:
+                circuit, state_stats = future.result()
+                _collect(state_stats)
+                yield index, circuit, state_stats
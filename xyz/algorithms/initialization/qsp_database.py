@@ -0,0 +1,355 @@
+import argparse
+import os
+import re
+import tempfile
+import time
+import numpy as np
+from xyz.circuit import QState, from_set
+from .qsp_database_builder import build_qsp_database
+
+# bump this number whenever the keys or the costs of the tables change, the
+# tables written by older versions are then rebuilt on the first lookup
+QSP_DB_VERSION: int = 3
+QSP_DB_MAGIC: bytes = b"XYZQSPDB"
+
+# magic (8 bytes) | version (u32) | n_qubits (u32) | number of entries (u64)
+QSP_DB_HEADER = np.dtype(
+    [("magic", "S8"), ("version", "<u4"), ("n_qubits", "<u4"), ("size", "<u8")]
+)
+
+# the tables already mapped by this process, keyed by their file name, the
+# missing tables are not recorded so that a table built later is picked up
+_LOADED_TABLES: dict = {}
+
+
+def get_cache_dir() -> str:
+    """Return the directory of the precomputed tables.
+
+    The directory is taken from the ``XYZ_CACHE_DIR`` environment variable and
+    defaults to ``~/.cache/xyz``.
+    """
+    cache_dir = os.environ.get("XYZ_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "xyz")
+    return cache_dir
+
+
+def remove_stale_tables(n_qubits: int) -> list:
+    """Delete the tables of n_qubits written by the other versions.
+
+    :param n_qubits: the number of qubits of the tables
+    :type n_qubits: int
+    :return: the deleted files
+    :rtype: list
+    """
+    cache_dir = get_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return []
+    pattern = re.compile(rf"qsp_db_{n_qubits}\.v(\d+)\.bin")
+    removed = []
+    for name in os.listdir(cache_dir):
+        match = pattern.fullmatch(name)
+        if match is None or int(match.group(1)) == QSP_DB_VERSION:
+            continue
+        filename = os.path.join(cache_dir, name)
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            # removed concurrently by another process
+            continue
+        removed.append(filename)
+    return removed
+
+
+class QSPTable:
+    """Read-only lower bound table of the QSP database.
+
+    The table is a sorted array of 64-bit canonical fingerprints (see
+    :meth:`QState.canonical_fingerprint64`) and an array of uint8 CNOT costs.
+    When loaded from disk both arrays are views of the same memory map, so the
+    pages are shared by all the processes reading the table.
+    """
+
+    def __init__(self, keys: np.ndarray, costs: np.ndarray) -> None:
+        self.keys = keys
+        self.costs = costs
+
+    @staticmethod
+    def from_dict(database: dict) -> "QSPTable":
+        """Build a table from a fingerprint to cost dictionary."""
+        keys = np.fromiter(database.keys(), dtype=np.uint64, count=len(database))
+        costs = np.fromiter(database.values(), dtype=np.int64, count=len(database))
+        assert np.all(costs <= np.iinfo(np.uint8).max), "cost does not fit in uint8"
+        order = np.argsort(keys)
+        return QSPTable(keys[order], costs[order].astype(np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: int) -> bool:
+        return self.find(key) is not None
+
+    def __getitem__(self, key: int) -> int:
+        position = self.find(key)
+        if position is None:
+            raise KeyError(key)
+        return int(self.costs[position])
+
+    def find(self, key: int):
+        """Return the position of the key in the table, None if not found."""
+        key = np.uint64(key)
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def save(self, filename: str, n_qubits: int):
+        """Write the table to the file atomically."""
+        header = np.zeros(1, dtype=QSP_DB_HEADER)
+        header["magic"] = QSP_DB_MAGIC
+        header["version"] = QSP_DB_VERSION
+        header["n_qubits"] = n_qubits
+        header["size"] = len(self.keys)
+
+        # write to a temporary file in the same directory then rename it, so
+        # the concurrent readers never see a partial table
+        directory = os.path.dirname(filename) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.tobytes())
+                f.write(self.keys.astype("<u8").tobytes())
+                f.write(self.costs.astype(np.uint8).tobytes())
+            # mkstemp creates private files, the tables are meant to be shared
+            os.chmod(tmp_filename, 0o644)
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
+
+    @staticmethod
+    def load(filename: str, n_qubits: int) -> "QSPTable":
+        """Memory map the table, return None if the file is missing or stale."""
+        try:
+            buffer = np.memmap(filename, dtype=np.uint8, mode="r")
+        except (FileNotFoundError, ValueError):
+            # ValueError is raised by numpy on empty files
+            return None
+        if len(buffer) < QSP_DB_HEADER.itemsize:
+            return None
+        header = buffer[: QSP_DB_HEADER.itemsize].view(QSP_DB_HEADER)[0]
+        if (
+            header["magic"] != QSP_DB_MAGIC
+            or header["version"] != QSP_DB_VERSION
+            or header["n_qubits"] != n_qubits
+        ):
+            return None
+        size = int(header["size"])
+        begin = QSP_DB_HEADER.itemsize
+        if len(buffer) != begin + 9 * size:
+            return None
+        keys = buffer[begin : begin + 8 * size].view("<u8")
+        costs = buffer[begin + 8 * size :]
+        return QSPTable(keys, costs)
+
+
+class QSPDatabase:
+    # the tables up to N_QUBIT_MAX qubits are built on demand, the larger ones
+    # are only used when they have been built offline (see qsp_database_cli).
+    # The canonical form is only unique up to 5 qubits (5! * 2^5 labelings fit
+    # in CANONICAL_ENUMERATION_LIMIT), so the larger tables are never used
+    N_QUBIT_MAX: int = 4
+    N_QUBIT_PREBUILT_MAX: int = 5
+
+    def __init__(self, verbose_level: int = 0) -> None:
+        self.verbose_level = verbose_level
+        self.databases = {}
+
+    @staticmethod
+    def get_db_filename(n_qubits: int):
+        return os.path.join(
+            get_cache_dir(), f"qsp_db_{n_qubits}.v{QSP_DB_VERSION}.bin"
+        )
+
+    def load_database(self, n_qubits: int):
+        filename = self.get_db_filename(n_qubits)
+        if filename in _LOADED_TABLES:
+            self.databases[n_qubits] = _LOADED_TABLES[filename]
+            return
+        table = QSPTable.load(filename, n_qubits)
+        if table is None and n_qubits <= self.N_QUBIT_MAX:
+            self.init_database(n_qubits)
+            self.save_database(n_qubits)
+            table = QSPTable.load(filename, n_qubits)
+        if table is not None:
+            _LOADED_TABLES[filename] = table
+        self.databases[n_qubits] = table
+
+    def lookup(self, state: QState):
+        num_qubits = state.num_qubits
+        if num_qubits > self.N_QUBIT_PREBUILT_MAX:
+            return 0
+        if num_qubits not in self.databases:
+            # load the database
+            self.load_database(state.num_qubits)
+        assert num_qubits in self.databases
+        if self.databases[num_qubits] is None:
+            # no prebuilt table for this number of qubits
+            return 0
+        position = self.databases[num_qubits].find(state.canonical_fingerprint64())
+        if position is None:
+            # not in a partial table, 0 is still a lower bound
+            return 0
+        return int(self.databases[num_qubits].costs[position])
+
+    def save_database(self, n_qubits: int):
+        filename = self.get_db_filename(n_qubits)
+        self.databases[n_qubits].save(filename, n_qubits)
+        remove_stale_tables(n_qubits)
+
+    @staticmethod
+    def get_repr(index_set: set, n_qubits: int):
+        qstate = from_set(index_set, n_qubits)
+        return qstate.canonical_fingerprint64()
+
+    @staticmethod
+    def get_next_set(index_set: set, n_qubits: int):
+        ret = []
+
+        # try X gate
+        for qubit in range(n_qubits):
+            new_set = set()
+            for index in index_set:
+                new_set.add(index ^ (1 << qubit))
+            ret.append([new_set, 0])
+
+        # try Ry gate
+        for qubit in range(n_qubits):
+            new_set = set()
+            is_valid: bool = True
+            for index in index_set:
+                ridx = index ^ (1 << qubit)
+                if ridx in index_set:
+                    # this is not an AP transition
+                    is_valid = False
+                    break
+                new_set.add(index)
+                new_set.add(index ^ (1 << qubit))
+            if is_valid:
+                ret.append([new_set, 0])
+
+        # try CX gate
+        for control_qubit in range(n_qubits):
+            for target_qubit in range(n_qubits):
+                if control_qubit == target_qubit:
+                    continue
+                for phase in [True, False]:
+                    new_set = set()
+                    for index in index_set:
+                        if (index >> control_qubit) & 1 == phase:
+                            new_set.add(index ^ (1 << target_qubit))
+                        else:
+                            new_set.add(index)
+                    ret.append([new_set, 1])
+
+        # try CRY gate
+        for control_qubit in range(n_qubits):
+            for target_qubit in range(n_qubits):
+                if control_qubit == target_qubit:
+                    continue
+                for phase in [True, False]:
+                    new_set = set()
+                    is_valid = True
+                    for index in index_set:
+                        if (index >> control_qubit) & 1 == phase:
+                            ridx = index ^ (1 << target_qubit)
+                            if ridx in index_set:
+                                # this is not an AP transition
+                                is_valid = False
+                                break
+                            new_set.add(index)
+                            new_set.add(index ^ (1 << target_qubit))
+                        else:
+                            new_set.add(index)
+                    if is_valid:
+                        ret.append([new_set, 2])
+        return ret
+
+    def init_database(self, n_qubits: int, workers: int = 1):
+        if self.verbose_level >= 1:
+            print("Initializing database...")
+
+        database = build_qsp_database(n_qubits, workers, self.verbose_level)
+
+        if self.verbose_level >= 1:
+            print("Database initialized.")
+            print(f"Database size: {len(database)}")
+
+        self.databases[n_qubits] = QSPTable.from_dict(database)
+
+    def verify_database(self, n_qubits: int, workers: int = 1) -> list:
+        """Check the table on disk against a fresh build, return the errors."""
+        errors = []
+        filename = self.get_db_filename(n_qubits)
+        table = QSPTable.load(filename, n_qubits)
+        if table is None:
+            return [f"{filename} is missing, stale or truncated"]
+        if np.any(table.keys[1:] <= table.keys[:-1]):
+            errors.append("the keys are not sorted and unique")
+        ground_key = QState.ground_state(n_qubits).canonical_fingerprint64()
+        if ground_key not in table or table[ground_key] != 0:
+            errors.append("the ground state does not have cost 0")
+
+        expected = QSPTable.from_dict(
+            build_qsp_database(n_qubits, workers, self.verbose_level)
+        )
+        if len(expected) != len(table) or np.any(expected.keys != table.keys):
+            errors.append(f"expected {len(expected)} keys, found {len(table)}")
+        elif np.any(expected.costs != table.costs):
+            num_errors = int(np.sum(expected.costs != table.costs))
+            errors.append(f"{num_errors} costs differ from a fresh build")
+        return errors
+
+
+def qsp_database_cli(argv: list = None) -> int:
+    """Build or verify the QSP database tables from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m xyz",
+        description="build or verify the QSP database tables",
+    )
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("n_qubits", type=int, nargs="+")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count(), help="number of processes"
+    )
+    parser.add_argument(
+        "--cache-dir", default=None, help="overrides the XYZ_CACHE_DIR variable"
+    )
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    args = parser.parse_args(argv)
+
+    if args.cache_dir is not None:
+        os.environ["XYZ_CACHE_DIR"] = args.cache_dir
+
+    database = QSPDatabase(args.verbose)
+    has_error: bool = False
+    for n_qubits in args.n_qubits:
+        filename = database.get_db_filename(n_qubits)
+        start_time = time.time()
+        if args.command == "build":
+            database.init_database(n_qubits, args.workers)
+            database.save_database(n_qubits)
+            table = database.databases[n_qubits]
+            print(
+                f"{filename}: {len(table)} entries, max cost {int(np.max(table.costs))}, "
+                f"{time.time() - start_time:.2f}s"
+            )
+        else:
+            errors = database.verify_database(n_qubits, args.workers)
+            for error in errors:
+                print(f"{filename}: {error}")
+            if len(errors) == 0:
+                print(f"{filename}: ok, {time.time() - start_time:.2f}s")
+            has_error = has_error or len(errors) > 0
+    return 1 if has_error else 0
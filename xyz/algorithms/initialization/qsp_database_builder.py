@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor
+from xyz.circuit import get_canonical_form, get_canonical_fingerprint64
+
+# the number of index sets sent to a worker at once
+BUILDER_CHUNK_SIZE: int = 4096
+
+
+def get_qubit_position_masks(n_qubits: int):
+    """Return, for each qubit, the positions of the bitmask where it is 1.
+
+    An index set over n qubits is represented as a 2^n-bit integer whose bit i
+    is set iff the basis state i is in the set.
+    """
+    position_masks = []
+    for qubit in range(n_qubits):
+        position_mask = 0
+        for index in range(2**n_qubits):
+            if (index >> qubit) & 1:
+                position_mask |= 1 << index
+        position_masks.append(position_mask)
+    return position_masks
+
+
+def get_mask_canonical_key(mask: int, n_qubits: int):
+    """Return the canonical fingerprint64 and the canonical bitmask of an index set.
+
+    The key is equal to ``from_set(indices, n_qubits).canonical_fingerprint64()``.
+    """
+    indices = []
+    remaining = mask
+    while remaining:
+        lowest = remaining & -remaining
+        indices.append(lowest.bit_length() - 1)
+        remaining ^= lowest
+    canonical_indices, _, _ = get_canonical_form(indices, n_qubits)
+    canonical_mask: int = 0
+    for index in canonical_indices:
+        canonical_mask |= 1 << index
+    return get_canonical_fingerprint64(canonical_indices, n_qubits), canonical_mask
+
+
+def get_next_masks(mask: int, n_qubits: int, position_masks: list):
+    """The bitmask counterpart of QSPDatabase.get_next_set."""
+    full_mask = (1 << (1 << n_qubits)) - 1
+
+    def flip(_mask: int, qubit: int) -> int:
+        # move the basis states across the given qubit
+        shift = 1 << qubit
+        one_positions = position_masks[qubit]
+        return ((_mask & ~one_positions & full_mask) << shift) | (
+            (_mask & one_positions) >> shift
+        )
+
+    ret = []
+
+    # try X gate
+    for qubit in range(n_qubits):
+        ret.append([flip(mask, qubit), 0])
+
+    # try Ry gate
+    for qubit in range(n_qubits):
+        flipped = flip(mask, qubit)
+        if flipped & mask == 0:
+            ret.append([mask | flipped, 0])
+
+    # try CX gate
+    for control_qubit in range(n_qubits):
+        for target_qubit in range(n_qubits):
+            if control_qubit == target_qubit:
+                continue
+            for phase in [True, False]:
+                if phase:
+                    controlled = mask & position_masks[control_qubit]
+                else:
+                    controlled = mask & ~position_masks[control_qubit]
+                ret.append([(mask ^ controlled) | flip(controlled, target_qubit), 1])
+
+    # try CRY gate
+    for control_qubit in range(n_qubits):
+        for target_qubit in range(n_qubits):
+            if control_qubit == target_qubit:
+                continue
+            for phase in [True, False]:
+                if phase:
+                    controlled = mask & position_masks[control_qubit]
+                else:
+                    controlled = mask & ~position_masks[control_qubit]
+                flipped = flip(controlled, target_qubit)
+                if flipped & controlled == 0:
+                    ret.append([mask | flipped, 2])
+    return ret
+
+
+def _expand_chunk(args):
+    """Expand a chunk of the frontier, keep the cheapest child of each key."""
+    masks, n_qubits = args
+    position_masks = get_qubit_position_masks(n_qubits)
+    children = {}
+    for mask in masks:
+        for next_mask, cnot_cost in get_next_masks(mask, n_qubits, position_masks):
+            key, canonical_mask = get_mask_canonical_key(next_mask, n_qubits)
+            if key not in children or cnot_cost < children[key][0]:
+                children[key] = (cnot_cost, canonical_mask)
+    return children
+
+
+def build_qsp_database(
+    n_qubits: int, workers: int = 1, verbose_level: int = 0, max_cost: int = None
+):
+    """Compute the QSP database of the given number of qubits.
+
+    The index sets are explored layer by layer in the order of their CNOT
+    cost. Each layer is closed under the free transitions (X and Ry) before
+    the next layer is opened, and every layer is expanded in chunks across a
+    process pool. The index sets are deduplicated by their canonical form under
+    qubit permutations and X gates (see get_canonical_form), and only the
+    canonical representative of each class is expanded, so the result does not
+    depend on the number of workers.
+
+    :param n_qubits: the number of qubits
+    :type n_qubits: int
+    :param workers: the number of processes, 1 to expand in this process
+    :type workers: int
+    :param max_cost: stop after the layer of this cost, defaults to None (all
+        the index sets)
+    :type max_cost: int
+    :return: the CNOT cost of each canonical fingerprint64
+    :rtype: dict
+    """
+    settled = {}
+    ground_key, ground_mask = get_mask_canonical_key(1, n_qubits)
+    pending = {0: {ground_key: ground_mask}}
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        cost: int = 0
+        while len(pending) > 0 and (max_cost is None or cost <= max_cost):
+            frontier = pending.pop(cost, {})
+            frontier = {
+                key: mask for key, mask in frontier.items() if key not in settled
+            }
+            while len(frontier) > 0:
+                for key in frontier:
+                    settled[key] = cost
+                if verbose_level >= 1:
+                    print(
+                        f"cost: {cost}, settled: {len(settled)}, frontier: {len(frontier)}"
+                    )
+
+                masks = sorted(frontier.values())
+                chunks = [
+                    (masks[i : i + BUILDER_CHUNK_SIZE], n_qubits)
+                    for i in range(0, len(masks), BUILDER_CHUNK_SIZE)
+                ]
+                if executor is None:
+                    results = map(_expand_chunk, chunks)
+                else:
+                    results = executor.map(_expand_chunk, chunks)
+
+                next_frontier = {}
+                for children in results:
+                    for key, (cnot_cost, next_mask) in children.items():
+                        if key in settled:
+                            continue
+                        if cnot_cost == 0:
+                            layer = next_frontier
+                        else:
+                            layer = pending.setdefault(cost + cnot_cost, {})
+                        layer[key] = next_mask
+                frontier = next_frontier
+            cost += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return settled
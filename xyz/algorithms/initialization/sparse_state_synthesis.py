@@ -1,54 +1,94 @@
+from typing import List
 import numpy as np
 
-from xyz.circuit import QState, QCircuit, CX, MCRY, reverse_circuit
+from xyz.circuit import QState, QCircuit, CX, MCRY, reverse_circuit, MERGE_UNCERTAINTY
 from .support_reduction import x_reduction
 
 
-def _maximize_difference_once(state: QState, indices: set, diff_lit: dict):
-    max_difference: int = -1
+def _to_index_array(indices, num_qubits: int) -> np.ndarray:
+    """Convert the indices to an array, of uint64 when they fit."""
+    if num_qubits <= 64:
+        return np.fromiter(indices, dtype=np.uint64, count=len(indices))
+    return np.array(list(indices), dtype=object)
 
-    best_index_set_0 = set()
-    best_qubit = None
-    best_value = None
 
-    assert len(indices) >= 2
-    length = len(indices)
+def _get_bits(indices: np.ndarray, qubit: int) -> np.ndarray:
+    """Return the bit of the qubit in each index."""
+    if indices.dtype == object:
+        return (indices >> qubit) & 1
+    return (indices >> np.uint64(qubit)) & np.uint64(1)
 
-    for qubit in range(state.num_qubits):
-        # we cannot be better than this
-        if max_difference == length - 1:
-            break
 
-        if qubit in diff_lit:
-            continue
+def _count_ones(indices: np.ndarray, num_qubits: int) -> np.ndarray:
+    """Return the number of indices where each qubit is 1."""
+    if indices.dtype == object:
+        return np.array(
+            [np.count_nonzero(_get_bits(indices, qubit)) for qubit in range(num_qubits)]
+        )
+    # extract all the bits at once, the least significant byte comes first
+    bits = np.unpackbits(
+        indices.astype("<u8").view(np.uint8).reshape(-1, 8),
+        axis=1,
+        bitorder="little",
+    )
+    return bits[:, :num_qubits].sum(axis=0, dtype=np.int64)
 
-        index_set_0 = set()
 
-        for index in indices:
-            if index & (1 << qubit) == 0:
-                index_set_0.add(index)
+def _select_candidates(indices: np.ndarray, index: int, diff_lits: list) -> np.ndarray:
+    """Return the indices, except index, that satisfy all the literals."""
+    is_candidate = indices != index
+    for diff_qubit, diff_value in diff_lits:
+        is_candidate &= _get_bits(indices, diff_qubit) == int(diff_value)
+    return indices[is_candidate]
 
-        length0 = len(index_set_0)
-        difference = abs(length - (length0 << 1))
 
-        # this means either the qubit is all 0 or all 1
-        if difference == length:
-            continue
+def _select_difference(
+    indices: np.ndarray, num_qubits: int, num_ones: np.ndarray = None
+):
+    """Select the qubit splitting the indices the most unevenly.
+
+    :param indices: the indices, as returned by _to_index_array
+    :param num_ones: the number of indices where each qubit is 1, computed if
+        not given
+    :return: the mask of the indices on the smaller side, the qubit and its
+        value there
+    """
+    assert len(indices) >= 2
+    length = len(indices)
+
+    if num_ones is None:
+        num_ones = _count_ones(indices, num_qubits)
+    num_zeros = length - num_ones
+    differences = np.abs(length - (num_zeros << 1))
+
+    # if the difference is the length, either the qubit is all 0 or all 1
+    differences[differences == length] = -1
+
+    # the first qubit reaching the maximum difference is selected
+    best_qubit = int(np.argmax(differences))
+    assert differences[best_qubit] >= 0
+    length0 = int(num_zeros[best_qubit])
 
-        # we update the best difference
-        if difference > max_difference:
-            max_difference = difference
-            best_index_set_0 = index_set_0
-            best_qubit = qubit
+    # this will return 0 if qubit has less 0
+    # this will return 1 if qubit has more 0
+    best_value = bool(length < (1 << length0))
 
-            # this will return 0 if qubit has less 0
-            # this will return 1 if qubit has more 0
-            best_value = bool(length < (1 << length0))
+    is_selected = _get_bits(indices, best_qubit) == int(best_value)
+    return is_selected, best_qubit, best_value
 
-    assert best_qubit is not None
-    assert len(best_index_set_0) != 0 and len(best_index_set_0) != length
 
-    best_index_set = best_index_set_0 if best_value == 0 else indices - best_index_set_0
+def _maximize_difference_once(
+    state: QState, indices: np.ndarray, diff_lit: dict, num_ones: np.ndarray = None
+):
+    """Select the qubit splitting the indices the most unevenly.
+
+    :return: the indices on the smaller side, the qubit and its value there
+    """
+    is_selected, best_qubit, best_value = _select_difference(
+        indices, state.num_qubits, num_ones
+    )
+    best_index_set = indices[is_selected]
+    assert len(best_index_set) != 0 and len(best_index_set) != len(indices)
 
     return best_index_set, best_qubit, best_value
 
@@ -60,7 +100,7 @@ def cardinality_reduction(circuit: QCircuit, state: QState, verbose_level: int =
     # we first select the indices that maximize the difference
     diff_lits = []
 
-    indices = set(list(state.index_set)[:])
+    indices = _to_index_array(state.index_set, state.num_qubits)
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
 
@@ -77,7 +117,7 @@ def cardinality_reduction(circuit: QCircuit, state: QState, verbose_level: int =
 
     assert len(indices) == 1
 
-    index1 = list(indices)[0]
+    index1 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -86,20 +126,12 @@ def cardinality_reduction(circuit: QCircuit, state: QState, verbose_level: int =
     diff_qubit, diff_value = diff_lits.pop()
 
     # now we select the second index
-    index2_candidates = set()
-    for index in set(state.index_set) - indices:
-        violated: bool = False
-        for _diff_qubit, _diff_value in diff_lits:
-            if (index >> _diff_qubit) & 1 != _diff_value:
-                violated = True
-                break
-        if violated:
-            continue
-        # we add the index to the candidates
-        index2_candidates.add(index)
+    index2_candidates = _select_candidates(
+        _to_index_array(state.index_set, state.num_qubits), index1, diff_lits
+    )
 
     # we select the second index
-    indices = set(list(index2_candidates)[:])
+    indices = index2_candidates
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
         diff_lits.append((qubit, value))
@@ -109,7 +141,7 @@ def cardinality_reduction(circuit: QCircuit, state: QState, verbose_level: int =
         len(indices) == 1
     ), f"indices: {indices}, index2_candidates: {index2_candidates}, diff_lits: {diff_lits}"
 
-    index2 = list(indices)[0]
+    index2 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -180,7 +212,7 @@ def depth_optimized_cardinality_reduction(
     # we first select the indices that maximize the difference
     diff_lits = []
 
-    indices = set(list(state.index_set)[:])
+    indices = _to_index_array(state.index_set, state.num_qubits)
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
         diff_lits.append((qubit, value))
@@ -188,7 +220,7 @@ def depth_optimized_cardinality_reduction(
 
     assert len(indices) == 1
 
-    index1 = list(indices)[0]
+    index1 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -197,20 +229,12 @@ def depth_optimized_cardinality_reduction(
     diff_qubit, diff_value = diff_lits.pop()
 
     # now we select the second index
-    index2_candidates = set()
-    for index in set(state.index_set) - indices:
-        violated: bool = False
-        for _diff_qubit, _diff_value in diff_lits:
-            if (index >> _diff_qubit) & 1 != _diff_value:
-                violated = True
-                break
-        if violated:
-            continue
-        # we add the index to the candidates
-        index2_candidates.add(index)
+    index2_candidates = _select_candidates(
+        _to_index_array(state.index_set, state.num_qubits), index1, diff_lits
+    )
 
     # we select the second index
-    indices = set(list(index2_candidates)[:])
+    indices = index2_candidates
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
         diff_lits.append((qubit, value))
@@ -220,7 +244,7 @@ def depth_optimized_cardinality_reduction(
         len(indices) == 1
     ), f"indices: {indices}, index2_candidates: {index2_candidates}, diff_lits: {diff_lits}"
 
-    index2 = list(indices)[0]
+    index2 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -296,6 +320,283 @@ def depth_optimized_cardinality_reduction(
     return new_state, gates[::-1]
 
 
+class SparseQSPEngine:
+    """Run the cardinality reductions on a state mutated in place.
+
+    The state is kept in an index array and a weight array that are updated
+    by each CX and MCRY, instead of building a new QState after every gate.
+    The number of indices where each qubit is 1 is maintained incrementally,
+    so the first selection of each merge does not scan the bits again. The
+    selections follow the rows of the arrays, so the two merged indices are
+    never searched for, and a merged row is swapped with the last one.
+
+    Unlike prepare_state, no support reduction is done between the merges.
+
+    The gates are the same as the ones of repeated calls to
+    cardinality_reduction (or depth_optimized_cardinality_reduction if
+    depth_opt is set).
+    """
+
+    def __init__(
+        self,
+        circuit: QCircuit,
+        state: QState,
+        depth_opt: bool = False,
+        verbose_level: int = 0,
+    ) -> None:
+        self.circuit = circuit
+        self.num_qubits = state.num_qubits
+        self.depth_opt = depth_opt
+        self.verbose_level = verbose_level
+
+        # the first size entries of the arrays are the state
+        self.indices = _to_index_array(state.index_to_weight.keys(), self.num_qubits)
+        self.weights = np.fromiter(
+            state.index_to_weight.values(),
+            dtype=np.float64,
+            count=len(state.index_to_weight),
+        )
+        self.size: int = len(self.indices)
+        self.num_ones = _count_ones(self.indices, self.num_qubits)
+
+    def get_sparsity(self) -> int:
+        return self.size
+
+    def to_qstate(self) -> QState:
+        """Return a copy of the current state."""
+        return QState(
+            dict(
+                zip(
+                    self.indices[: self.size].tolist(),
+                    self.weights[: self.size].tolist(),
+                )
+            ),
+            self.num_qubits,
+        )
+
+    def _remove(self, position: int):
+        # the bits of the removed index, counted at once
+        removed_index = self.indices[position : position + 1]
+        self.num_ones -= _count_ones(removed_index, self.num_qubits)
+        last = self.size - 1
+        self.indices[position] = self.indices[last]
+        self.weights[position] = self.weights[last]
+        self.size = last
+
+    def apply_cx(self, control: int, phase: int, targets: List[int]):
+        """Apply CX gates sharing the same control in place."""
+        indices = self.indices[: self.size]
+        enabled = _get_bits(indices, control) == int(phase)
+        flipped_indices = indices[enabled]
+        target_mask: int = 0
+        for target in targets:
+            target_mask |= 1 << target
+        if indices.dtype != object:
+            target_mask = np.uint64(target_mask)
+        self.num_ones -= _count_ones(flipped_indices, self.num_qubits)
+        flipped_indices ^= target_mask
+        self.num_ones += _count_ones(flipped_indices, self.num_qubits)
+        indices[enabled] = flipped_indices
+
+    def apply_merge(self, gate: MCRY, positions: tuple = None):
+        """Apply the conjugate of the MCRY gate in place.
+
+        :param positions: the rows of the two partner indices, if the caller
+            knows that no other index is enabled by the controls
+        """
+        indices = self.indices[: self.size]
+        target = gate.target_qubit.index
+        if positions is None:
+            enabled = np.ones(self.size, dtype=bool)
+            for control_qubit, phase in zip(gate.control_qubits, gate.phases):
+                enabled &= _get_bits(indices, control_qubit.index) == int(phase)
+            positions = np.flatnonzero(enabled)
+        cos_theta, sin_theta = np.cos(-gate.theta / 2), np.sin(-gate.theta / 2)
+
+        if len(positions) == 2 and int(indices[positions[0]]) ^ int(
+            indices[positions[1]]
+        ) == (1 << target):
+            # the usual case, the gate merges two indices
+            position0, position1 = positions
+            if (int(indices[position0]) >> target) & 1:
+                position0, position1 = position1, position0
+            weight0, weight1 = self.weights[position0], self.weights[position1]
+            self.weights[position0] = weight0 * cos_theta - weight1 * sin_theta
+            self.weights[position1] = weight0 * sin_theta + weight1 * cos_theta
+
+            # the indices left without amplitude are removed
+            for position in sorted([position0, position1], reverse=True):
+                if np.abs(self.weights[position]) <= MERGE_UNCERTAINTY:
+                    self._remove(position)
+            return
+
+        # otherwise, the enabled indices are rotated as in apply_ry_vectorized
+        # and replace the old ones at the end of the arrays
+        enabled = np.zeros(self.size, dtype=bool)
+        enabled[positions] = True
+        rotated_indices = indices[enabled]
+        rotated_weights = self.weights[: self.size][enabled]
+        is_one = _get_bits(rotated_indices, target) != 0
+        if indices.dtype == object:
+            partner_indices = rotated_indices ^ (1 << target)
+        else:
+            partner_indices = rotated_indices ^ np.uint64(1 << target)
+        new_indices, inverse = np.unique(
+            np.concatenate((rotated_indices, partner_indices)), return_inverse=True
+        )
+        new_weights = np.bincount(
+            inverse.ravel(),
+            weights=np.concatenate(
+                (
+                    cos_theta * rotated_weights,
+                    np.where(is_one, -sin_theta, sin_theta) * rotated_weights,
+                )
+            ),
+            minlength=len(new_indices),
+        )
+        is_nonzero = np.abs(new_weights) > MERGE_UNCERTAINTY
+        new_indices, new_weights = new_indices[is_nonzero], new_weights[is_nonzero]
+
+        for position in sorted(positions, reverse=True):
+            self._remove(int(position))
+        self.indices = np.concatenate((self.indices[: self.size], new_indices))
+        self.weights = np.concatenate((self.weights[: self.size], new_weights))
+        self.size = len(self.indices)
+        self.num_ones = _count_ones(self.indices, self.num_qubits)
+
+    def reduce_once(self) -> list:
+        """Merge two indices, return the gates in the order they are applied."""
+        indices = self.indices[: self.size]
+
+        # we first select the indices that maximize the difference, the rows
+        # of the indices are selected along with them
+        diff_lits = []
+        curr_rows, curr_indices = None, indices
+        num_ones = self.num_ones
+        while len(curr_indices) > 1:
+            is_selected, qubit, value = _select_difference(
+                curr_indices, self.num_qubits, num_ones
+            )
+            diff_lits.append((qubit, value))
+            num_ones = None
+            prev_rows, prev_indices = curr_rows, curr_indices
+            curr_indices = curr_indices[is_selected]
+            if curr_rows is None:
+                curr_rows = np.flatnonzero(is_selected)
+            else:
+                curr_rows = curr_rows[is_selected]
+        row1, index1 = int(curr_rows[0]), int(curr_indices[0])
+
+        # we will later use diff_qubit and diff_value as CNOTs
+        diff_qubit, diff_value = diff_lits.pop()
+
+        # now we select the second index, the candidates are the indices
+        # satisfying the other literals, i.e. the other side of the last split
+        is_candidate = ~is_selected
+        if prev_rows is None:
+            curr_rows = np.flatnonzero(is_candidate)
+        else:
+            curr_rows = prev_rows[is_candidate]
+        curr_indices = prev_indices[is_candidate]
+        while len(curr_indices) > 1:
+            is_selected, qubit, value = _select_difference(
+                curr_indices, self.num_qubits
+            )
+            diff_lits.append((qubit, value))
+            curr_indices, curr_rows = curr_indices[is_selected], curr_rows[is_selected]
+        assert len(curr_indices) == 1
+        row2, index2 = int(curr_rows[0]), int(curr_indices[0])
+
+        if self.verbose_level >= 3:
+            print(f"merging indices from {index1} to {index2}")
+
+        gates = []
+        if self.depth_opt:
+            all_diffs = [(diff_qubit, diff_value)]
+            for qubit in range(self.num_qubits):
+                if qubit == diff_qubit:
+                    continue
+                if (index1 >> qubit) & 1 == (index2 >> qubit) & 1:
+                    continue
+                all_diffs.append((qubit, (index2 >> qubit) & 1 == 0))
+            total_n_diffs = len(all_diffs)
+            while total_n_diffs > 1:
+                r: int = total_n_diffs >> 1
+                l: int = total_n_diffs - r
+                for i in range(r):
+                    control_idx, control_phase = all_diffs[i]
+                    gates.append(
+                        CX(
+                            self.circuit.qubit_at(control_idx),
+                            control_phase,
+                            self.circuit.qubit_at(all_diffs[l + i][0]),
+                        )
+                    )
+                total_n_diffs = l
+        else:
+            for qubit in range(self.num_qubits):
+                if (index1 >> qubit) & 1 == (index2 >> qubit) & 1:
+                    continue
+                if qubit == diff_qubit:
+                    continue
+                gates.append(
+                    CX(
+                        self.circuit.qubit_at(diff_qubit),
+                        diff_value,
+                        self.circuit.qubit_at(qubit),
+                    )
+                )
+        if self.depth_opt:
+            for gate in gates:
+                self.apply_cx(
+                    gate.control_qubit.index, gate.phase, [gate.target_qubit.index]
+                )
+        elif len(gates) > 0:
+            # the CX gates share their control, they are applied at once
+            self.apply_cx(
+                diff_qubit, diff_value, [gate.target_qubit.index for gate in gates]
+            )
+
+        diff_qubits, diff_values = [], []
+        if len(diff_lits) > 0:
+            diff_qubits, diff_values = zip(*diff_lits)
+        control_qubits = [self.circuit.qubit_at(qubit) for qubit in diff_qubits]
+
+        # we now merge from reversed_index2 to index2, the CX gates moved
+        # index1 in place to reversed_index2 and left index2 unchanged
+        assert int(self.indices[row1]) == index2 ^ (1 << diff_qubit)
+        assert int(self.indices[row2]) == index2
+        row0, row1 = (row2, row1) if (index2 >> diff_qubit) & 1 == 0 else (row1, row2)
+        theta = 2 * np.arctan(self.weights[row1] / self.weights[row0])
+        if (index2 >> diff_qubit) & 1 == 1:
+            # from 0 to 1
+            theta = theta - np.pi
+
+        gate = MCRY(theta, control_qubits, diff_values, self.circuit.qubit_at(diff_qubit))
+        gates.append(gate)
+        if self.depth_opt:
+            # the CX tree may enable other indices
+            self.apply_merge(gate)
+        else:
+            # the CX gates only change the indices with diff_value on
+            # diff_qubit, which all fail one of the first literals except
+            # index1, and these literals are not flipped since index1 and
+            # index2 agree on them. So only the two rows are enabled
+            self.apply_merge(gate, (row0, row1))
+        return gates
+
+    def run(self, min_sparsity: int = 1) -> list:
+        """Reduce the state down to min_sparsity basis states.
+
+        :return: the gates preparing the original state from the reduced one
+        :rtype: list
+        """
+        gates = []
+        while self.size > min_sparsity:
+            gates += self.reduce_once()
+        return gates[::-1]
+
+
 def sparse_state_synthesis(
     state: QState,
     map_gates: bool = False,
@@ -304,35 +605,19 @@ def sparse_state_synthesis(
 ):
     """This function is used to synthesis sparse state.
     reference: https://github.com/qclib/qclib/blob/master/qclib/state_preparation/merge.py
+
+    The merges run on SparseQSPEngine, without support reduction in between.
     """
     circuit = QCircuit(state.num_qubits, map_gates=map_gates)
 
-    # deep copy
-    curr_state = QState(state.index_to_weight, state.num_qubits)
-
-    gates = []
-
-    while True:
-        density = len(curr_state.index_set)
-        if verbose_level >= 3:
-            print(f"Current state: {curr_state}, density: {density}")
-        # we reach the end of the state
-        if density == 1:
-            break
-
-        if depth_opt:
-            curr_state, _gates = depth_optimized_cardinality_reduction(
-                circuit, curr_state, verbose_level=verbose_level
-            )
-        else:
-            curr_state, _gates = cardinality_reduction(
-                circuit, curr_state, verbose_level=verbose_level
-            )
-        for gate in _gates[::-1]:
-            gates.append(gate)
+    engine = SparseQSPEngine(
+        circuit, state, depth_opt=depth_opt, verbose_level=verbose_level
+    )
+    gates = engine.run()
+    curr_state = engine.to_qstate()
 
     _, _gates = x_reduction(circuit, curr_state, enable_cnot=False)
-    circuit.add_gates(_gates + gates[::-1])
+    circuit.add_gates(_gates + gates)
 
     return circuit
 
@@ -356,14 +641,14 @@ def _parallel_sparse_state_synthesis_rec(
     # we first select the indices that maximize the difference
     diff_lits = []
 
-    indices = set(list(state.index_set)[:])
+    indices = _to_index_array(state.index_set, state.num_qubits)
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
         diff_lits.append((qubit, value))
         indices = index_set
 
     assert len(indices) == 1
-    index1 = list(indices)[0]
+    index1 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -373,20 +658,12 @@ def _parallel_sparse_state_synthesis_rec(
 
     # now we select the second index
     # we can do that by checking the parity of the qubits
-    index2_candidates = set()
-    for index in set(state.index_set) - indices:
-        violated: bool = False
-        for _diff_qubit, _diff_value in diff_lits:
-            if (index >> _diff_qubit) & 1 != _diff_value:
-                violated = True
-                break
-        if violated:
-            continue
-        # we add the index to the candidates
-        index2_candidates.add(index)
+    index2_candidates = _select_candidates(
+        _to_index_array(state.index_set, state.num_qubits), index1, diff_lits
+    )
 
     # we select the second index
-    indices = set(list(index2_candidates)[:])
+    indices = index2_candidates
     while len(indices) > 1:
         index_set, qubit, value = _maximize_difference_once(state, indices, diff_lits)
         diff_lits.append((qubit, value))
@@ -396,7 +673,7 @@ def _parallel_sparse_state_synthesis_rec(
         len(indices) == 1
     ), f"indices: {indices}, index2_candidates: {index2_candidates}, diff_lits: {diff_lits}"
 
-    index2 = list(indices)[0]
+    index2 = int(indices[0])
 
     if verbose_level >= 3:
         print(f"indices: {indices}, diff_lits: {diff_lits}")
@@ -8,6 +8,11 @@ Last Modified by: Hanyu Wang
 Last Modified time: 2023-08-12 00:02:46
 """
 
+from .canonical_form import *
 from .qstate import *
 from .qgate import *
 from .qcircuit import *
+from .array_qstate import *
+from .simulation import *
+from .verification import *
+from .array_qcircuit import *
@@ -0,0 +1,299 @@
+from typing import List
+import numpy as np
+
+from .qgate import (
+    MCRY_CNOT_COST,
+    QBit,
+    QGate,
+    QGateType,
+    RotationGate,
+    CRX,
+    CRY,
+    CRZ,
+    CU,
+    CX,
+    MCRY,
+    RX,
+    RY,
+    RZ,
+    U,
+    X,
+    Z,
+)
+from .qcircuit import QCircuit
+
+# the gates with a single control qubit
+CONTROLLED_GATE_TYPES = {
+    QGateType.CX,
+    QGateType.CRX,
+    QGateType.CRY,
+    QGateType.CRZ,
+    QGateType.CU,
+}
+
+# the number of CNOTs of the gates with a fixed cost
+GATE_CNOT_COSTS = {
+    QGateType.CX: 1,
+    QGateType.CRX: 2,
+    QGateType.CRY: 2,
+    QGateType.CRZ: 2,
+    QGateType.CU: 2,
+}
+
+
+def _mask_to_qubits(mask: int) -> List[int]:
+    """Return the indices of the bits set in the mask, in increasing order."""
+    qubits = []
+    while mask:
+        lowest_bit = mask & -mask
+        qubits.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return qubits
+
+
+class ArrayQCircuit(QCircuit):
+    """QCircuit backed by one array per gate field.
+
+    The gates are stored as a struct of arrays: the gate type (the value of
+    :class:`QGateType`), the target qubit, the bitmask of the control qubits,
+    the bitmask of the positive controls and the rotation angle. The 2x2
+    matrices of the U and CU gates are stored in order in a separate array.
+    The gate objects are only created when they are accessed, so a circuit
+    loaded from a file costs no Python object per gate until then.
+
+    The controls of a MCRY are listed by increasing qubit index.
+    """
+
+    def __init__(
+        self,
+        num_qubits: int,
+        gate_types: np.ndarray,
+        targets: np.ndarray,
+        control_masks: np.ndarray,
+        phase_masks: np.ndarray,
+        thetas: np.ndarray,
+        unitaries: np.ndarray = None,
+        map_gates: bool = False,
+    ) -> None:
+        assert num_qubits <= 64, "ArrayQCircuit supports at most 64 qubits"
+        QCircuit.__init__(self, num_qubits, map_gates=map_gates)
+        self.gate_types: np.ndarray = gate_types
+        self.targets: np.ndarray = targets
+        self.control_masks: np.ndarray = control_masks
+        self.phase_masks: np.ndarray = phase_masks
+        self.thetas: np.ndarray = thetas
+        if unitaries is None:
+            unitaries = np.zeros((0, 2, 2), dtype=np.complex128)
+        self.unitaries: np.ndarray = unitaries
+        assert (
+            len(targets) == len(gate_types)
+            and len(control_masks) == len(gate_types)
+            and len(phase_masks) == len(gate_types)
+            and len(thetas) == len(gate_types)
+        )
+
+        # the index of the matrix of each U and CU gate, computed lazily
+        self._unitary_indices: np.ndarray = None
+        self._is_materialized: bool = False
+
+    @staticmethod
+    def from_qcircuit(circuit: QCircuit) -> "ArrayQCircuit":
+        """Convert a circuit to the array backend."""
+        if isinstance(circuit, ArrayQCircuit):
+            return circuit
+        gates = circuit.get_gates()
+        num_gates = len(gates)
+        gate_types = np.zeros(num_gates, dtype=np.uint8)
+        targets = np.zeros(num_gates, dtype=np.uint32)
+        control_masks = np.zeros(num_gates, dtype=np.uint64)
+        phase_masks = np.zeros(num_gates, dtype=np.uint64)
+        thetas = np.zeros(num_gates, dtype=np.float64)
+        unitaries = []
+        for i, gate in enumerate(gates):
+            gate_type = gate.get_qgate_type()
+            if gate_type == QGateType.MCRY:
+                controls = zip(gate.control_qubits, gate.phases)
+            elif gate_type in CONTROLLED_GATE_TYPES:
+                controls = [(gate.control_qubit, gate.phase)]
+            elif gate_type in [QGateType.X, QGateType.Z, QGateType.U] or isinstance(
+                gate, RotationGate
+            ):
+                controls = []
+            else:
+                raise NotImplementedError(
+                    f"Gate type {gate_type} is not supported yet\n Consider toggle map_gates to True"
+                )
+            control_mask, phase_mask = 0, 0
+            for qubit, phase in controls:
+                control_mask |= 1 << qubit.index
+                phase_mask |= int(phase) << qubit.index
+
+            gate_types[i] = gate_type.value
+            targets[i] = gate.target_qubit.index
+            control_masks[i] = control_mask
+            phase_masks[i] = phase_mask
+            if isinstance(gate, RotationGate):
+                thetas[i] = gate.theta
+            if gate_type in [QGateType.U, QGateType.CU]:
+                unitaries.append(gate.get_unitary())
+        return ArrayQCircuit(
+            circuit.get_num_qubits(),
+            gate_types,
+            targets,
+            control_masks,
+            phase_masks,
+            thetas,
+            np.array(unitaries, dtype=np.complex128).reshape(-1, 2, 2),
+            map_gates=circuit.map_gates,
+        )
+
+    def to_qcircuit(self) -> QCircuit:
+        """Convert the circuit back to a regular QCircuit."""
+        circuit = QCircuit(self.get_num_qubits(), map_gates=self.map_gates)
+        circuit.append_gates(self.get_gates())
+        return circuit
+
+    def _get_unitary(self, index: int) -> np.ndarray:
+        """Return the matrix of the U or CU gate at the given index."""
+        if self._unitary_indices is None:
+            is_unitary = (self.gate_types == QGateType.U.value) | (
+                self.gate_types == QGateType.CU.value
+            )
+            self._unitary_indices = np.cumsum(is_unitary) - 1
+        return np.array(self.unitaries[self._unitary_indices[index]])
+
+    def _make_gate(self, index: int) -> QGate:
+        """Create the gate at the given index from the arrays."""
+        return self._create_gate(
+            index,
+            QGateType(int(self.gate_types[index])),
+            int(self.targets[index]),
+            int(self.control_masks[index]),
+            int(self.phase_masks[index]),
+            float(self.thetas[index]),
+        )
+
+    def _create_gate(
+        self,
+        index: int,
+        gate_type: QGateType,
+        target_index: int,
+        control_mask: int,
+        phase_mask: int,
+        theta: float,
+    ) -> QGate:
+        target = self.qubit_at(target_index)
+        if gate_type in [QGateType.U, QGateType.CU]:
+            unitary = self._get_unitary(index)
+
+        if gate_type == QGateType.MCRY:
+            controls = _mask_to_qubits(control_mask)
+            return MCRY(
+                theta,
+                [self.qubit_at(qubit) for qubit in controls],
+                [(phase_mask >> qubit) & 1 for qubit in controls],
+                target,
+            )
+        if gate_type in CONTROLLED_GATE_TYPES:
+            control_index = control_mask.bit_length() - 1
+            control = self.qubit_at(control_index)
+            phase = (phase_mask >> control_index) & 1
+            match gate_type:
+                case QGateType.CX:
+                    return CX(control, phase, target)
+                case QGateType.CRX:
+                    return CRX(theta, control, phase, target)
+                case QGateType.CRY:
+                    return CRY(theta, control, phase, target)
+                case QGateType.CRZ:
+                    return CRZ(theta, control, phase, target)
+                case QGateType.CU:
+                    return CU(unitary, control, phase, target)
+        match gate_type:
+            case QGateType.X:
+                return X(target)
+            case QGateType.Z:
+                return Z(target)
+            case QGateType.RX:
+                return RX(theta, target)
+            case QGateType.RY:
+                return RY(theta, target)
+            case QGateType.RZ:
+                return RZ(theta, target)
+            case QGateType.U:
+                return U(unitary, target)
+        raise NotImplementedError(f"Gate type {gate_type} is not supported yet")
+
+    def _materialize(self) -> None:
+        """Create all the gates, the circuit then behaves as a QCircuit."""
+        if self._is_materialized:
+            return
+        self._is_materialized = True
+        # the arrays are converted to lists at once, it is much faster than
+        # reading the numpy scalars one by one
+        fields = zip(
+            self.gate_types.tolist(),
+            self.targets.tolist(),
+            self.control_masks.tolist(),
+            self.phase_masks.tolist(),
+            self.thetas.tolist(),
+        )
+        for index, (gate_type, *values) in enumerate(fields):
+            gate = self._create_gate(index, QGateType(gate_type), *values)
+            QCircuit.append_gate(self, gate)
+
+    def get_gates(self) -> List[QGate]:
+        self._materialize()
+        return QCircuit.get_gates(self)
+
+    def gate_at(self, index: int) -> QGate:
+        if not self._is_materialized:
+            return self._make_gate(index)
+        return QCircuit.gate_at(self, index)
+
+    def num_gates(self, gate_type: QGateType = None) -> int:
+        if self._is_materialized:
+            return QCircuit.num_gates(self, gate_type)
+        if gate_type is None:
+            return len(self.gate_types)
+        return int(np.count_nonzero(self.gate_types == gate_type.value))
+
+    def get_cnot_cost(self) -> int:
+        if self._is_materialized:
+            return QCircuit.get_cnot_cost(self)
+        cost = 0
+        for gate_type, gate_cost in GATE_CNOT_COSTS.items():
+            cost += gate_cost * int(np.count_nonzero(self.gate_types == gate_type.value))
+        is_mcry = self.gate_types == QGateType.MCRY.value
+        for control_mask in self.control_masks[is_mcry].tolist():
+            num_controls = str(int(control_mask).bit_count())
+            if num_controls not in MCRY_CNOT_COST:
+                raise ValueError(f"len(self.control_qubits) = {num_controls} is not supported")
+            cost += MCRY_CNOT_COST[num_controls]
+        return cost
+
+    # the other methods of QCircuit work on the gate objects
+
+    def append_gate(self, gate: QGate):
+        self._materialize()
+        QCircuit.append_gate(self, gate)
+
+    def remove_gate(self, index: int) -> None:
+        self._materialize()
+        QCircuit.remove_gate(self, index)
+
+    def get_level(self) -> int:
+        self._materialize()
+        return QCircuit.get_level(self)
+
+    def get_level_on_qubit(self, qubit: QBit) -> int:
+        self._materialize()
+        return QCircuit.get_level_on_qubit(self, qubit)
+
+    def last_gate_on_qubit(self, qubit: QBit) -> QGate:
+        self._materialize()
+        return QCircuit.last_gate_on_qubit(self, qubit)
+
+    def trim(self, start, end) -> QCircuit:
+        self._materialize()
+        return QCircuit.trim(self, start, end)
@@ -0,0 +1,247 @@
+from collections.abc import Set
+from typing import List, Tuple
+import numpy as np
+
+from .qstate import QState, MERGE_UNCERTAINTY
+
+
+def _merge_duplicates(indices: np.ndarray, weights: np.ndarray):
+    """Sort the indices and accumulate the weights of repeated indices."""
+    if len(indices) == 0:
+        return indices, weights
+    unique_indices, inverse = np.unique(indices, return_inverse=True)
+    if len(unique_indices) == len(indices):
+        # np.unique already sorted the indices, we only need to reorder the weights
+        merged_weights = np.empty_like(weights)
+        merged_weights[inverse] = weights
+        return unique_indices, merged_weights
+    merged_weights = np.bincount(
+        inverse.ravel(), weights=weights, minlength=len(unique_indices)
+    )
+    return unique_indices, merged_weights
+
+
+class _SortedIndexView(Set):
+    """Read-only set view of a sorted uint64 index array.
+
+    The membership is tested with a binary search, so no Python object is
+    created per basis state.
+    """
+
+    __slots__ = ("_indices",)
+
+    def __init__(self, indices: np.ndarray) -> None:
+        self._indices = indices
+
+    def __contains__(self, index) -> bool:
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            return False
+        if index < 0 or index >> 64:
+            return False
+        position = int(np.searchsorted(self._indices, np.uint64(index)))
+        return position < len(self._indices) and int(self._indices[position]) == index
+
+    def __iter__(self):
+        return iter(self._indices.tolist())
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __repr__(self) -> str:
+        return f"{{{', '.join(map(str, self._indices.tolist()))}}}"
+
+
+class ArrayQState(QState):
+    """QState backed by sorted index and weight arrays.
+
+    The basis states are stored in a sorted ``uint64`` array and the amplitudes
+    in a ``float64`` array of the same length. The public API is the same as
+    :class:`QState`, the ``index_to_weight`` dictionary is only materialized
+    on demand for the algorithms that still iterate over it.
+    """
+
+    def __init__(self, indices, weights, num_qubit: int) -> None:
+        # pylint: disable=super-init-not-called
+        assert num_qubit <= 64, "ArrayQState supports at most 64 qubits"
+        self.num_qubits = num_qubit
+
+        indices = np.asarray(indices, dtype=np.uint64).ravel()
+        weights = np.asarray(weights, dtype=np.float64).ravel()
+        assert len(indices) == len(weights)
+
+        indices, weights = _merge_duplicates(indices, weights)
+        is_nonzero = np.abs(weights) > MERGE_UNCERTAINTY
+        if not np.all(is_nonzero):
+            indices, weights = indices[is_nonzero], weights[is_nonzero]
+
+        # the state is treated as immutable, the buffers can be shared safely
+        indices.flags.writeable = False
+        weights.flags.writeable = False
+        self.indices: np.ndarray = indices
+        self.weights: np.ndarray = weights
+
+        self.sparsity: int = len(indices)
+        self.supports: list = None
+        self._index_to_weight: dict = None
+        self._fingerprint: tuple = None
+        self._fingerprint64: int = None
+        self._canonical_form: tuple = None
+        self._canonical_fingerprint64: int = None
+        self._weighted_canonical_form: tuple = None
+        self._weighted_canonical_fingerprint64: int = None
+
+    @staticmethod
+    def from_qstate(state: QState) -> "ArrayQState":
+        """Convert a dictionary based state to the array backend."""
+        if isinstance(state, ArrayQState):
+            return state
+        indices = np.fromiter(
+            state.index_to_weight.keys(),
+            dtype=np.uint64,
+            count=len(state.index_to_weight),
+        )
+        weights = np.fromiter(
+            state.index_to_weight.values(),
+            dtype=np.float64,
+            count=len(state.index_to_weight),
+        )
+        return ArrayQState(indices, weights, state.num_qubits)
+
+    def to_qstate(self) -> QState:
+        """Convert the state back to the dictionary backend."""
+        return QState(self.index_to_weight, self.num_qubits)
+
+    @property
+    def index_to_weight(self) -> dict:
+        """The dictionary view of the state, built lazily."""
+        if self._index_to_weight is None:
+            self._index_to_weight = dict(
+                zip(self.indices.tolist(), self.weights.tolist())
+            )
+        return self._index_to_weight
+
+    @property
+    def index_set(self) -> Set:
+        """The basis states with non-zero amplitudes, read from the index array."""
+        return _SortedIndexView(self.indices)
+
+    def __deepcopy__(self, memo):
+        return ArrayQState(self.indices, self.weights, self.num_qubits)
+
+    def get_supports(self) -> List[int]:
+        """Return the support of the state ."""
+        if self.supports is not None:
+            return self.supports[:]
+        pattern = int(np.bitwise_or.reduce(self.indices)) if self.sparsity > 0 else 0
+        self.supports = [
+            qubit for qubit in range(self.num_qubits) if (pattern >> qubit) & 1
+        ]
+        return self.supports[:]
+
+    def get_sparsity(self) -> int:
+        """Return the sparsity of the state ."""
+        return self.sparsity
+
+    def get_const1_signature(self) -> int:
+        """Returns the number of signed unsigned signatures ."""
+        return (1 << self.sparsity) - 1
+
+    def to_value(self) -> int:
+        """Return the value of the state ."""
+        value = 0
+        for basis in self.indices.tolist():
+            value |= 1 << basis
+        return value
+
+    def get_qubit_bits(self, qubit: int) -> np.ndarray:
+        """Return the value of the qubit in each basis state."""
+        return ((self.indices >> np.uint64(qubit)) & np.uint64(1)).astype(np.uint8)
+
+    def get_qubit_signatures(self) -> List[int]:
+        """Transpose the state array ."""
+        num_bytes = (self.sparsity + 7) // 8
+        padding = 8 * num_bytes - self.sparsity
+        signatures = []
+        for qubit in range(self.num_qubits):
+            packed = np.packbits(self.get_qubit_bits(qubit))
+            signatures.append(int.from_bytes(packed.tobytes(), "big") >> padding)
+        return signatures
+
+    def get_sorted_qubit_signatures(self) -> List[int]:
+        """Transpose the state array, the indices are already sorted ."""
+        return self.get_qubit_signatures()
+
+    def cofactors(self, pivot_qubit: int) -> Tuple["ArrayQState", "ArrayQState"]:
+        """Returns the cofactors of the given qubit ."""
+        mask = np.uint64(1 << pivot_qubit)
+        is_one = (self.indices & mask) != 0
+
+        weights0 = self.weights[~is_one]
+        weights1 = self.weights[is_one]
+
+        return (
+            ArrayQState(self.indices[~is_one], weights0, self.num_qubits),
+            ArrayQState(self.indices[is_one] ^ mask, weights1, self.num_qubits),
+            float(np.sum(weights0)),
+            float(np.sum(weights1)),
+        )
+
+    def get_ap_angle(
+        self,
+        target_qubit_index: int,
+        control_qubit_index: int = None,
+        phase: bool = True,
+    ) -> float:
+        """Return the angle of the (C)RY merging the enabled basis states in pairs.
+
+        This is get_ap_ry_angles and get_ap_cry_angles on the arrays.
+
+        :return: the angle, None if a basis state has no partner or the pairs
+            have different angles
+        """
+        indices, weights = self.indices, self.weights
+        if control_qubit_index is not None:
+            control_bits = (indices >> np.uint64(control_qubit_index)) & np.uint64(1)
+            enabled = control_bits == int(phase)
+            indices, weights = indices[enabled], weights[enabled]
+        if len(indices) == 0:
+            return None
+        target_mask = np.uint64(1 << target_qubit_index)
+        partner_indices = indices ^ target_mask
+        partner_positions = np.searchsorted(self.indices, partner_indices)
+        partner_positions = np.minimum(partner_positions, self.sparsity - 1)
+        if np.any(self.indices[partner_positions] != partner_indices):
+            return None
+        partner_weights = self.weights[partner_positions]
+        is_one = (indices & target_mask) != 0
+        weights0 = np.where(is_one, partner_weights, weights)
+        weights1 = np.where(is_one, weights, partner_weights)
+        thetas = 2 * np.arctan(weights1 / weights0)
+        if not np.all(np.isclose(thetas[0], thetas)):
+            return None
+        return float(thetas[0])
+
+    @staticmethod
+    def ground_state(num_qubits: int) -> "ArrayQState":
+        """Return the ground state ."""
+        return ArrayQState([0], [1.0], num_qubits)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.indices.tolist()))
+
+    def to_vector(self) -> np.ndarray:
+        """Return the vector representation of the state ."""
+        vector = np.zeros(2**self.num_qubits)
+        vector[self.indices.astype(np.int64)] = self.weights
+
+        # normalize the vector
+        vector /= np.linalg.norm(vector)
+
+        return vector
+
+
+def to_array_state(state: QState) -> ArrayQState:
+    """Return the array backed version of the state."""
+    return ArrayQState.from_qstate(state)
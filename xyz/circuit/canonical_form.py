@@ -0,0 +1,228 @@
+import hashlib
+import struct
+from itertools import islice, product
+from typing import List, Tuple
+
+# the maximum number of labelings compared when the invariants leave ties,
+# beyond this the form is still a member of the orbit but may not be unique
+CANONICAL_ENUMERATION_LIMIT: int = 4096
+
+# the weights are rounded before being compared
+CANONICAL_WEIGHT_DIGITS: int = 9
+
+
+def _distinct_orders(qubits: List[int], keys: List[int]):
+    """Enumerate the orders of the qubits, skipping the swaps of equal keys."""
+    if len(qubits) == 1:
+        return [tuple(qubits)]
+    groups = {}
+    for qubit in qubits:
+        groups.setdefault(keys[qubit], []).append(qubit)
+    group_keys = sorted(groups)
+    remaining = [len(groups[key]) for key in group_keys]
+    order = []
+
+    def _enumerate():
+        if len(order) == len(qubits):
+            yield tuple(order)
+            return
+        for i, key in enumerate(group_keys):
+            if remaining[i] == 0:
+                continue
+            # the interchangeable qubits are always used in the same order
+            group = groups[key]
+            order.append(group[len(group) - remaining[i]])
+            remaining[i] -= 1
+            yield from _enumerate()
+            remaining[i] += 1
+            order.pop()
+
+    return _enumerate()
+
+
+def _refine_colors(columns: List[int], colors: list, sparsity: int) -> List[int]:
+    """Refine the colors of the qubits with the joint statistics of their columns."""
+    num_qubits = len(columns)
+
+    # the joint statistics of two columns, sorted to be invariant under X gates
+    cells = [[None for _ in range(num_qubits)] for _ in range(num_qubits)]
+    for qubit1 in range(num_qubits):
+        for qubit2 in range(qubit1 + 1, num_qubits):
+            num_11 = (columns[qubit1] & columns[qubit2]).bit_count()
+            num_10 = columns[qubit1].bit_count() - num_11
+            num_01 = columns[qubit2].bit_count() - num_11
+            num_00 = sparsity - num_11 - num_10 - num_01
+            cell = tuple(sorted((num_00, num_01, num_10, num_11)))
+            cells[qubit1][qubit2] = cell
+            cells[qubit2][qubit1] = cell
+
+    num_colors = len(set(colors))
+    for _ in range(num_qubits):
+        signatures = [
+            (
+                colors[qubit],
+                tuple(
+                    sorted(
+                        (colors[other], cells[qubit][other])
+                        for other in range(num_qubits)
+                        if other != qubit
+                    )
+                ),
+            )
+            for qubit in range(num_qubits)
+        ]
+        ranks = {
+            signature: rank for rank, signature in enumerate(sorted(set(signatures)))
+        }
+        colors = [ranks[signature] for signature in signatures]
+        if len(ranks) == num_colors:
+            break
+        num_colors = len(ranks)
+    return colors
+
+
+def get_canonical_form(
+    indices, num_qubits: int, weights=None, with_flips: bool = True
+) -> Tuple[tuple, tuple, int]:
+    """Return the canonical form of an index set under qubit permutations and X gates.
+
+    Two index sets get the same canonical form iff one is mapped to the other
+    by relabeling the qubits and flipping some of them. Each qubit is first
+    oriented so that it is 1 in at most half of the basis states, and the
+    qubits are ordered by invariants refined over the pairwise statistics of
+    the columns. The labelings left free by the invariants are enumerated, and
+    the smallest sorted tuple of indices is the canonical form.
+
+    If the weights are given, each index is paired with its rounded weight and
+    the canonical form is the smallest sorted tuple of (index, weight) pairs,
+    so only the states with the same amplitudes up to relabeling are merged.
+
+    If with_flips is False, the qubits are never flipped and the canonical form
+    is only invariant under qubit permutations.
+
+    :param indices: the basis states in the set
+    :param num_qubits: the number of qubits
+    :type num_qubits: int
+    :param weights: the amplitudes of the basis states, defaults to None
+    :param with_flips: allow X gates, defaults to True
+    :type with_flips: bool
+    :return: the canonical indices (or (index, weight) pairs), the original
+        qubit placed at each position and the bitmask of the flipped original
+        qubits
+    :rtype: Tuple[tuple, tuple, int]
+    """
+    indices = list(indices)
+    sparsity = len(indices)
+    if weights is not None:
+        # + 0.0 turns -0.0 into 0.0
+        labels = [round(weight, CANONICAL_WEIGHT_DIGITS) + 0.0 for weight in weights]
+    full = (1 << sparsity) - 1
+
+    # the column of a qubit has one bit per basis state
+    columns = [0 for _ in range(num_qubits)]
+    for position, index in enumerate(indices):
+        while index:
+            lowest = index & -index
+            columns[lowest.bit_length() - 1] |= 1 << position
+            index ^= lowest
+
+    # orient the columns, the balanced ones can go either way
+    fixed_flips: int = 0
+    is_balanced = [False for _ in range(num_qubits)]
+    colors = []
+    for qubit, column in enumerate(columns):
+        num_ones = column.bit_count()
+        if not with_flips:
+            colors.append(num_ones)
+            continue
+        if 2 * num_ones > sparsity:
+            fixed_flips |= 1 << qubit
+            columns[qubit] = column ^ full
+        elif 2 * num_ones == sparsity:
+            is_balanced[qubit] = True
+        colors.append(min(num_ones, sparsity - num_ones))
+
+    if weights is not None:
+        # the weights on each side of a column orient the balanced columns and
+        # refine the initial colors
+        for qubit, column in enumerate(columns):
+            one_labels, zero_labels = [], []
+            for i, label in enumerate(labels):
+                if (column >> i) & 1:
+                    one_labels.append(label)
+                else:
+                    zero_labels.append(label)
+            one_labels, zero_labels = tuple(sorted(one_labels)), tuple(sorted(zero_labels))
+            if is_balanced[qubit] and one_labels != zero_labels:
+                is_balanced[qubit] = False
+                if one_labels > zero_labels:
+                    fixed_flips |= 1 << qubit
+                    columns[qubit] = column ^ full
+                    one_labels = zero_labels
+            colors[qubit] = (colors[qubit], one_labels)
+
+    # refine the colors over the joint statistics of the columns until the
+    # partition of the qubits is stable, unless they are already all distinct
+    num_colors = len(set(colors))
+    if num_colors < num_qubits:
+        colors = _refine_colors(columns, colors, sparsity)
+
+    # the qubits with equal columns are interchangeable
+    keys = [
+        min(column, column ^ full) if is_balanced[qubit] else column
+        for qubit, column in enumerate(columns)
+    ]
+    classes = {}
+    for qubit in sorted(range(num_qubits), key=lambda x: colors[x]):
+        classes.setdefault(colors[qubit], []).append(qubit)
+    orders = [_distinct_orders(qubits, keys) for _, qubits in sorted(classes.items())]
+    balanced_qubits = [qubit for qubit in range(num_qubits) if is_balanced[qubit]]
+
+    best_indices: tuple = None
+    best_permutation: tuple = None
+    best_flips: int = 0
+    candidates = product(product(*orders), range(1 << len(balanced_qubits)))
+    for class_orders, balanced_flips in islice(
+        candidates, CANONICAL_ENUMERATION_LIMIT
+    ):
+        permutation = tuple(qubit for order in class_orders for qubit in order)
+        flips = fixed_flips
+        for i, qubit in enumerate(balanced_qubits):
+            if (balanced_flips >> i) & 1:
+                flips ^= 1 << qubit
+
+        new_indices = [0 for _ in range(sparsity)]
+        for new_qubit, qubit in enumerate(permutation):
+            column = columns[qubit]
+            if is_balanced[qubit] and (flips >> qubit) & 1:
+                column ^= full
+            while column:
+                lowest = column & -column
+                new_indices[lowest.bit_length() - 1] |= 1 << new_qubit
+                column ^= lowest
+        if weights is None:
+            new_indices = tuple(sorted(new_indices))
+        else:
+            new_indices = tuple(sorted(zip(new_indices, labels)))
+
+        if best_indices is None or new_indices < best_indices:
+            best_indices = new_indices
+            best_permutation = permutation
+            best_flips = flips
+    return best_indices, best_permutation, best_flips
+
+
+def get_canonical_fingerprint64(canonical_indices: tuple, num_qubits: int) -> int:
+    """Hash a canonical form to a stable unsigned 64-bit integer ."""
+    num_bytes = (num_qubits + 7) // 8
+    digest = hashlib.blake2b(digest_size=8, person=b"xyz-canonical")
+    digest.update(num_qubits.to_bytes(2, "little"))
+    digest.update(len(canonical_indices).to_bytes(8, "little"))
+    for item in canonical_indices:
+        if isinstance(item, tuple):
+            index, weight = item
+            digest.update(index.to_bytes(num_bytes, "little"))
+            digest.update(struct.pack("<d", weight))
+        else:
+            digest.update(item.to_bytes(num_bytes, "little"))
+    return int.from_bytes(digest.digest(), "little")
@@ -211,10 +211,6 @@ def reverse_circuit(circuit: QCircuit) -> QCircuit:
         new_circuit.add_gate(gate)
     return new_circuit
 
-def to_qasm(circuit: QCircuit) -> str:
-    return circuit.to_qasm()
-
-
 def to_figure(circuit_str: str) -> str:
     return (
         """
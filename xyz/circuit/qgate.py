@@ -2,8 +2,8 @@ from enum import Enum, auto
 import numpy as np
 from typing import List, Tuple, Dict
 from .qstate import QState
+from .array_qstate import ArrayQState
 from numpy.linalg import det
-import scipy as sp
 from collections import namedtuple
 
 
@@ -134,6 +134,85 @@ class UnitaryGate:
         return is_alpha_trivial and is_gamma_trivial
 
 
+# states with fewer basis states than this are updated with the dictionary
+# implementation, the NumPy kernels only pay off for larger states
+VECTORIZED_APPLY_MIN_SPARSITY = 32
+
+
+def use_vectorized_apply(qstate: QState) -> bool:
+    """Returns True if the gate should be applied with the NumPy kernels.
+
+    The kernels pack the basis states into uint64, so the states with more
+    than 64 qubits are always updated with the dictionary implementation.
+    """
+    if isinstance(qstate, ArrayQState):
+        return True
+    return (
+        qstate.num_qubits <= 64
+        and qstate.get_sparsity() >= VECTORIZED_APPLY_MIN_SPARSITY
+    )
+
+
+def get_control_masks(
+    control_qubits: List[QBit], phases: List[int]
+) -> Tuple[int, int]:
+    """Returns the bitmask of the control qubits and of their enabling values."""
+    control_mask: int = 0
+    control_value: int = 0
+    for control_qubit, phase in zip(control_qubits, phases):
+        control_mask |= 1 << control_qubit.index
+        if phase:
+            control_value |= 1 << control_qubit.index
+    return control_mask, control_value
+
+
+def apply_ry_vectorized(
+    qstate: QState,
+    theta: float,
+    target: int,
+    control_mask: int = 0,
+    control_value: int = 0,
+) -> ArrayQState:
+    """Apply a (multi-)controlled RY gate to all the basis states at once."""
+    state = ArrayQState.from_qstate(qstate)
+    indices, weights = state.indices, state.weights
+
+    target_mask = np.uint64(1 << target)
+    enabled = (indices & np.uint64(control_mask)) == np.uint64(control_value)
+
+    rotated_indices = indices[enabled]
+    rotated_weights = weights[enabled]
+    is_one = (rotated_indices & target_mask) != 0
+
+    cos_theta, sin_theta = np.cos(theta / 2), np.sin(theta / 2)
+
+    # |0> -> cos|0> + sin|1> and |1> -> cos|1> - sin|0>, the partner amplitudes
+    # are merged by the ArrayQState constructor
+    new_indices = np.concatenate(
+        (indices[~enabled], rotated_indices, rotated_indices ^ target_mask)
+    )
+    new_weights = np.concatenate(
+        (
+            weights[~enabled],
+            cos_theta * rotated_weights,
+            np.where(is_one, -sin_theta, sin_theta) * rotated_weights,
+        )
+    )
+    return ArrayQState(new_indices, new_weights, state.num_qubits)
+
+
+def apply_x_vectorized(
+    qstate: QState, target: int, control_mask: int = 0, control_value: int = 0
+) -> ArrayQState:
+    """Apply a (multi-)controlled X gate to all the basis states at once."""
+    state = ArrayQState.from_qstate(qstate)
+    indices = state.indices
+
+    enabled = (indices & np.uint64(control_mask)) == np.uint64(control_value)
+    flips = np.where(enabled, np.uint64(1 << target), np.uint64(0))
+    return ArrayQState(indices ^ flips, state.weights, state.num_qubits)
+
+
 class QGate:
     def __init__(self, qgate_type: QGateType) -> None:
         self.qgate_type = qgate_type
@@ -290,6 +369,14 @@ class CRY(RotationGate, BasicGate, ControlledGate):
         return CRY(-self.theta, self.control_qubit, self.phase, self.target_qubit)
 
     def apply(self, qstate: QState) -> QState:
+        if use_vectorized_apply(qstate):
+            control_mask, control_value = get_control_masks(
+                self.get_control_qubits(), [self.phase]
+            )
+            return apply_ry_vectorized(
+                qstate, self.theta, self.target_qubit.index, control_mask, control_value
+            )
+        cos_theta, sin_theta = np.cos(self.theta / 2), np.sin(self.theta / 2)
         index_to_weight = {idx: 0 for idx in qstate.index_set}
         for idx, weight in qstate.index_to_weight.items():
             # no rotation
@@ -301,11 +388,11 @@ class CRY(RotationGate, BasicGate, ControlledGate):
                 index_to_weight[rdx] = 0
 
             if (idx >> self.target_qubit.index) & 1 == 0:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] += weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] += weight * sin_theta
             else:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] -= weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] -= weight * sin_theta
         return QState(index_to_weight, qstate.num_qubits)
 
 
@@ -365,6 +452,13 @@ class CX(BasicGate, ControlledGate):
         return CX(self.control_qubit, self.phase, self.target_qubit)
 
     def apply(self, qstate: QState) -> QState:
+        if use_vectorized_apply(qstate):
+            control_mask, control_value = get_control_masks(
+                [self.control_qubit], [self.phase]
+            )
+            return apply_x_vectorized(
+                qstate, self.target_qubit.index, control_mask, control_value
+            )
         index_to_weight = {}
         for idx, weight in qstate.index_to_weight.items():
             reversed_idx = idx ^ (1 << self.target_qubit.index)
@@ -473,6 +567,14 @@ class MCRY(RotationGate, BasicGate, MultiControlledGate):
 
     def apply(self, qstate: QState) -> QState:
         """Apply the gate to the state."""
+        if use_vectorized_apply(qstate):
+            control_mask, control_value = get_control_masks(
+                self.get_control_qubits(), self.get_phases()
+            )
+            return apply_ry_vectorized(
+                qstate, self.theta, self.target_qubit.index, control_mask, control_value
+            )
+        cos_theta, sin_theta = np.cos(self.theta / 2), np.sin(self.theta / 2)
         index_to_weight = {idx: 0 for idx in qstate.index_set}
         for idx, weight in qstate.index_to_weight.items():
             # no rotation
@@ -484,11 +586,11 @@ class MCRY(RotationGate, BasicGate, MultiControlledGate):
                 index_to_weight[rdx] = 0
 
             if (idx >> self.target_qubit.index) & 1 == 0:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] += weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] += weight * sin_theta
             else:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] -= weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] -= weight * sin_theta
         return QState(index_to_weight, qstate.num_qubits)
 
 
@@ -549,17 +651,20 @@ class RY(RotationGate, BasicGate):
         return RY(-self.theta, self.target_qubit)
 
     def apply(self, qstate: QState) -> QState:
+        if use_vectorized_apply(qstate):
+            return apply_ry_vectorized(qstate, self.theta, self.target_qubit.index)
+        cos_theta, sin_theta = np.cos(self.theta / 2), np.sin(self.theta / 2)
         index_to_weight = {idx: 0 for idx in qstate.index_set}
         for idx, weight in qstate.index_to_weight.items():
             rdx = idx ^ (1 << self.target_qubit.index)
             if rdx not in qstate.index_set:
                 index_to_weight[rdx] = 0
             if (idx >> self.target_qubit.index) & 1 == 0:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] += weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] += weight * sin_theta
             else:
-                index_to_weight[idx] += weight * np.cos(self.theta / 2)
-                index_to_weight[rdx] -= weight * np.sin(self.theta / 2)
+                index_to_weight[idx] += weight * cos_theta
+                index_to_weight[rdx] -= weight * sin_theta
         return QState(index_to_weight, qstate.num_qubits)
 
 
@@ -603,7 +708,12 @@ class X(BasicGate):
     def get_cnot_cost(self) -> int:
         return 0
 
+    def conjugate(self) -> "X":
+        return X(self.target_qubit)
+
     def apply(self, qstate: QState) -> QState:
+        if use_vectorized_apply(qstate):
+            return apply_x_vectorized(qstate, self.target_qubit.index)
         index_to_weight = {}
         for idx in qstate.index_set:
             reversed_idx = idx ^ (1 << self.target_qubit.index)
@@ -622,12 +732,17 @@ class Z(BasicGate):
     def get_cnot_cost(self) -> int:
         return 0
 
-    def apply(self, qstate: "QState") -> "QState":
+    def conjugate(self) -> "Z":
+        return Z(self.target_qubit)
+
+    def apply(self, qstate: QState) -> QState:
         index_to_weight = {}
-        for idx in qstate.index_set:
+        for idx, weight in qstate.index_to_weight.items():
             if idx & (1 << self.target_qubit.index):
-                index_to_weight[idx] = -qstate.index_to_weight[idx]
-        raise NotImplementedError("Z gate not implemented")
+                index_to_weight[idx] = -weight
+            else:
+                index_to_weight[idx] = weight
+        return QState(index_to_weight, qstate.num_qubits)
 
 
 def map_muxy(gate: MULTIPLEXY) -> List[QGate]:
@@ -668,19 +783,49 @@ def map_mcry(gate: QGate) -> List[QGate]:
     return gates
 
 # decomposition
+def walsh_hadamard_transform(array: np.ndarray) -> np.ndarray:
+    """In-place fast Walsh-Hadamard transform along the last axis.
+
+    The transform is unnormalized and in natural (Sylvester) order, i.e.
+    out[..., i] = sum_j (-1)^popcount(i & j) * array[..., j]. The length of the
+    last axis must be a power of two, and the array must be C-contiguous, so
+    that the reshapes below are views of it.
+    """
+    size = array.shape[-1]
+    if size & (size - 1) != 0:
+        raise ValueError(f"the size must be a power of two, got {size}")
+    if not array.flags.c_contiguous:
+        raise ValueError("the array must be C-contiguous")
+    span = 1
+    while span < size:
+        # pair the entries that differ only in the bit of the current span
+        butterfly = array.reshape(array.shape[:-1] + (size // (2 * span), 2, span))
+        upper = butterfly[..., 0, :].copy()
+        lower = butterfly[..., 1, :]
+        butterfly[..., 0, :] += lower
+        butterfly[..., 1, :] = upper - lower
+        span <<= 1
+    return array
+
+
 def find_thetas(alphas):
-    size = len(alphas)
-    # for the gray code matrix
-    gray_code_coefficient_matrix = np.zeros((size, size))
-    for i in range(size):
-        for j in range(size):
-            #  The exponent is the bit-wise inner product of the binary vectors for the standard binary code representation of the integer i (bi) and the binary representation of the i th value of the gray code up to a value of 2) The j th value of the gray code is calculated using the bit-wise XOR of the unsigned binary j and a single shift right of the value of j , like so: ”j XOR (j>>1)” for C++ code
-            bitwise_inner_product = bin(i & (j ^ (j >> 1))).count("1")
-            gray_code_coefficient_matrix[i, j] = (-1) ** bitwise_inner_product
-
-    thetas = sp.linalg.solve(gray_code_coefficient_matrix, alphas)
-
-    return thetas
+    """Solve the Gray code system of a uniformly controlled rotation.
+
+    The coefficient matrix is M[i, j] = (-1)^popcount(i & g(j)), with g(j) the j-th
+    Gray code, i.e. the Hadamard matrix with permuted columns. Hence the system
+    is solved with a Walsh-Hadamard transform in O(k 2^k) instead of a dense
+    solve in O(8^k).
+
+    :param alphas: the rotation table, or a 2-D array with one table per row
+    :return: the rotation angles, with the same shape as alphas
+    """
+    thetas = np.array(alphas, dtype=np.float64, order="C")
+    size = thetas.shape[-1]
+    walsh_hadamard_transform(thetas)
+    thetas /= size
+
+    gray_codes = np.arange(size) ^ (np.arange(size) >> 1)
+    return thetas[..., gray_codes]
 
 
 def decompose_mcry(rotation_table: list):
@@ -1,10 +1,13 @@
 import json
+import hashlib
 
 from typing import List, Tuple, Dict
 import numpy as np
 import random
 from itertools import combinations
 
+from .canonical_form import get_canonical_form, get_canonical_fingerprint64
+
 # the merge uncertainty, if the difference between the two angles is less than
 # this value, we consider them to be the same
 MERGE_UNCERTAINTY = 1e-12
@@ -22,13 +25,22 @@ class QState:
 
         self.index_to_weight = {}
         for index, weight in index_to_weight.items():
-            if not np.isclose(weight, 0, atol=MERGE_UNCERTAINTY):
+            # np.isclose(weight, 0, atol=MERGE_UNCERTAINTY), without its overhead
+            if not abs(weight) <= MERGE_UNCERTAINTY:
                 self.index_to_weight[index] = weight
         self.index_set = self.index_to_weight.keys()
 
         self.sparsity: int = len(index_to_weight)
         self.supports: list = None
 
+        # the states are treated as immutable, the fingerprints are computed once
+        self._fingerprint: tuple = None
+        self._fingerprint64: int = None
+        self._canonical_form: tuple = None
+        self._canonical_fingerprint64: int = None
+        self._weighted_canonical_form: tuple = None
+        self._weighted_canonical_fingerprint64: int = None
+
     def __deepcopy__(self, memo):
         return QState(self.index_to_weight, self.num_qubits)
 
@@ -63,6 +75,73 @@ class QState:
                 signatures[j] = signatures[j] << 1 | (value >> j & 1)
         return signatures
 
+    def get_sorted_qubit_signatures(self) -> List[int]:
+        """Transpose the state array, with the indices in ascending order ."""
+        signatures = [0 for i in range(self.num_qubits)]
+        for value in sorted(self.index_set):
+            for j in range(self.num_qubits):
+                signatures[j] = signatures[j] << 1 | (value >> j & 1)
+        return signatures
+
+    def fingerprint(self) -> tuple:
+        """Return the canonical fingerprint of the index set .
+
+        The fingerprint is the tuple of qubit signatures (over the sorted
+        indices) ordered by their number of ones. It is computed once and
+        cached on the state.
+        """
+        if self._fingerprint is None:
+            signatures = self.get_sorted_qubit_signatures()
+            self._fingerprint = tuple(sorted(signatures, key=int.bit_count))
+        return self._fingerprint
+
+    def fingerprint64(self) -> int:
+        """Return the fingerprint as a stable unsigned 64-bit integer .
+
+        Unlike repr(), the value does not depend on the interpreter and can be
+        stored on disk.
+        """
+        if self._fingerprint64 is None:
+            self._fingerprint64 = get_fingerprint64(
+                self.fingerprint(), self.num_qubits, self.get_sparsity()
+            )
+        return self._fingerprint64
+
+    def canonical_form(self, with_weights: bool = False) -> Tuple[tuple, tuple, int]:
+        """Return the canonical form of the state, see get_canonical_form .
+
+        The index sets with the same canonical form only differ by a relabeling
+        of the qubits and X gates. With the weights, the states with the same
+        canonical form need the same number of CNOTs.
+        """
+        if with_weights:
+            if self._weighted_canonical_form is None:
+                self._weighted_canonical_form = get_canonical_form(
+                    self.index_to_weight.keys(),
+                    self.num_qubits,
+                    self.index_to_weight.values(),
+                )
+            return self._weighted_canonical_form
+        if self._canonical_form is None:
+            self._canonical_form = get_canonical_form(self.index_set, self.num_qubits)
+        return self._canonical_form
+
+    def canonical_fingerprint64(self, with_weights: bool = False) -> int:
+        """Return the canonical form as a stable unsigned 64-bit integer ."""
+        if with_weights:
+            if self._weighted_canonical_fingerprint64 is None:
+                canonical_items, _, _ = self.canonical_form(with_weights=True)
+                self._weighted_canonical_fingerprint64 = get_canonical_fingerprint64(
+                    canonical_items, self.num_qubits
+                )
+            return self._weighted_canonical_fingerprint64
+        if self._canonical_fingerprint64 is None:
+            canonical_indices, _, _ = self.canonical_form()
+            self._canonical_fingerprint64 = get_canonical_fingerprint64(
+                canonical_indices, self.num_qubits
+            )
+        return self._canonical_fingerprint64
+
     def get_const1_signature(self) -> int:
         """Returns the number of signed unsigned signatures ."""
         return (1 << len(self.index_set)) - 1
@@ -143,10 +222,7 @@ class QState:
 
     def repr(self) -> int:
         """Return a hex representation of the bitmap ."""
-        self.index_set = sorted(self.index_set)
-        signatures = self.get_qubit_signatures()
-        return hash(tuple(sorted(signatures, key=lambda x: bin(x).count("1"))))
-        # return hash(self)
+        return hash(self.fingerprint())
 
     def to_vector(self) -> np.ndarray:
         """Return the vector representation of the state ."""
@@ -174,6 +250,25 @@ class QState:
             file.write(benchmark_str)
 
 
+def get_fingerprint64(fingerprint: tuple, num_qubits: int, sparsity: int) -> int:
+    """Hash a fingerprint (see QState.fingerprint) to an unsigned 64-bit integer .
+
+    :param fingerprint: the qubit signatures ordered by their number of ones
+    :type fingerprint: tuple
+    :param num_qubits: the number of qubits of the state
+    :type num_qubits: int
+    :param sparsity: the number of basis states of the state
+    :type sparsity: int
+    """
+    num_bytes = (sparsity + 7) // 8
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(num_qubits.to_bytes(2, "little"))
+    digest.update(sparsity.to_bytes(8, "little"))
+    for signature in fingerprint:
+        digest.update(signature.to_bytes(num_bytes, "little"))
+    return int.from_bytes(digest.digest(), "little")
+
+
 def load_state(filename: str):
     """Loads the state of a given file .
 
@@ -306,37 +401,56 @@ def quantize_state(state_vector: np.ndarray):
         state_vector.astype(np.float64)
     )
 
-    index_to_weight = {}
     num_qubits = int(np.log2(len(state_vector)))
-    for idx, coefficient in enumerate(state_vector):
-        if not np.isclose(coefficient, 0):
-            index_to_weight[idx] = coefficient
+    # the entries that are not np.isclose to 0, with its default tolerance
+    indices = np.flatnonzero(np.abs(state_vector) > 1e-8)
+    index_to_weight = dict(zip(indices.tolist(), state_vector[indices].tolist()))
     return QState(index_to_weight, num_qubits)
 
 
-def D_state(num_qubits: int, num_bits: int) -> np.ndarray:
-    """dicke state."""
-    state = np.zeros(2**num_qubits)
+def _uniform_state(num_qubits: int, indices: np.ndarray, sparse: bool):
+    """Return the uniform superposition of the basis states in indices.
 
-    ones: float = 0
+    :param sparse: return an ArrayQState instead of a vector with 2**n entries
+    :type sparse: bool
+    """
+    weights = np.full(len(indices), 1 / np.sqrt(len(indices)))
+    if sparse:
+        # pylint: disable=import-outside-toplevel
+        from .array_qstate import ArrayQState
 
-    for i in range(2**num_qubits):
-        num_ones = bin(i).count("1")
-        if num_ones == num_bits:
-            state[i] = 1
-            ones += 1
+        return ArrayQState(indices, weights, num_qubits)
+    state = np.zeros(2**num_qubits)
+    state[indices.astype(np.int64)] = weights
+    return state
 
-    return 1 / np.sqrt(ones) * state
 
+def get_dicke_indices(num_qubits: int, num_bits: int) -> np.ndarray:
+    """Return the sorted indices with num_bits ones among num_qubits bits.
 
-def GHZ_state(num_qubits: int) -> np.ndarray:
+    The indices are built qubit by qubit, the ones with j ones among the first
+    i + 1 bits are the ones among the first i bits, followed by the ones with
+    j - 1 ones and the bit i set.
+    """
+    indices = [np.zeros(1, dtype=np.uint64)] + [
+        np.zeros(0, dtype=np.uint64) for _ in range(num_bits)
+    ]
+    for i in range(num_qubits):
+        bit = np.uint64(1 << i)
+        for j in range(min(i + 1, num_bits), 0, -1):
+            indices[j] = np.concatenate((indices[j], indices[j - 1] | bit))
+    return indices[num_bits]
 
-    state = np.zeros(2**num_qubits)
 
-    state[0] = 1
-    state[-1] = 1
+def D_state(num_qubits: int, num_bits: int, sparse: bool = False):
+    """dicke state, an ArrayQState if sparse is True."""
+    return _uniform_state(num_qubits, get_dicke_indices(num_qubits, num_bits), sparse)
+
 
-    return state / np.sqrt(2)
+def GHZ_state(num_qubits: int, sparse: bool = False):
+    """GHZ state, an ArrayQState if sparse is True."""
+    indices = np.array([0, (1 << num_qubits) - 1], dtype=np.uint64)
+    return _uniform_state(num_qubits, indices, sparse)
 
 
 def ground_state(num_qubits: int) -> np.array:
@@ -345,15 +459,10 @@ def ground_state(num_qubits: int) -> np.array:
     return np.array(state)
 
 
-def QBA_state(num_qubits: int, threshold: int) -> np.ndarray:
-    state = np.zeros(2**num_qubits)
-    ones: float = 0
-    for i in range(2**num_qubits):
-        if i < threshold:
-            state[i] = 1
-            ones += 1
-
-    return state / np.sqrt(ones)
+def QBA_state(num_qubits: int, threshold: int, sparse: bool = False):
+    """The uniform superposition of the indices below threshold, an ArrayQState if sparse is True."""
+    indices = np.arange(min(threshold, 2**num_qubits), dtype=np.uint64)
+    return _uniform_state(num_qubits, indices, sparse)
 
 
 def rand_state(num_qubit: int, sparsity: int, uniform: bool = False) -> np.ndarray:
@@ -381,14 +490,9 @@ def all_states(num_qubit: int, sparsity: int):
         yield perm[:]
 
 
-def W_state(num_qubits: int) -> np.ndarray:
-    """W state"""
-    state = np.zeros(2**num_qubits)
-
-    for i in range(num_qubits):
-        state[(2**i)] = 1
-
-    return state / np.sqrt(num_qubits)
+def W_state(num_qubits: int, sparse: bool = False):
+    """W state, an ArrayQState if sparse is True."""
+    return D_state(num_qubits, 1, sparse)
 
 
 def get_ry_angles(state: QState, qubit_index: int) -> List[float]:
@@ -501,6 +605,12 @@ def get_cry_angles(
 
 
 def get_ap_ry_angles(state: QState, qubit_index: int) -> float:
+    # pylint: disable=import-outside-toplevel
+    from .array_qstate import ArrayQState
+
+    if isinstance(state, ArrayQState):
+        return state.get_ap_angle(qubit_index)
+
     # let us check the RY gate
     theta: float = None
     for index, _ in state.index_to_weight.items():
@@ -531,6 +641,12 @@ def get_ap_ry_angles(state: QState, qubit_index: int) -> float:
 def get_ap_cry_angles(
     state: QState, control_qubit_index: int, target_qubit_index: int, phase: bool = True
 ) -> float:
+    # pylint: disable=import-outside-toplevel
+    from .array_qstate import ArrayQState
+
+    if isinstance(state, ArrayQState):
+        return state.get_ap_angle(target_qubit_index, control_qubit_index, phase)
+
     # let us check the RY gate
     theta: float = None
     for index, _ in state.index_to_weight.items():
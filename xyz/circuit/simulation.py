@@ -0,0 +1,283 @@
+from typing import Iterable, Iterator
+import numpy as np
+
+from .qstate import QState, MERGE_UNCERTAINTY
+from .array_qstate import ArrayQState
+from .qgate import QGate, QGateType
+from .qcircuit import QCircuit
+
+# the gates acting on a single qubit, they are fused before being applied
+SINGLE_QUBIT_GATE_TYPES = {
+    QGateType.X,
+    QGateType.Z,
+    QGateType.RX,
+    QGateType.RY,
+    QGateType.RZ,
+    QGateType.U,
+}
+
+# the gates with a real matrix, the circuits made of them are simulated with
+# real amplitudes
+REAL_GATE_TYPES = {
+    QGateType.X,
+    QGateType.Z,
+    QGateType.RY,
+    QGateType.CX,
+    QGateType.CRY,
+    QGateType.MCRY,
+}
+
+X_MATRIX = np.array([[0, 1], [1, 0]])
+Z_MATRIX = np.array([[1, 0], [0, -1]])
+
+
+def get_gate_matrix(gate: QGate) -> np.ndarray:
+    """Return the 2x2 matrix applied to the target qubit of the gate.
+
+    The qubit order and the conventions of the rotations are the ones of
+    Qiskit, e.g. RY(theta) = [[cos(theta/2), -sin(theta/2)], [sin(theta/2), cos(theta/2)]].
+    """
+    gate_type = gate.get_qgate_type()
+    if gate_type in [QGateType.X, QGateType.CX]:
+        return X_MATRIX
+    if gate_type == QGateType.Z:
+        return Z_MATRIX
+    if gate_type in [QGateType.U, QGateType.CU]:
+        return np.asarray(gate.get_unitary())
+
+    cos_theta, sin_theta = np.cos(gate.theta / 2), np.sin(gate.theta / 2)
+    if gate_type in [QGateType.RY, QGateType.CRY, QGateType.MCRY]:
+        return np.array([[cos_theta, -sin_theta], [sin_theta, cos_theta]])
+    if gate_type in [QGateType.RX, QGateType.CRX]:
+        return np.array([[cos_theta, -1j * sin_theta], [-1j * sin_theta, cos_theta]])
+    if gate_type in [QGateType.RZ, QGateType.CRZ]:
+        return np.diag([np.exp(-0.5j * gate.theta), np.exp(0.5j * gate.theta)])
+    raise NotImplementedError(
+        f"Gate type {gate_type} is not supported yet\n Consider toggle map_gates to True"
+    )
+
+
+def get_gate_controls(gate: QGate) -> list:
+    """Return the (qubit index, phase) of the controls of the gate."""
+    gate_type = gate.get_qgate_type()
+    if gate_type == QGateType.MCRY:
+        return [
+            (qubit.index, int(phase))
+            for qubit, phase in zip(gate.control_qubits, gate.phases)
+        ]
+    if gate_type in [QGateType.CX, QGateType.CRX, QGateType.CRY, QGateType.CRZ, QGateType.CU]:
+        return [(gate.control_qubit.index, int(gate.phase))]
+    return []
+
+
+def fuse_gates(gates: Iterable[QGate]) -> Iterator[tuple]:
+    """Yield the (matrix, target, controls) of the gates to apply.
+
+    The consecutive single-qubit gates on the same qubit are fused into one
+    2x2 matrix, which is yielded before the next gate acting on that qubit.
+
+    :param gates: the gates of a circuit
+    :type gates: Iterable[QGate]
+    :return: the matrix, the index of the target qubit and the (qubit index,
+        phase) of the controls
+    :rtype: Iterator[tuple]
+    """
+    # the fused single-qubit matrix waiting on each qubit
+    pending = {}
+    for gate in gates:
+        target = gate.target_qubit.index
+        matrix = get_gate_matrix(gate)
+        if gate.get_qgate_type() in SINGLE_QUBIT_GATE_TYPES:
+            if target in pending:
+                matrix = matrix @ pending[target]
+            pending[target] = matrix
+            continue
+        controls = get_gate_controls(gate)
+        for qubit in [target] + [qubit for qubit, _ in controls]:
+            if qubit in pending:
+                yield pending.pop(qubit), qubit, []
+        yield matrix, target, controls
+    for qubit, matrix in pending.items():
+        yield matrix, qubit, []
+
+
+def apply_matrix(
+    tensor: np.ndarray, matrix: np.ndarray, target: int, controls: list = None
+) -> None:
+    """Apply a (controlled) 2x2 matrix to a state tensor in place.
+
+    The tensor is the state vector reshaped to (2,) * num_qubits, the qubit i is
+    the axis num_qubits - 1 - i. The controls are fixed by slicing their axes
+    and the two halves of the target axis are strided views of the tensor.
+
+    :param tensor: the state tensor
+    :type tensor: np.ndarray
+    :param matrix: the 2x2 matrix
+    :type matrix: np.ndarray
+    :param target: the index of the target qubit
+    :type target: int
+    :param controls: the (qubit index, phase) of the controls, defaults to None
+    :type controls: list, optional
+    """
+    num_qubits = tensor.ndim
+    index = [slice(None)] * num_qubits
+    if controls is not None:
+        for qubit, phase in controls:
+            index[num_qubits - 1 - qubit] = slice(phase, phase + 1)
+    index[num_qubits - 1 - target] = slice(0, 1)
+    amplitudes0 = tensor[tuple(index)]
+    index[num_qubits - 1 - target] = slice(1, 2)
+    amplitudes1 = tensor[tuple(index)]
+
+    (m00, m01), (m10, m11) = matrix
+    if m01 == 0 and m10 == 0:
+        # diagonal matrices (Z, RZ) only scale the halves
+        if m00 != 1:
+            amplitudes0 *= m00
+        if m11 != 1:
+            amplitudes1 *= m11
+        return
+    if m00 == 0 and m11 == 0 and m01 == 1 and m10 == 1:
+        # X swaps the halves
+        swapped = amplitudes0.copy()
+        amplitudes0[...] = amplitudes1
+        amplitudes1[...] = swapped
+        return
+    new_amplitudes0 = m00 * amplitudes0 + m01 * amplitudes1
+    amplitudes1 *= m11
+    amplitudes1 += m10 * amplitudes0
+    amplitudes0[...] = new_amplitudes0
+
+
+def simulate_statevector(
+    circuit: QCircuit, initial_state: np.ndarray = None
+) -> np.ndarray:
+    """Simulate a circuit on a NumPy state vector.
+
+    The consecutive single-qubit gates on the same qubit are fused into one
+    2x2 matrix (see fuse_gates). The state is real if the circuit only has
+    real gates (X, Z, RY, CX, CRY and MCRY) and the initial state is real, and
+    complex otherwise.
+
+    :param circuit: the quantum circuit to simulate
+    :type circuit: QCircuit
+    :param initial_state: the input state vector, defaults to the ground state
+    :type initial_state: np.ndarray, optional
+    :return: the output state vector, the amplitude of the basis state i is at
+        index i, where the bit j of i is the qubit j
+    :rtype: np.ndarray
+    """
+    num_qubits = circuit.get_num_qubits()
+    gates = circuit.get_gates()
+
+    is_real = all(gate.get_qgate_type() in REAL_GATE_TYPES for gate in gates)
+    dtype = np.float64 if is_real else np.complex128
+    if initial_state is None:
+        state = np.zeros(1 << num_qubits, dtype=dtype)
+        state[0] = 1
+    else:
+        assert len(initial_state) == 1 << num_qubits, "wrong size of the initial state"
+        state = np.array(initial_state, dtype=np.result_type(initial_state, dtype))
+    tensor = state.reshape((2,) * num_qubits)
+    for matrix, target, controls in fuse_gates(gates):
+        apply_matrix(tensor, matrix, target, controls)
+    return state
+
+
+def apply_matrix_sparse(
+    indices: np.ndarray,
+    weights: np.ndarray,
+    matrix: np.ndarray,
+    target: int,
+    controls: list = None,
+    tolerance: float = MERGE_UNCERTAINTY,
+):
+    """Apply a (controlled) real 2x2 matrix to a sparse state.
+
+    The enabled basis states are grouped by pairs differing on the target
+    qubit, the amplitudes of each pair are rotated together and the ones
+    below the tolerance are dropped. The indices are not kept sorted.
+
+    :param indices: the basis states, as an uint64 array
+    :type indices: np.ndarray
+    :param weights: the amplitudes of the basis states
+    :type weights: np.ndarray
+    :return: the new indices and weights
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    target_mask = np.uint64(1 << target)
+    control_mask, control_value = 0, 0
+    for qubit, phase in controls or []:
+        control_mask |= 1 << qubit
+        control_value |= phase << qubit
+    enabled = (indices & np.uint64(control_mask)) == np.uint64(control_value)
+
+    (m00, m01), (m10, m11) = matrix
+    if m00 == 0 and m11 == 0 and m01 == 1 and m10 == 1:
+        # X only relabels the basis states
+        return indices ^ np.where(enabled, target_mask, np.uint64(0)), weights
+    is_one = (indices & target_mask) != 0
+    if m01 == 0 and m10 == 0:
+        factors = np.where(is_one, m11, m00)
+        return indices, np.where(enabled, factors * weights, weights)
+
+    rotated_indices = indices[enabled]
+    rotated_weights = weights[enabled]
+    is_one = is_one[enabled]
+    pairs, inverse = np.unique(rotated_indices & ~target_mask, return_inverse=True)
+    inverse = inverse.ravel()
+    weights0 = np.zeros(len(pairs))
+    weights1 = np.zeros(len(pairs))
+    weights0[inverse[~is_one]] = rotated_weights[~is_one]
+    weights1[inverse[is_one]] = rotated_weights[is_one]
+
+    new_indices = np.concatenate((indices[~enabled], pairs, pairs | target_mask))
+    new_weights = np.concatenate(
+        (
+            weights[~enabled],
+            m00 * weights0 + m01 * weights1,
+            m10 * weights0 + m11 * weights1,
+        )
+    )
+    is_nonzero = np.abs(new_weights) > tolerance
+    return new_indices[is_nonzero], new_weights[is_nonzero]
+
+
+def simulate_sparse(
+    circuit: QCircuit,
+    initial_state: QState = None,
+    tolerance: float = MERGE_UNCERTAINTY,
+) -> ArrayQState:
+    """Simulate a circuit on the nonzero amplitudes only.
+
+    The memory grows with the number of nonzero amplitudes instead of 2^n, so
+    the circuits preparing sparse states can be checked on up to 64 qubits.
+    The gates are fused as in simulate_statevector, and only the real gates
+    (X, Z, RY, CX, CRY and MCRY) are supported.
+
+    :param circuit: the quantum circuit to simulate
+    :type circuit: QCircuit
+    :param initial_state: the input state, defaults to the ground state
+    :type initial_state: QState, optional
+    :param tolerance: the amplitudes below it are dropped, defaults to MERGE_UNCERTAINTY
+    :type tolerance: float, optional
+    :return: the output state, comparable with the target with is_equal
+    :rtype: ArrayQState
+    """
+    num_qubits = circuit.get_num_qubits()
+    gates = circuit.get_gates()
+    for gate in gates:
+        if gate.get_qgate_type() not in REAL_GATE_TYPES:
+            raise NotImplementedError(
+                f"Gate type {gate.get_qgate_type()} is not supported by the sparse simulation"
+            )
+
+    if initial_state is None:
+        initial_state = ArrayQState.ground_state(num_qubits)
+    initial_state = ArrayQState.from_qstate(initial_state)
+    indices, weights = initial_state.indices, initial_state.weights
+    for matrix, target, controls in fuse_gates(gates):
+        indices, weights = apply_matrix_sparse(
+            indices, weights, matrix, target, controls, tolerance
+        )
+    return ArrayQState(indices, weights, num_qubits)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+from .qstate import QState
+from .qcircuit import QCircuit
+
+# the fidelity of an equivalent circuit is 1 up to this tolerance
+FIDELITY_TOLERANCE = 1e-6
+
+
+@dataclass
+class VerificationResult:
+    """The outcome of verify_state_preparation.
+
+    The fidelity is None if the verification stopped at failed_gate_index,
+    the index in the circuit of the gate where the sparsity exceeded the limit.
+    """
+
+    is_equal: bool
+    fidelity: float = None
+    failed_gate_index: int = None
+    max_sparsity: int = 0
+
+    def __bool__(self) -> bool:
+        return self.is_equal
+
+
+def verify_state_preparation(
+    circuit: QCircuit,
+    state: QState,
+    max_sparsity: int = None,
+    tolerance: float = FIDELITY_TOLERANCE,
+) -> VerificationResult:
+    """Check that a circuit prepares a state from the ground state.
+
+    The target state is pushed backward through the conjugated gates, from the
+    last one to the first one, and the circuit is correct if it reaches the
+    ground state. Only the nonzero amplitudes are tracked, so this is much
+    cheaper than a dense simulation when the intermediate states are sparse.
+
+    :param circuit: the quantum circuit to verify
+    :type circuit: QCircuit
+    :param state: the state the circuit should prepare
+    :type state: QState
+    :param max_sparsity: the verification stops at the first gate after which
+        the state has more basis states, defaults to None (no limit)
+    :type max_sparsity: int, optional
+    :param tolerance: the maximum infidelity of an equivalent circuit, defaults to FIDELITY_TOLERANCE
+    :type tolerance: float, optional
+    :return: the result of the verification
+    :rtype: VerificationResult
+    """
+    gates = circuit.get_gates()
+    for gate in gates:
+        if not hasattr(gate, "conjugate"):
+            raise NotImplementedError(
+                f"Gate type {gate.get_qgate_type()} cannot be pushed backward\n Consider toggle map_gates to True"
+            )
+
+    curr_sparsity = state.get_sparsity()
+    max_sparsity_seen = curr_sparsity
+    for index in range(len(gates) - 1, -1, -1):
+        state = gates[index].conjugate().apply(state)
+        curr_sparsity = state.get_sparsity()
+        max_sparsity_seen = max(max_sparsity_seen, curr_sparsity)
+        if max_sparsity is not None and curr_sparsity > max_sparsity:
+            return VerificationResult(
+                is_equal=False,
+                failed_gate_index=index,
+                max_sparsity=max_sparsity_seen,
+            )
+
+    # the overlap with the ground state is the amplitude of |0...0>
+    index_to_weight = state.index_to_weight
+    norm = sum(weight**2 for weight in index_to_weight.values())
+    fidelity = float(index_to_weight.get(0, 0) ** 2 / norm) if norm > 0 else 0.0
+    return VerificationResult(
+        is_equal=bool(fidelity >= 1 - tolerance),
+        fidelity=fidelity,
+        max_sparsity=max_sparsity_seen,
+    )
@@ -13,3 +13,5 @@ from .special_gates import *
 from .to_qiskit import *
 from .write_qasm import *
 from .read_qasm import *
+from .binary_circuit import *
+from .binary_state import *
@@ -0,0 +1,111 @@
+import struct
+import numpy as np
+
+from ..circuit import QCircuit, ArrayQCircuit
+
+# the header: magic, version, number of qubits, number of gates, number of
+# U/CU matrices and flags, followed by the arrays of ArrayQCircuit, each
+# aligned on 8 bytes. The files of version 1 have no flags
+BINARY_CIRCUIT_MAGIC = b"XYZQC\x00\x00\x00"
+BINARY_CIRCUIT_VERSION = 2
+_HEADERS = {1: struct.Struct("<8sIIQQ"), 2: struct.Struct("<8sIIQQQ")}
+_HEADER = _HEADERS[BINARY_CIRCUIT_VERSION]
+_PREFIX = struct.Struct("<8sI")
+
+# the bits of the flags
+FLAG_MAP_GATES = 1
+
+_FIELDS = [
+    ("gate_types", np.dtype("<u1")),
+    ("targets", np.dtype("<u4")),
+    ("control_masks", np.dtype("<u8")),
+    ("phase_masks", np.dtype("<u8")),
+    ("thetas", np.dtype("<f8")),
+]
+_UNITARY_DTYPE = np.dtype("<c16")
+
+
+def _padding(num_bytes: int) -> int:
+    return -num_bytes % 8
+
+
+def write_binary_circuit(circuit: QCircuit, filename: str) -> None:
+    """Write a circuit in the binary format of ArrayQCircuit.
+
+    :param circuit: the circuit to write
+    :type circuit: QCircuit
+    :param filename: the path of the file
+    :type filename: str
+    """
+    circuit = ArrayQCircuit.from_qcircuit(circuit)
+    num_gates = len(circuit.gate_types)
+    unitaries = np.ascontiguousarray(circuit.unitaries, dtype=_UNITARY_DTYPE)
+    with open(filename, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                BINARY_CIRCUIT_MAGIC,
+                BINARY_CIRCUIT_VERSION,
+                circuit.get_num_qubits(),
+                num_gates,
+                len(unitaries),
+                FLAG_MAP_GATES if circuit.map_gates else 0,
+            )
+        )
+        for name, dtype in _FIELDS:
+            array = np.ascontiguousarray(getattr(circuit, name), dtype=dtype)
+            f.write(array.tobytes())
+            f.write(bytes(_padding(array.nbytes)))
+        f.write(unitaries.tobytes())
+
+
+def read_binary_circuit(filename: str, mmap: bool = True) -> ArrayQCircuit:
+    """Read a circuit written by write_binary_circuit.
+
+    The arrays are views of the file, no gate object is created until the
+    gates are accessed. The circuits of version 1 files do not map gates.
+
+    :param filename: the path of the file
+    :type filename: str
+    :param mmap: map the file in memory instead of reading it, defaults to True
+    :type mmap: bool, optional
+    :return: the circuit
+    :rtype: ArrayQCircuit
+    """
+    if mmap:
+        buffer = np.memmap(filename, dtype=np.uint8, mode="r")
+    else:
+        with open(filename, "rb") as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    if len(buffer) < _PREFIX.size:
+        raise ValueError(f"{filename} is not a binary circuit")
+    magic, version = _PREFIX.unpack(buffer[: _PREFIX.size].tobytes())
+    if magic != BINARY_CIRCUIT_MAGIC:
+        raise ValueError(f"{filename} is not a binary circuit")
+    if version not in _HEADERS:
+        raise ValueError(f"Unsupported binary circuit version {version}")
+    header = _HEADERS[version]
+    if len(buffer) < header.size:
+        raise ValueError(f"{filename} is truncated or corrupted")
+    _, _, num_qubits, num_gates, num_unitaries, *flags = header.unpack(
+        buffer[: header.size].tobytes()
+    )
+    flags = flags[0] if flags else 0
+
+    field_sizes = [num_gates * dtype.itemsize for _, dtype in _FIELDS]
+    unitary_size = num_unitaries * 4 * _UNITARY_DTYPE.itemsize
+    file_size = header.size + sum(size + _padding(size) for size in field_sizes)
+    if file_size + unitary_size != len(buffer):
+        raise ValueError(f"{filename} is truncated or corrupted")
+
+    arrays = {}
+    offset = header.size
+    for (name, dtype), num_bytes in zip(_FIELDS, field_sizes):
+        arrays[name] = buffer[offset : offset + num_bytes].view(dtype)
+        offset += num_bytes + _padding(num_bytes)
+    unitaries = buffer[offset : offset + unitary_size].view(_UNITARY_DTYPE)
+    return ArrayQCircuit(
+        num_qubits,
+        unitaries=unitaries.reshape(-1, 2, 2),
+        map_gates=bool(flags & FLAG_MAP_GATES),
+        **arrays,
+    )
@@ -0,0 +1,85 @@
+import os
+import zipfile
+from typing import Iterable, Iterator
+import numpy as np
+
+from ..circuit import QState, ArrayQState
+
+# an archive has the number of qubits of all its states in num_qubits.npy, and
+# the sorted basis states and the amplitudes of the state i in indices_<i>.npy
+# and weights_<i>.npy, it is a regular npz file
+BINARY_STATE_SUFFIX = ".npz"
+
+
+def write_binary_states(
+    states: Iterable[QState], filename: str, compress: bool = False
+) -> int:
+    """Write states to an npz archive, one state at a time.
+
+    :param states: the states to write
+    :type states: Iterable[QState]
+    :param filename: the path of the archive
+    :type filename: str
+    :param compress: compress the arrays with deflate, defaults to False
+    :type compress: bool, optional
+    :return: the number of states written
+    :rtype: int
+    """
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    num_qubits = []
+    with zipfile.ZipFile(filename, "w", compression=compression) as archive:
+        for i, state in enumerate(states):
+            state = ArrayQState.from_qstate(state)
+            for name, array in [("indices", state.indices), ("weights", state.weights)]:
+                with archive.open(f"{name}_{i}.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.ascontiguousarray(array))
+            num_qubits.append(state.num_qubits)
+        with archive.open("num_qubits.npy", "w") as f:
+            np.lib.format.write_array(f, np.array(num_qubits, dtype=np.int64))
+    return len(num_qubits)
+
+
+def write_binary_state(state: QState, filename: str, compress: bool = False) -> None:
+    """Write a state to an npz file, see write_binary_states."""
+    write_binary_states([state], filename, compress)
+
+
+def _iter_archive(filename: str) -> Iterator[ArrayQState]:
+    with np.load(filename) as archive:
+        if "num_qubits" not in archive.files:
+            raise ValueError(f"{filename} is not a binary state archive")
+        for i, num_qubits in enumerate(archive["num_qubits"].tolist()):
+            yield ArrayQState(archive[f"indices_{i}"], archive[f"weights_{i}"], num_qubits)
+
+
+def iter_binary_states(path: str) -> Iterator[ArrayQState]:
+    """Iterate over the states of an archive, or of all the archives in a directory.
+
+    The states are read one at a time, in the order they were written, and the
+    archives of a directory are read by increasing file name.
+
+    :param path: the path of an archive or of a directory
+    :type path: str
+    :return: the states
+    :rtype: Iterator[ArrayQState]
+    """
+    if not os.path.isdir(path):
+        yield from _iter_archive(path)
+        return
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith(BINARY_STATE_SUFFIX):
+            yield from _iter_archive(os.path.join(path, filename))
+
+
+def read_binary_state(filename: str) -> ArrayQState:
+    """Read a state written by write_binary_state.
+
+    :param filename: the path of the file
+    :type filename: str
+    :return: the state
+    :rtype: ArrayQState
+    """
+    states = list(_iter_archive(filename))
+    if len(states) != 1:
+        raise ValueError(f"{filename} has {len(states)} states, expected one")
+    return states[0]
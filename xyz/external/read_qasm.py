@@ -8,37 +8,324 @@ Last Modified by: Hanyu Wang
 Last Modified time: 2024-04-22 17:53:19
 """
 
-from ..circuit import QCircuit, QGate, QBit, X, RY, CX
-from qiskit import qasm2
+import ast
+import gzip
+import operator
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+
+from ..circuit import QCircuit, QGate, QBit, X, Z, RX, RY, RZ, U, CX, CRX, CRY, CRZ, CU, MCRY
+
+# the statements are separated by ';', the gate bodies are between braces
+_DELIMITERS = re.compile(r"([;{}])")
+_STATEMENT = re.compile(r"^(\w+)\s*(?:\((.*)\))?\s*(.*)$", re.DOTALL)
+_ARGUMENT = re.compile(r"^(\w+)\s*\[\s*(\d+)\s*\]$")
+
+# the controlled gates written by qiskit, e.g. cx, cry_o0, ccry, c3ry_o5 or mcry,
+# the suffix _o<k> is the control state, the bit i being the phase of control i,
+# and the repeated names are made unique with an id, e.g. cry_o0_140169952739728_o0
+_CONTROLLED_GATE = re.compile(
+    r"^(c+|c\d+|mc)(x|rx|ry|rz|u|u3)(?:_o(\d+))?(?:_\d+(?:_o\d+)?)?$"
+)
+
+# the statements without any effect on the circuit
+_IGNORED_STATEMENTS = {"OPENQASM", "include", "creg", "barrier", "measure", "reset", "opaque", "id"}
+
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_FUNCTIONS = {
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "exp": np.exp,
+    "ln": np.log,
+    "sqrt": np.sqrt,
+}
+
+
+def _evaluate(expression: str, bindings: Dict[str, float] = None) -> float:
+    """Evaluate a parameter expression, e.g. 0.5, -pi/2 or 2*theta."""
+    try:
+        return float(expression)
+    except ValueError:
+        pass
+
+    def _visit(node: ast.AST) -> float:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id == "pi":
+                return np.pi
+            if bindings is not None and node.id in bindings:
+                return bindings[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](_visit(node.left), _visit(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](_visit(node.operand))
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS
+            and len(node.args) == 1
+        ):
+            return _FUNCTIONS[node.func.id](_visit(node.args[0]))
+        raise ValueError(f"Unsupported expression {expression}")
+
+    # the power is ^ in OpenQASM
+    tree = ast.parse(expression.replace("^", "**").strip(), mode="eval")
+    return float(_visit(tree.body))
+
+
+def _split_parameters(text: str) -> List[str]:
+    """Split the parameters of a gate on the top-level commas."""
+    if "(" not in text:
+        return text.split(",")
+    parameters, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parameters.append(text[start:i])
+            start = i + 1
+    parameters.append(text[start:])
+    return parameters
+
+
+def _iter_statements(lines: Iterable[str]) -> Iterator[Tuple[str, List[str]]]:
+    """Yield the statements of a program read line by line.
+
+    The regular statements are yielded as (statement, None) and the gate
+    definitions as (header, body statements).
+    """
+    pending = []
+    header, body = None, None
+    for line in lines:
+        if "//" in line:
+            line = line[: line.index("//")] + "\n"
+        for token in _DELIMITERS.split(line):
+            if token == ";":
+                statement = "".join(pending).strip()
+                pending = []
+                if body is not None:
+                    if statement:
+                        body.append(statement)
+                elif statement:
+                    yield statement, None
+            elif token == "{":
+                header, body = "".join(pending).strip(), []
+                pending = []
+            elif token == "}":
+                yield header, body
+                header, body = None, None
+            elif token:
+                pending.append(token)
+    if "".join(pending).strip() or body is not None:
+        raise ValueError("Unexpected end of the program")
+
+
+def _u_matrix(theta: float, phi: float, lam: float) -> np.ndarray:
+    """Return the matrix of the U(theta, phi, lambda) gate of OpenQASM."""
+    cos_theta, sin_theta = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array(
+        [
+            [cos_theta, -np.exp(1j * lam) * sin_theta],
+            [np.exp(1j * phi) * sin_theta, np.exp(1j * (phi + lam)) * cos_theta],
+        ]
+    )
+
+
+def _make_gate(name: str, params: List[float], qubits: List[QBit]) -> QGate:
+    """Create the gate of a statement, or return None if the name is unknown."""
+    if name in ["x", "z", "rx", "ry", "rz", "u", "u3", "U"]:
+        target = qubits[0]
+        if name == "x":
+            return X(target)
+        if name == "z":
+            return Z(target)
+        if name == "rx":
+            return RX(params[0], target)
+        if name == "ry":
+            return RY(params[0], target)
+        if name == "rz":
+            return RZ(params[0], target)
+        return U(_u_matrix(*params[:3]), target)
+    if name == "CX":
+        name = "cx"
+
+    match = _CONTROLLED_GATE.match(name)
+    if match is None:
+        return None
+    _, base_name, control_state = match.groups()
+    controls, target = qubits[:-1], qubits[-1]
+    if control_state is None:
+        phases = [1] * len(controls)
+    else:
+        phases = [(int(control_state) >> i) & 1 for i in range(len(controls))]
+
+    if base_name == "ry" and len(controls) > 1:
+        return MCRY(params[0], controls, phases, target)
+    if len(controls) != 1:
+        return None
+    control, phase = controls[0], phases[0]
+    if base_name == "x":
+        return CX(control, phase, target)
+    if base_name == "rx":
+        return CRX(params[0], control, phase, target)
+    if base_name == "ry":
+        return CRY(params[0], control, phase, target)
+    if base_name == "rz":
+        return CRZ(params[0], control, phase, target)
+    # cu(theta, phi, lambda, gamma) has a global phase gamma
+    unitary = _u_matrix(*params[:3])
+    if len(params) > 3:
+        unitary = np.exp(1j * params[3]) * unitary
+    return CU(unitary, control, phase, target)
+
+
+class _QASMParser:
+    """Build the gates of an OpenQASM 2 program statement by statement."""
+
+    def __init__(self) -> None:
+        self.registers: Dict[str, int] = {}
+        self.num_qubits: int = 0
+        self.qubits: List[QBit] = []
+        # the qubits by their name, e.g. q[0]
+        self.qubit_names: Dict[str, QBit] = {}
+        self.definitions: Dict[str, tuple] = {}
+        self.gates: List[QGate] = []
+
+    def parse(self, statement: str, body: List[str] = None) -> None:
+        match = _STATEMENT.match(statement)
+        if match is None:
+            raise ValueError(f"Invalid statement {statement}")
+        name, params, args = match.groups()
+
+        if body is not None:
+            # gate name(params) qargs { body }
+            match = _STATEMENT.match(args) if name == "gate" else None
+            if match is None:
+                raise ValueError(f"Invalid gate definition {statement}")
+            gate_name, gate_params, gate_args = match.groups()
+            self.definitions[gate_name] = (
+                [p.strip() for p in gate_params.split(",")] if gate_params else [],
+                [q.strip() for q in gate_args.split(",")],
+                body,
+            )
+            return
+        if name in _IGNORED_STATEMENTS:
+            return
+        if name == "qreg":
+            match = _ARGUMENT.match(args.strip())
+            if match is None:
+                raise ValueError(f"Invalid register {statement}")
+            register, size = match.group(1), int(match.group(2))
+            self.registers[register] = self.num_qubits
+            for i in range(size):
+                qubit = QBit(self.num_qubits + i)
+                self.qubits.append(qubit)
+                self.qubit_names[f"{register}[{i}]"] = qubit
+            self.num_qubits += size
+            return
+
+        qubits = []
+        for arg in args.split(","):
+            arg = arg.strip()
+            if arg not in self.qubit_names:
+                match = _ARGUMENT.match(arg)
+                if match is None or match.group(1) not in self.registers:
+                    raise ValueError(f"Invalid qubit {arg} in {statement}")
+                # the name has spaces, e.g. q [0]
+                arg = f"{match.group(1)}[{int(match.group(2))}]"
+                if arg not in self.qubit_names:
+                    raise ValueError(f"Invalid qubit {arg} in {statement}")
+            qubits.append(self.qubit_names[arg])
+        params = [_evaluate(p) for p in _split_parameters(params)] if params else []
+        self.add_gate(name, params, qubits)
+
+    def add_gate(self, name: str, params: List[float], qubits: List[QBit]) -> None:
+        gate = _make_gate(name, params, qubits)
+        if gate is not None:
+            self.gates.append(gate)
+            return
+        if name not in self.definitions:
+            raise ValueError(f"Unsupported instruction {name}")
+
+        # inline the definition of the custom gate
+        formal_params, formal_qubits, body = self.definitions[name]
+        bindings = dict(zip(formal_params, params))
+        qubit_bindings = dict(zip(formal_qubits, qubits))
+        for sub_statement in body:
+            match = _STATEMENT.match(sub_statement)
+            sub_name, sub_params, sub_args = match.groups()
+            if sub_name == "barrier":
+                continue
+            sub_qubits = [qubit_bindings[arg.strip()] for arg in sub_args.split(",")]
+            sub_params = (
+                [_evaluate(p, bindings) for p in _split_parameters(sub_params)]
+                if sub_params
+                else []
+            )
+            self.add_gate(sub_name, sub_params, sub_qubits)
+
+    def to_circuit(self) -> QCircuit:
+        circuit = QCircuit(self.num_qubits, qubits=self.qubits)
+        for gate in self.gates:
+            circuit.add_gate(gate)
+        return circuit
+
+
+def parse_qasm(lines: Iterable[str]) -> QCircuit:
+    """Parse an OpenQASM 2 program given line by line.
+
+    The gates x, z, rx, ry, rz, u and the controlled gates written by qiskit
+    (cx, cry, ccry, c3ry, mcry, cu and their _o<k> variants with open
+    controls) are read directly, the other custom gates are inlined from
+    their definition.
+
+    :param lines: the lines of the program, e.g. an opened file
+    :type lines: Iterable[str]
+    :return: the circuit
+    :rtype: QCircuit
+    """
+    parser = _QASMParser()
+    for statement, body in _iter_statements(lines):
+        parser.parse(statement, body)
+    return parser.to_circuit()
 
 
 def read_qasm(filename: str) -> QCircuit:
     """
     read_qasm:
-    read a qasm file and return the corresponding QCircuit object
+    read a qasm file and return the corresponding QCircuit object, the files
+    ending with .gz are decompressed with gzip
     """
+    if filename.endswith(".gz"):
+        with gzip.open(filename, "rt", encoding="utf-8") as f:
+            return parse_qasm(f)
     with open(filename, "r", encoding="utf-8") as f:
-        program = f.read()
-    qc = qasm2.loads(program)
-
-    # convert qc to QCircuit
-    n_qubits = qc.num_qubits
-    circuit = QCircuit(n_qubits)
-
-    for instr, qargs, _ in qc.data:
-        # pylint: disable=W0212
-        gate: QGate = None
-
-        if instr.name == "x":
-            gate = X(QBit(qargs[0]._index))
-        elif instr.name == "ry":
-            gate = RY(instr.params[0], QBit(qargs[0]._index))
-        elif instr.name == "cx":
-            gate = CX(QBit(qargs[0]._index), True, QBit(qargs[1]._index))
-        elif instr.name == "cx_o0":
-            gate = CX(QBit(qargs[0]._index), False, QBit(qargs[1]._index))
-        else:
-            raise ValueError(f"Unsupported instruction {instr.name}")
-
-        circuit.add_gate(gate)
-    return circuit
+        return parse_qasm(f)
+
+
+def read_qasm_files(filenames: Iterable[str]) -> Iterator[Tuple[str, QCircuit, float]]:
+    """Read qasm files one at a time.
+
+    :param filenames: the paths of the qasm files
+    :type filenames: Iterable[str]
+    :return: the filename, the circuit and the parse time in seconds of each file
+    :rtype: Iterator[Tuple[str, QCircuit, float]]
+    """
+    for filename in filenames:
+        tic = time.perf_counter()
+        circuit = read_qasm(filename)
+        yield filename, circuit, time.perf_counter() - tic
@@ -9,21 +9,33 @@ Last Modified time: 2023-09-13 12:04:42
 """
 
 import numpy as np
-from qiskit.quantum_info import Statevector
 
-from xyz.circuit import QCircuit
-from .to_qiskit import to_qiskit
+from xyz.circuit import QCircuit, simulate_statevector
 
 
-def simulate_circuit(circuit: QCircuit) -> np.ndarray:
+def simulate_circuit(circuit: QCircuit, backend: str = "numpy") -> np.ndarray:
     """Simulate a circuit .
-    This is a wrapper for qiskit Aer.get_backend("qasm_simulator").run(circuit).result().get_statevector()
+
+    By default the circuit is simulated in the package (see
+    simulate_statevector), the "qiskit" backend converts it with to_qiskit and
+    builds a qiskit Statevector instead.
 
     :param circuit: the quantum circuit to simulate
     :type circuit: QCircuit
+    :param backend: "numpy" or "qiskit", defaults to "numpy"
+    :type backend: str, optional
     """
 
-    state_vector = Statevector(to_qiskit(circuit)).data
+    if backend == "numpy":
+        state_vector = simulate_statevector(circuit).astype(np.complex128)
+    elif backend == "qiskit":
+        # qiskit is only needed by this backend
+        from qiskit.quantum_info import Statevector
+        from .to_qiskit import to_qiskit
+
+        state_vector = Statevector(to_qiskit(circuit)).data
+    else:
+        raise ValueError(f"unknown backend {backend}")
     state_vector[np.abs(state_vector) < 1e-10] = 0
 
     return state_vector
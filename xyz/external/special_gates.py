@@ -10,9 +10,6 @@ Last Modified time: 2023-06-22 15:01:37
 
 # pylint: disable=C0103
 
-from qiskit.circuit.library.standard_gates import RYGate
-from qiskit.circuit.library import UnitaryGate
-
 from xyz.circuit import U, CU, MCRY
 
 
@@ -31,6 +28,8 @@ class SpecialGates:
         :return: [description]
         :rtype: [type]
         """
+        from qiskit.circuit.library.standard_gates import RYGate
+
         num_control_qubits = len(gate.control_qubits)
 
         # we need to reverse the order of the control qubits
@@ -50,6 +49,7 @@ class SpecialGates:
         :return: [description]
         :rtype: [type]
         """
+        from qiskit.circuit.library import UnitaryGate
 
         return UnitaryGate(gate.get_unitary())
 
@@ -61,6 +61,8 @@ class SpecialGates:
         :type gate: CU
         """
 
+        from qiskit.circuit.library import UnitaryGate
+
         num_control_qubits = 1
 
         # we need to reverse the order of the control qubits
@@ -1,15 +1,12 @@
 # standard library
 from typing import List
 
-# third party library
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-
 # my own library
 from ..circuit import QBit, QGate, QGateType, QCircuit
 from .special_gates import SpecialGates
 
 
-def to_qiskit(qcircuit: QCircuit, with_measurement: bool = False) -> QuantumCircuit:
+def to_qiskit(qcircuit: QCircuit, with_measurement: bool = False) -> "QuantumCircuit":
     """Convert this circuit to a QuantumCircuit .
 
     :param with_measurement: [description], defaults to True
@@ -19,6 +16,9 @@ def to_qiskit(qcircuit: QCircuit, with_measurement: bool = False) -> QuantumCirc
     :return: [description]
     :rtype: QuantumCircuit
     """
+    # qiskit is only imported when needed, it is slow to import
+    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+
     num_qubits = qcircuit.get_num_qubits()
 
     quantum_registers = QuantumRegister(num_qubits)
@@ -28,7 +28,7 @@ def to_qiskit(qcircuit: QCircuit, with_measurement: bool = False) -> QuantumCirc
     else:
         circuit = QuantumCircuit(quantum_registers)
 
-    def _to_register(qubit: QBit | List[QBit]) -> QuantumRegister:
+    def _to_register(qubit: QBit | List[QBit]) -> "QuantumRegister":
         """Converts a single bit value to a register .
 
         :param qubit: [description]
@@ -123,6 +123,8 @@ def to_qiskit(qcircuit: QCircuit, with_measurement: bool = False) -> QuantumCirc
     return circuit
 
 def qiskit_depth_evaluation(circuit: QCircuit) -> int:
+    from qiskit import transpile
+
     qc = to_qiskit(circuit)
     qc = transpile(qc, basis_gates=["cx", "u3"])
     cnot_depth = qc.depth(lambda x: x.name in ["cx"])
@@ -8,24 +8,288 @@ Last Modified by: Hanyu Wang
 Last Modified time: 2024-04-22 17:03:29
 """
 
-from qiskit import qasm2
-from ..circuit import QCircuit
-from .to_qiskit import to_qiskit
+import gzip
+import io
+from typing import Dict, List, TextIO, Tuple
+import numpy as np
 
+from ..circuit import QCircuit, QGate, QGateType, decompose_mcry
 
-def to_qasm(circuit: QCircuit) -> str:
+# the number of lines buffered before they are written to the file
+CHUNK_SIZE = 4096
+
+# the multi-controlled RY with more controls are declared opaque, their
+# definition would have 2^num_controls rotations
+MCRY_DEFINITION_MAX_CONTROLS = 8
+
+# the definitions of the gates missing from qelib1.inc, in OpenQASM 2
+QASM2_DEFINITIONS = {
+    "cry": "gate cry(theta) c,t { ry(theta/2) t; cx c,t; ry(-theta/2) t; cx c,t; }",
+    "crx": "gate crx(theta) c,t { u1(pi/2) t; cx c,t; u3(-theta/2,0,0) t; cx c,t; u3(theta/2,-pi/2,0) t; }",
+    "cu": "gate cu(theta,phi,lam,gamma) c,t { u1(gamma) c; cu3(theta,phi,lam) c,t; }",
+}
+
+
+def _format_angle(theta: float, precision: int = None) -> str:
+    """Format an angle, with the shortest exact representation by default."""
+    if precision is None:
+        return repr(float(theta))
+    return f"{float(theta):.{precision}g}"
+
+
+def _format_angles(thetas: List[float], precision: int, separator: str = ",") -> str:
+    return separator.join(_format_angle(theta, precision) for theta in thetas)
+
+
+def _u_parameters(unitary: np.ndarray) -> Tuple[float, float, float, float]:
+    """Return the (theta, phi, lambda, gamma) of unitary = exp(i gamma) U(theta, phi, lambda)."""
+    unitary = np.asarray(unitary)
+    theta = 2 * np.arctan2(np.abs(unitary[1, 0]), np.abs(unitary[0, 0]))
+    if np.abs(unitary[0, 0]) > 1e-12:
+        gamma = np.angle(unitary[0, 0])
+        phi_plus_lam = np.angle(unitary[1, 1]) - gamma
+    else:
+        gamma, phi_plus_lam = np.angle(unitary[1, 0]), 0.0
+    if np.abs(unitary[1, 0]) > 1e-12:
+        phi = np.angle(unitary[1, 0]) - gamma
+        lam = np.angle(-unitary[0, 1]) - gamma
+    else:
+        phi, lam = 0.0, phi_plus_lam
+    return float(theta), float(phi), float(lam), float(gamma)
+
+
+def _control_state(phases: List[int]) -> int:
+    """Return the control state, the bit i being the phase of control i."""
+    return sum(int(phase) << i for i, phase in enumerate(phases))
+
+
+def _mcry_definition(name: str, num_controls: int, control_state: int) -> str:
+    """Define a multi-controlled RY with the rotations and CNOTs of decompose_mcry."""
+    controls = [f"c{i}" for i in range(num_controls)]
+    if num_controls > MCRY_DEFINITION_MAX_CONTROLS:
+        return f"opaque {name}(theta) {','.join(controls)},t;"
+    rotation_table = np.zeros(1 << num_controls)
+    rotation_table[control_state] = 1
+    body = []
+    # the angles are linear in theta
+    for coefficient, control_id in decompose_mcry(rotation_table):
+        body.append(f"ry({_format_angle(coefficient)}*theta) t; cx {controls[control_id]},t;")
+    return f"gate {name}(theta) {','.join(controls)},t {{ {' '.join(body)} }}"
+
+
+# the gates of qelib1.inc without control
+QASM2_SINGLE_QUBIT_GATES = {
+    QGateType.X,
+    QGateType.Z,
+    QGateType.RX,
+    QGateType.RY,
+    QGateType.RZ,
+    QGateType.U,
+}
+
+# the names in qelib1.inc or QASM2_DEFINITIONS of the gates with one control,
+# and the formal parameters of their definitions
+QASM2_CONTROLLED_GATES = {
+    QGateType.CX: ("cx", ""),
+    QGateType.CRX: ("crx", "(theta)"),
+    QGateType.CRY: ("cry", "(theta)"),
+    QGateType.CRZ: ("crz", "(theta)"),
+    QGateType.CU: ("cu", "(theta,phi,lam,gamma)"),
+}
+
+
+def _qasm2_name(gate: QGate) -> str:
+    """Return the OpenQASM 2 name of a controlled gate, with its open controls."""
+    if gate.get_qgate_type() == QGateType.MCRY:
+        num_controls = len(gate.control_qubits)
+        control_state = _control_state(gate.phases)
+        if control_state == (1 << num_controls) - 1:
+            return f"c{num_controls}ry"
+        return f"c{num_controls}ry_o{control_state}"
+    base_name, _ = QASM2_CONTROLLED_GATES[gate.get_qgate_type()]
+    return base_name if gate.phase else f"{base_name}_o0"
+
+
+def _add_qasm2_definitions(gate: QGate, definitions: Dict[str, str]) -> None:
+    """Add the definitions of the gate missing from qelib1.inc.
+
+    It raises NotImplementedError for the unsupported gates, so that nothing
+    is written for a circuit that cannot be exported.
     """
-    write_qasm:
-    write the circuit to qasm format
+    gate_type = gate.get_qgate_type()
+    if gate_type == QGateType.MCRY:
+        name = _qasm2_name(gate)
+        if name not in definitions:
+            num_controls = len(gate.control_qubits)
+            definitions[name] = _mcry_definition(
+                name, num_controls, _control_state(gate.phases)
+            )
+        return
+    if gate_type in QASM2_SINGLE_QUBIT_GATES:
+        return
+    if gate_type not in QASM2_CONTROLLED_GATES:
+        raise NotImplementedError(
+            f"Gate type {gate_type} is not supported yet\n Consider toggle map_gates to True"
+        )
+    base_name, formal_params = QASM2_CONTROLLED_GATES[gate_type]
+    if base_name in QASM2_DEFINITIONS and base_name not in definitions:
+        definitions[base_name] = QASM2_DEFINITIONS[base_name]
+    name = _qasm2_name(gate)
+    if name != base_name and name not in definitions:
+        args = formal_params.strip("()")
+        call = f"{base_name}({args})" if args else base_name
+        definitions[name] = f"gate {name}{formal_params} c,t {{ x c; {call} c,t; x c; }}"
+
+
+def _qasm2_statement(gate: QGate, precision: int) -> str:
+    """Return the OpenQASM 2 statement of a gate, see _add_qasm2_definitions."""
+    gate_type = gate.get_qgate_type()
+    target = f"q[{gate.target_qubit.index}]"
+    match gate_type:
+        case QGateType.X:
+            return f"x {target};"
+        case QGateType.Z:
+            return f"z {target};"
+        case QGateType.RX | QGateType.RY | QGateType.RZ:
+            theta = _format_angle(gate.theta, precision)
+            return f"{gate_type.name.lower()}({theta}) {target};"
+        case QGateType.U:
+            params = _format_angles(_u_parameters(gate.get_unitary())[:3], precision)
+            return f"u3({params}) {target};"
+        case QGateType.MCRY:
+            controls = ",".join(f"q[{qubit.index}]" for qubit in gate.control_qubits)
+            theta = _format_angle(gate.theta, precision)
+            return f"{_qasm2_name(gate)}({theta}) {controls},{target};"
+        case QGateType.CX | QGateType.CRX | QGateType.CRY | QGateType.CRZ | QGateType.CU:
+            if gate_type == QGateType.CX:
+                params = ""
+            elif gate_type == QGateType.CU:
+                params = f"({_format_angles(_u_parameters(gate.get_unitary()), precision)})"
+            else:
+                params = f"({_format_angle(gate.theta, precision)})"
+            control = f"q[{gate.control_qubit.index}]"
+            return f"{_qasm2_name(gate)}{params} {control},{target};"
+    raise NotImplementedError(
+        f"Gate type {gate_type} is not supported yet\n Consider toggle map_gates to True"
+    )
+
+
+def _qasm3_statement(gate: QGate, precision: int) -> str:
+    """Return the OpenQASM 3 statement of a gate, the open controls are negctrl modifiers."""
+    gate_type = gate.get_qgate_type()
+    target = f"q[{gate.target_qubit.index}]"
+    match gate_type:
+        case QGateType.X:
+            return f"x {target};"
+        case QGateType.Z:
+            return f"z {target};"
+        case QGateType.RX | QGateType.RY | QGateType.RZ:
+            theta = _format_angle(gate.theta, precision)
+            return f"{gate_type.name.lower()}({theta}) {target};"
+        case QGateType.U:
+            params = _format_angles(_u_parameters(gate.get_unitary())[:3], precision, ", ")
+            return f"U({params}) {target};"
+        case QGateType.MCRY:
+            modifiers = "".join("ctrl @ " if phase else "negctrl @ " for phase in gate.phases)
+            controls = ", ".join(f"q[{qubit.index}]" for qubit in gate.control_qubits)
+            return f"{modifiers}ry({_format_angle(gate.theta, precision)}) {controls}, {target};"
+        case QGateType.CX | QGateType.CRX | QGateType.CRY | QGateType.CRZ | QGateType.CU:
+            control = f"q[{gate.control_qubit.index}]"
+            if gate_type == QGateType.CU:
+                params = _format_angles(_u_parameters(gate.get_unitary()), precision, ", ")
+                statement = f"cu({params}) {control}, {target};"
+                if not gate.phase:
+                    statement = f"x {control}; {statement} x {control};"
+                return statement
+            if gate_type == QGateType.CX:
+                base_gate = "x"
+            else:
+                theta = _format_angle(gate.theta, precision)
+                base_gate = f"{gate_type.name[1:].lower()}({theta})"
+            if not gate.phase:
+                return f"negctrl @ {base_gate} {control}, {target};"
+            return f"c{base_gate} {control}, {target};"
+    raise NotImplementedError(
+        f"Gate type {gate_type} is not supported yet\n Consider toggle map_gates to True"
+    )
+
+
+def dump_qasm(
+    circuit: QCircuit, f: TextIO, version: int = 2, precision: int = None
+) -> None:
+    """Write a circuit in OpenQASM to a file-like object.
+
+    The statements are formatted straight from the gates and written in
+    chunks of CHUNK_SIZE lines. In OpenQASM 2, the gates missing from
+    qelib1.inc (cry, crx, cu, the open controls and the multi-controlled RY)
+    are defined in the header, with names that read_qasm recognizes.
+
+    :param circuit: the circuit to write
+    :type circuit: QCircuit
+    :param f: the file-like object, opened in text mode
+    :type f: TextIO
+    :param version: the version of OpenQASM, 2 or 3, defaults to 2
+    :type version: int, optional
+    :param precision: the number of significant digits of the angles,
+        defaults to None (the shortest exact representation)
+    :type precision: int, optional
+    """
+    if version not in [2, 3]:
+        raise ValueError(f"Unsupported OpenQASM version {version}")
+    gates = circuit.get_gates()
+
+    lines = []
+    if version == 2:
+        # the definitions are collected in a first pass, they are written
+        # before the gates, which are then formatted one at a time
+        definitions = {}
+        for gate in gates:
+            _add_qasm2_definitions(gate, definitions)
+        statements = (_qasm2_statement(gate, precision) for gate in gates)
+        lines += ["OPENQASM 2.0;", 'include "qelib1.inc";']
+        lines += definitions.values()
+        lines.append(f"qreg q[{circuit.get_num_qubits()}];")
+    else:
+        statements = (_qasm3_statement(gate, precision) for gate in gates)
+        lines += ["OPENQASM 3.0;", 'include "stdgates.inc";']
+        lines.append(f"qubit[{circuit.get_num_qubits()}] q;")
+
+    for statement in statements:
+        lines.append(statement)
+        if len(lines) >= CHUNK_SIZE:
+            f.write("\n".join(lines) + "\n")
+            lines = []
+    if lines:
+        f.write("\n".join(lines) + "\n")
+
+
+def to_qasm(circuit: QCircuit, version: int = 2, precision: int = None) -> str:
+    """
+    to_qasm:
+    return the circuit in OpenQASM format
     """
-    qc = to_qiskit(circuit)
-    return qasm2.dumps(qc)
+    f = io.StringIO()
+    dump_qasm(circuit, f, version, precision)
+    return f.getvalue()
 
 
-def write_qasm(circuit: QCircuit, filename: str):
+def write_qasm(
+    circuit: QCircuit,
+    filename: str,
+    version: int = 2,
+    precision: int = None,
+    compress: bool = None,
+):
     """
     write_qasm:
-    write the circuit to qasm format
+    write the circuit to qasm format, the file is compressed with gzip if
+    compress is True, or by default if the filename ends with .gz
     """
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(to_qasm(circuit))
+    if compress is None:
+        compress = filename.endswith(".gz")
+    if compress:
+        with gzip.open(filename, "wt", encoding="utf-8") as f:
+            dump_qasm(circuit, f, version, precision)
+    else:
+        with open(filename, "w", encoding="utf-8") as f:
+            dump_qasm(circuit, f, version, precision)